@@ -0,0 +1,294 @@
+"""
+Benchmarks do pipeline extração -> artigos -> lacunas -> renderização (e do tempo de
+importação das entradas do app, que pesa na partida a frio).
+
+    python -m benchmarks.run                          # tamanhos completos, grava benchmarks/results/latest.json
+    python -m benchmarks.run --quick                  # só os tamanhos pequenos
+    python -m benchmarks.run --save-baseline          # grava também benchmarks/results/baseline.json
+    python -m benchmarks.run --compare benchmarks/results/baseline.json --max-slowdown 0.25
+
+Com --compare, sai com código 1 se algum caso ficar mais lento (ou usar mais memória)
+que o limite em relação à baseline.
+"""
+import os, sys, json, time, argparse, platform, tempfile, tracemalloc, subprocess
+from statistics import median
+from typing import Any, Callable
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+ARTICLE_SIZES = (10, 100, 1000)
+PAGE_SIZES = (10, 100, 1000)
+QUICK_ARTICLE_SIZES = (10, 100)
+QUICK_PAGE_SIZES = (10,)
+# entradas do app medidas num processo novo; HEAVY_MODULES não deveriam ser importados por elas
+IMPORT_TARGETS = ("src.ui.routes", "src.extractor.doc_cache", "src.game.engine")
+HEAVY_MODULES = ("PyPDF2", "pandas", "numpy", "pyarrow")
+
+
+# ========== medição ==========
+def measure(fn: Callable[[], Any], repeat: int, setup: Callable[[], Any] | None = None) -> dict:
+    """Mediana e melhor tempo de `repeat` execuções + pico de memória Python (tracemalloc, 1 execução extra)."""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": median(times), "best_seconds": min(times), "peak_mb": peak / (1024 * 1024)}
+
+
+def _record(results: dict, name: str, stats: dict, work: float, unit: str) -> None:
+    stats["throughput"] = work / stats["seconds"] if stats["seconds"] > 0 else None
+    stats["unit"] = unit
+    results[name] = stats
+    print(f"  {name:<48} {stats['seconds'] * 1000:10.2f} ms  {stats['throughput'] or 0:12.1f} {unit:<10} "
+          f"{stats['peak_mb']:8.2f} MB", flush=True)
+
+
+# ========== casos ==========
+def bench_text(results: dict, articles: int, repeat: int) -> None:
+    from benchmarks.synthetic import legislation
+    from src.extractor.pdf_extractor import (
+        split_into_articles, generate_fill_blanks_from_article, generate_fill_blanks_for_articles,
+    )
+    from src.ui import text_format
+
+    text = legislation(articles)
+    mb = len(text.encode("utf-8")) / (1024 * 1024)
+    _record(results, f"split_into_articles[articles={articles}]",
+            measure(lambda: split_into_articles(text), repeat), articles, "art/s")
+
+    arts = split_into_articles(text)
+    _record(results, f"generate_fill_blanks_from_article[articles={articles}]",
+            measure(lambda: [generate_fill_blanks_from_article(a["text"], seed=a["id"]) for a in arts], repeat),
+            len(arts), "art/s")
+    _record(results, f"generate_fill_blanks_for_articles[articles={articles}]",
+            measure(lambda: generate_fill_blanks_for_articles(arts, [a["id"] for a in arts]), repeat),
+            len(arts), "art/s")
+
+    levels = [(a["text"], generate_fill_blanks_from_article(a["text"], seed=a["id"])["keywords"]) for a in arts]
+
+    def clear_caches():
+        text_format._keyword_positions.cache_clear()
+        text_format._render_blanks.cache_clear()
+
+    def render():
+        for body, keywords in levels:
+            text_format.format_text_with_blanks(body, keywords, {})
+
+    _record(results, f"format_text_with_blanks[articles={articles},cold]",
+            measure(render, repeat, setup=clear_caches), len(levels), "art/s")
+    _record(results, f"format_text_with_blanks[articles={articles},warm]",
+            measure(render, repeat), len(levels), "art/s")
+    results[f"split_into_articles[articles={articles}]"]["mb"] = mb
+
+
+def bench_pdf(results: dict, pages: int, repeat: int, workdir: str) -> None:
+    from benchmarks.synthetic import legislation_pdf
+    from src.extractor.backends import backend_for
+    from src.extractor.bundle import bundle_path, file_sha256
+    from src.extractor.pdf_extractor import extract_pdf_text
+    from src.storage.db import delete_page_texts
+    from src.ui.components import _generate_missions_for_pdf
+
+    path = os.path.join(workdir, f"synthetic_{pages}.pdf")
+    legislation_pdf(path, pages)
+    mb = os.path.getsize(path) / (1024 * 1024)
+    _record(results, f"extract_pdf_text[pages={pages}]",
+            measure(lambda: extract_pdf_text(path, cache=False), repeat), pages, "pages/s")
+    results[f"extract_pdf_text[pages={pages}]"]["mb"] = mb
+
+    # extração fria com o cache ligado: inclui a impressão digital das páginas e a gravação
+    sha = file_sha256(path)
+    _record(results, f"extract_pdf_text[pages={pages},cold-cache]",
+            measure(lambda: extract_pdf_text(path), repeat, setup=lambda: delete_page_texts(sha)), pages, "pages/s")
+    extractor = backend_for(path)
+
+    def fingerprints():
+        doc = extractor.open(path)
+        try:
+            for i in range(extractor.page_count(doc)):
+                extractor.page_fingerprint(doc, i)
+        finally:
+            extractor.close(doc)
+
+    _record(results, f"page_fingerprint[pages={pages}]", measure(fingerprints, repeat), pages, "pages/s")
+    extract_pdf_text(path)  # preenche o cache de texto por página
+    _record(results, f"extract_pdf_text[pages={pages},page-cache]",
+            measure(lambda: extract_pdf_text(path), repeat), pages, "pages/s")
+
+    bpath = bundle_path(sha)
+
+    def drop_bundle():
+        delete_page_texts(sha)
+        if os.path.exists(bpath):
+            os.remove(bpath)
+
+    name = os.path.basename(path)
+    try:
+        _record(results, f"_generate_missions_for_pdf[pages={pages},cold]",
+                measure(lambda: _generate_missions_for_pdf(path, name), repeat, setup=drop_bundle), pages, "pages/s")
+        _generate_missions_for_pdf(path, name)
+        _record(results, f"_generate_missions_for_pdf[pages={pages},bundle]",
+                measure(lambda: _generate_missions_for_pdf(path, name), repeat), pages, "pages/s")
+    finally:
+        drop_bundle()
+
+
+_IMPORT_PROBE = """
+import sys, time
+t0 = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - t0
+try:
+    import resource
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+except ImportError:
+    rss_mb = 0.0
+print(seconds, rss_mb, *[m for m in {heavy!r} if m in sys.modules])
+"""
+
+
+def bench_imports(results: dict, repeat: int) -> None:
+    """Tempo de importação a frio (processo novo) das entradas do app e os módulos pesados que elas puxam."""
+    for module in IMPORT_TARGETS:
+        times, rss, heavy = [], [], set()
+        code = _IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)
+        for _ in range(repeat):
+            out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True,
+                                 check=True, timeout=120).stdout.split()
+            times.append(float(out[0]))
+            rss.append(float(out[1]))
+            heavy.update(out[2:])
+        stats = {"seconds": median(times), "best_seconds": min(times), "peak_mb": max(rss)}
+        _record(results, f"import[{module}]", stats, 1, "imports/s")
+        stats["heavy_modules"] = sorted(heavy)
+        if heavy:
+            print(f"    ⚠ importa {', '.join(sorted(heavy))}", flush=True)
+
+
+# ========== comparação ==========
+def compare(current: dict, baseline: dict, max_slowdown: float, max_memory_growth: float) -> list[str]:
+    """
+    Casos que pioraram além dos limites. Tempo: melhor execução (menos ruidosa que a
+    mediana em casos de milissegundos); memória: pico do tracemalloc.
+    """
+    regressions = []
+    print(f"\n{'caso':<48} {'base ms':>10} {'atual ms':>10} {'Δ tempo':>9} {'Δ memória':>10}")
+    for name, cur in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        dt = cur["best_seconds"] / base["best_seconds"] - 1 if base["best_seconds"] else 0.0
+        dm = cur["peak_mb"] / base["peak_mb"] - 1 if base["peak_mb"] else 0.0
+        flag = ""
+        if dt > max_slowdown:
+            flag += " ⚠ tempo"
+            regressions.append(f"{name}: {dt:+.0%} de tempo (limite {max_slowdown:.0%})")
+        if dm > max_memory_growth:
+            flag += " ⚠ memória"
+            regressions.append(f"{name}: {dm:+.0%} de memória (limite {max_memory_growth:.0%})")
+        print(f"{name:<48} {base['best_seconds'] * 1000:10.2f} {cur['best_seconds'] * 1000:10.2f} {dt:+9.0%} {dm:+10.0%}{flag}")
+    return regressions
+
+
+def _meta() -> dict:
+    from src.extractor.backends import get_backend
+    from src.extractor.pdf_extractor import GENERATOR_VERSION
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "timestamp": time.time(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "generator_version": GENERATOR_VERSION,
+        "extract_workers": os.environ.get("PDF_EXTRACT_WORKERS"),
+        "pdf_backend": get_backend().name,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--quick", action="store_true", help="só tamanhos pequenos")
+    ap.add_argument("--articles", type=int, nargs="*", help=f"tamanhos em artigos (padrão {ARTICLE_SIZES})")
+    ap.add_argument("--pages", type=int, nargs="*", help=f"tamanhos em páginas (padrão {PAGE_SIZES})")
+    ap.add_argument("--repeat", type=int, default=3, help="execuções cronometradas por caso")
+    ap.add_argument("--out", default=os.path.join(RESULTS_DIR, "latest.json"))
+    ap.add_argument("--save-baseline", action="store_true", help="grava também results/baseline.json")
+    ap.add_argument("--compare", metavar="BASELINE", help="JSON de baseline para comparar")
+    ap.add_argument("--max-slowdown", type=float, default=float(os.environ.get("BENCH_MAX_SLOWDOWN", 0.20)),
+                    help="piora de tempo tolerada (0.20 = 20%%)")
+    ap.add_argument("--max-memory-growth", type=float, default=float(os.environ.get("BENCH_MAX_MEMORY_GROWTH", 0.20)),
+                    help="aumento de pico de memória tolerado")
+    args = ap.parse_args(argv)
+
+    articles = args.articles if args.articles is not None else (QUICK_ARTICLE_SIZES if args.quick else ARTICLE_SIZES)
+    pages = args.pages if args.pages is not None else (QUICK_PAGE_SIZES if args.quick else PAGE_SIZES)
+
+    saved_env = {k: os.environ.get(k) for k in ("GAME_DB_PATH", "GAME_BUNDLE_DIR")}
+    with tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+        # banco e bundles descartáveis: os sintéticos não entram na biblioteca de verdade
+        # nem sobrescrevem (ou apagam) o bundle real de um conteúdo
+        os.environ["GAME_DB_PATH"] = os.path.join(workdir, "bench.db")
+        os.environ["GAME_BUNDLE_DIR"] = os.path.join(workdir, "bundles")
+        if ROOT not in sys.path:
+            sys.path.insert(0, ROOT)
+
+        results: dict = {}
+        try:
+            print("importação", flush=True)
+            bench_imports(results, args.repeat)
+            for n in articles:
+                print(f"texto: {n} artigos", flush=True)
+                bench_text(results, n, args.repeat)
+            for n in pages:
+                print(f"PDF: {n} páginas", flush=True)
+                bench_pdf(results, n, args.repeat, workdir)
+        finally:
+            for k, v in saved_env.items():
+                if v is None:
+                    os.environ.pop(k, None)
+                else:
+                    os.environ[k] = v
+
+    report = {"meta": _meta(), "results": results}
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nresultados: {args.out}")
+    if args.save_baseline:
+        path = os.path.join(RESULTS_DIR, "baseline.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"baseline: {path}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.max_slowdown, args.max_memory_growth)
+        if regressions:
+            print("\nREGRESSÕES:")
+            for r in regressions:
+                print(f"  - {r}")
+            return 1
+        print("\nsem regressões")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
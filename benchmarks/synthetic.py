@@ -0,0 +1,105 @@
+import random
+
+# Legislação sintética (determinística por semente) e um escritor de PDF mínimo só com
+# a stdlib, para os benchmarks não dependerem de PDFs reais nem de reportlab.
+
+_WORDS = (
+    "servidor público mandato legislativo assembleia deputado comissão plenário sessão "
+    "votação parecer relator projeto resolução regimento interno mesa diretora presidente "
+    "secretário tesoureiro orçamento despesa receita exercício financeiro controle externo "
+    "tribunal contas licitação contrato convênio administração pública princípio legalidade "
+    "impessoalidade moralidade publicidade eficiência competência atribuição prerrogativa "
+    "requerimento emenda substitutivo proposição iniciativa sanção veto promulgação "
+    "publicação vigência revogação disposição transitória estrutura organizacional cargo "
+    "função gratificação vencimento remuneração aposentadoria pensão licença afastamento"
+).split()
+_CONNECTIVES = ("de", "da", "do", "em", "no", "na", "e", "ou", "para", "com", "pelo", "pela", "que", "a", "o")
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    out = []
+    for i in range(words):
+        out.append(rng.choice(_CONNECTIVES) if i % 3 == 2 else rng.choice(_WORDS))
+    s = " ".join(out)
+    return s[0].upper() + s[1:] + "."
+
+
+def legislation(articles: int, words_per_article: int = 120, seed: int = 0) -> str:
+    """Texto no formato 'Art. N' com parágrafos e incisos, como as resoluções da Alego."""
+    rng = random.Random(seed)
+    parts = ["RESOLUÇÃO Nº 9.999, DE 1º DE JANEIRO DE 2024", "Dispõe sobre a organização administrativa."]
+    for n in range(1, articles + 1):
+        body = [f"Art. {n}º {_sentence(rng, words_per_article // 3)}"]
+        for roman in ("I", "II", "III")[: rng.randint(0, 3)]:
+            body.append(f"{roman} - {_sentence(rng, words_per_article // 6)}")
+        if rng.random() < 0.5:
+            body.append(f"Parágrafo único. {_sentence(rng, words_per_article // 4)}")
+        parts.append("\n".join(body))
+    return "\n".join(parts)
+
+
+def _wrap(text: str, width: int) -> list[str]:
+    lines = []
+    for paragraph in text.split("\n"):
+        line = ""
+        for word in paragraph.split():
+            if line and len(line) + 1 + len(word) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = f"{line} {word}" if line else word
+        lines.append(line)
+    return lines
+
+
+def _escape(line: str) -> bytes:
+    raw = line.encode("cp1252", errors="replace")
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def write_pdf(path: str, text: str, lines_per_page: int = 48, width: int = 95, max_pages: int | None = None) -> int:
+    """Grava `text` como PDF (Helvetica, WinAnsi); devolve o número de páginas."""
+    lines = _wrap(text, width)
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)][:max_pages] or [[]]
+
+    objects: list[bytes] = []  # objeto i+1
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")  # preenchidos depois que as páginas existirem
+    pages_obj = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    kids = []
+    for page_lines in pages:
+        stream = b"BT /F1 10 Tf 12 TL 40 800 Td\n" + b"".join(b"(" + _escape(l) + b") Tj T*\n" for l in page_lines) + b"ET"
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+            % (pages_obj, font, content)
+        ))
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_obj
+    objects[pages_obj - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), len(kids)
+    )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+    return len(pages)
+
+
+def legislation_pdf(path: str, pages: int, seed: int = 0) -> int:
+    """PDF sintético com exatamente `pages` páginas (texto gerado de sobra e cortado)."""
+    # ~48 linhas/página e ~9 linhas por artigo de 120 palavras: 6 artigos/página sobram
+    text = legislation(max(1, pages * 6), seed=seed)
+    return write_pdf(path, text, max_pages=pages)
@@ -0,0 +1,6 @@
+import sys
+
+from .compile import main
+
+if __name__ == "__main__":  # no Windows (spawn) os processos filhos reimportam este módulo
+    sys.exit(main())
@@ -0,0 +1,264 @@
+import os
+import hashlib
+import importlib.util
+import weakref
+from typing import Any
+
+# Extratores de texto plugáveis. PyPDF2 é o padrão (o texto dele é o dos bundles e do
+# progresso já salvos); os mais rápidos são detectados quando instalados e escolhidos
+# com PDF_BACKEND=<nome> ou PDF_BACKEND=auto (o mais rápido disponível). Nenhum é
+# importado antes de extrair a primeira página.
+DEFAULT_BACKEND = "pypdf2"
+TEXT_SNIFF_BYTES = 1024
+FORM_DEPTH = 4      # formulários (XObject /Form) aninhados entrando na impressão digital
+
+
+class ExtractionBackend:
+    """Abre o documento uma vez e devolve o texto de cada página."""
+
+    name = ""
+    module = ""          # módulo cuja presença indica que o extrator está instalado
+    cacheable = True     # texto vai para o cache por página (src.storage.db.page_text)
+
+    def available(self) -> bool:
+        return importlib.util.find_spec(self.module) is not None
+
+    def open(self, path: str) -> Any:
+        raise NotImplementedError
+
+    def page_count(self, doc: Any) -> int:
+        raise NotImplementedError
+
+    def page_text(self, doc: Any, index: int) -> str:
+        raise NotImplementedError
+
+    def page_fingerprint(self, doc: Any, index: int) -> str | None:
+        """
+        Hash barato de tudo que decide o texto da página, sem extraí-lo: fluxo de conteúdo,
+        fontes (codificação e mapa ToUnicode) e formulários; None se o extrator não sabe
+        calcular. Páginas iguais na versão anterior do mesmo PDF reaproveitam o texto do cache.
+        """
+        return None
+
+    def close(self, doc: Any) -> None:
+        pass
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} {self.name}>"
+
+
+# resumos de fontes/formulários já calculados, por documento aberto
+_MEMOS = weakref.WeakKeyDictionary()
+
+
+def _memo(doc: Any) -> dict:
+    try:
+        return _MEMOS.setdefault(doc, {})
+    except TypeError:  # documento sem weakref: sem memo
+        return {}
+
+
+def _plain(obj: Any) -> Any:
+    """Objeto PDF com as referências resolvidas (para comparar /Encoding com /Differences)."""
+    obj = obj.get_object() if hasattr(obj, "get_object") else obj
+    if isinstance(obj, dict):
+        return sorted((str(k), _plain(v)) for k, v in obj.items())
+    if isinstance(obj, list):
+        return [_plain(v) for v in obj]
+    return obj
+
+
+class PyPDF2Backend(ExtractionBackend):
+    name = "pypdf2"
+    module = "PyPDF2"
+
+    def open(self, path: str) -> Any:
+        from PyPDF2 import PdfReader
+        return PdfReader(path)
+
+    def page_count(self, doc: Any) -> int:
+        return len(doc.pages)
+
+    def page_text(self, doc: Any, index: int) -> str:
+        return doc.pages[index].extract_text() or ""
+
+    def page_fingerprint(self, doc: Any, index: int) -> str | None:
+        page = doc.pages[index]
+        contents = page.get("/Contents")
+        if contents is None:
+            return None
+        contents = contents.get_object()
+        h = hashlib.sha256()
+        for part in contents if isinstance(contents, list) else [contents]:
+            h.update(part.get_object().get_data())
+        h.update(self._resources_digest(page.get("/Resources"), _memo(doc), FORM_DEPTH))
+        return h.hexdigest()
+
+    def _resources_digest(self, resources: Any, memo: dict, depth: int) -> bytes:
+        # fontes e formulários pelo nome usado no conteúdo; cada objeto é resumido uma
+        # vez por documento (as páginas compartilham as mesmas fontes)
+        if resources is None:
+            return b""
+        resources = resources.get_object()
+        parts = []
+        for kind in ("/Font", "/XObject"):
+            entries = resources.get(kind)
+            for name, ref in sorted((entries.get_object() if entries is not None else {}).items()):
+                key = (kind, getattr(ref, "idnum", None))
+                digest = memo.get(key) if key[1] is not None else None
+                if digest is None:
+                    obj = ref.get_object()
+                    digest = self._font_digest(obj) if kind == "/Font" else self._form_digest(obj, memo, depth)
+                    if key[1] is not None:
+                        memo[key] = digest
+                parts.append(f"{kind}{name}={digest}")
+        return "|".join(parts).encode("utf-8")
+
+    def _font_digest(self, font: Any) -> str:
+        h = hashlib.sha256()
+        for k in ("/Subtype", "/BaseFont"):
+            h.update(repr(font.get(k)).encode("utf-8"))
+        h.update(repr(_plain(font.get("/Encoding"))).encode("utf-8"))
+        cmap = font.get("/ToUnicode")
+        if cmap is not None:
+            h.update(cmap.get_object().get_data())
+        return h.hexdigest()
+
+    def _form_digest(self, xobject: Any, memo: dict, depth: int) -> str:
+        # imagens não mudam o texto: só formulários (que têm conteúdo e fontes próprios)
+        if xobject.get("/Subtype") != "/Form" or depth <= 0:
+            return "-"
+        h = hashlib.sha256(xobject.get_data())
+        h.update(self._resources_digest(xobject.get("/Resources"), memo, depth - 1))
+        return h.hexdigest()
+
+
+class PypdfBackend(PyPDF2Backend):
+    # sucessor do PyPDF2, mesma API e extração bem mais rápida
+    name = "pypdf"
+    module = "pypdf"
+
+    def open(self, path: str) -> Any:
+        from pypdf import PdfReader
+        return PdfReader(path)
+
+
+class PyMuPDFBackend(ExtractionBackend):
+    name = "pymupdf"
+    module = "fitz"
+
+    def open(self, path: str) -> Any:
+        import fitz
+        return fitz.open(path)
+
+    def page_count(self, doc: Any) -> int:
+        return doc.page_count
+
+    def page_text(self, doc: Any, index: int) -> str:
+        return doc.load_page(index).get_text() or ""
+
+    def page_fingerprint(self, doc: Any, index: int) -> str | None:
+        page = doc.load_page(index)
+        h = hashlib.sha256(page.read_contents())
+        memo = _memo(doc)
+        for xref, _, kind, basefont, name, encoding in page.get_fonts():
+            digest = memo.get(xref)
+            if digest is None:
+                d = hashlib.sha256(f"{kind}|{basefont}|{encoding}".encode("utf-8"))
+                ref = doc.xref_get_key(xref, "ToUnicode")
+                if ref[0] == "xref":
+                    d.update(doc.xref_stream(int(ref[1].split()[0])) or b"")
+                digest = memo[xref] = d.hexdigest()
+            h.update(f"|{name}={digest}".encode("utf-8"))
+        for xref, name, _, _ in page.get_xobjects():  # formulários (imagens não entram nessa lista)
+            h.update(f"|{name}=".encode("utf-8") + (doc.xref_stream(xref) or b""))
+        return h.hexdigest()
+
+    def close(self, doc: Any) -> None:
+        doc.close()
+
+
+class PdfiumBackend(ExtractionBackend):
+    name = "pypdfium2"
+    module = "pypdfium2"
+
+    def open(self, path: str) -> Any:
+        import pypdfium2
+        return pypdfium2.PdfDocument(path)
+
+    def page_count(self, doc: Any) -> int:
+        return len(doc)
+
+    def page_text(self, doc: Any, index: int) -> str:
+        page = doc[index]
+        try:
+            textpage = page.get_textpage()
+            try:
+                return textpage.get_text_range() or ""
+            finally:
+                textpage.close()
+        finally:
+            page.close()
+
+    def close(self, doc: Any) -> None:
+        doc.close()
+
+
+class TextBackend(ExtractionBackend):
+    """Arquivo de texto (ex.: create_mock_pdf grava texto com extensão .pdf); \\f separa páginas."""
+
+    name = "text"
+    module = ""
+    cacheable = False  # ler o arquivo já é mais barato que o banco
+
+    def available(self) -> bool:
+        return True
+
+    def open(self, path: str) -> list[str]:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return f.read().split("\f")
+
+    def page_count(self, doc: list[str]) -> int:
+        return len(doc)
+
+    def page_text(self, doc: list[str], index: int) -> str:
+        return doc[index]
+
+
+# do mais rápido para o mais lento (ordem usada por PDF_BACKEND=auto)
+BACKENDS: dict[str, ExtractionBackend] = {
+    b.name: b for b in (PyMuPDFBackend(), PdfiumBackend(), PypdfBackend(), PyPDF2Backend())
+}
+TEXT_BACKEND = TextBackend()
+
+
+def available_backends() -> list[str]:
+    return [name for name, b in BACKENDS.items() if b.available()]
+
+
+def get_backend(name: str | None = None) -> ExtractionBackend:
+    """
+    Extrator `name` (ou PDF_BACKEND, ou o padrão). "auto" escolhe o mais rápido instalado;
+    um nome desconhecido ou não instalado cai no primeiro disponível.
+    """
+    name = (name or os.environ.get("PDF_BACKEND", "") or DEFAULT_BACKEND).strip().lower()
+    installed = available_backends()
+    if not installed:
+        raise RuntimeError("Nenhum extrator de PDF disponível. Instale PyPDF2.")
+    if name == "auto" or name not in installed:
+        name = DEFAULT_BACKEND if name != "auto" and DEFAULT_BACKEND in installed else installed[0]
+    return BACKENDS[name]
+
+
+def is_text_file(path: str) -> bool:
+    """Sem cabeçalho %PDF- e sem bytes nulos no início: texto puro."""
+    with open(path, "rb") as f:
+        head = f.read(TEXT_SNIFF_BYTES)
+    return b"%PDF-" not in head and b"\x00" not in head
+
+
+def backend_for(path: str, name: str | None = None) -> ExtractionBackend:
+    """Extrator para o arquivo: texto puro vai direto pelo TextBackend."""
+    if path.lower().endswith(".txt") or is_text_file(path):
+        return TEXT_BACKEND
+    return get_backend(name)
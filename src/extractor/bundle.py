@@ -0,0 +1,279 @@
+import os, glob, json, hashlib, threading, time
+from collections import OrderedDict
+from typing import Any, Iterator
+
+from .pdf_extractor import GENERATOR_VERSION, iter_pdf_pages, iter_articles
+from .mission import CompactMission, compact_mission, mission_key, pack_missions, unpack_missions
+from src.telemetry.trace import span, traced
+
+# ========== caminhos ==========
+def bundle_dir() -> str:
+    # GAME_BUNDLE_DIR sobrescreve (ex.: benchmarks num diretório temporário)
+    d = os.environ.get("GAME_BUNDLE_DIR", "").strip()
+    d = d or os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "bundles")  # .../src/data/bundles
+    os.makedirs(d, exist_ok=True)
+    return d
+
+def bundle_path(sha: str) -> str:
+    return os.path.join(bundle_dir(), f"{sha}-v{GENERATOR_VERSION}.json")
+
+def bundle_files(sha: str | None = None) -> list[str]:
+    """Bundles em disco do conteúdo `sha` (de todos, com None), de qualquer versão do gerador."""
+    return glob.glob(os.path.join(bundle_dir(), f"{sha or '*'}-v*.json"))
+
+def remove_stale_bundles(sha: str | None = None) -> int:
+    """Apaga os bundles de outras versões do gerador (de `sha`, ou de todos); devolve quantos."""
+    current = f"-v{GENERATOR_VERSION}.json"
+    removed = 0
+    for p in bundle_files(sha):
+        if p.endswith(current):
+            continue
+        try:
+            os.remove(p)
+            removed += 1
+        except OSError:
+            pass  # outro worker apagou antes
+    return removed
+
+def collect_content(sha: str) -> bool:
+    """
+    Apaga do banco e do disco o que foi gerado para o conteúdo `sha` (bundles de todas as
+    versões, texto das páginas, índice de busca) se nenhum documento o usa mais.
+    """
+    from src.storage import db
+    paths = db.collect_unreferenced(sha)
+    if paths is None:
+        return False
+    for p in {*bundle_files(sha), *paths}:
+        try:
+            os.remove(p)
+        except OSError:
+            pass  # já apagado
+    return True
+
+# ========== hash do conteúdo ==========
+# memo em processo: (caminho, mtime, tamanho) -> sha256, evita reler o PDF a cada clique;
+# LRU limitado (cada reenvio/alteração gera uma chave nova)
+MAX_SHA_MEMO = 1024
+_SHA_MEMO: OrderedDict[tuple[str, float, int], str] = OrderedDict()
+_SHA_MEMO_LOCK = threading.Lock()
+
+@traced()
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 dos bytes do arquivo (lido em blocos)."""
+    st_ = os.stat(path)
+    key = (os.path.abspath(path), st_.st_mtime, st_.st_size)
+    with _SHA_MEMO_LOCK:
+        sha = _SHA_MEMO.get(key)
+        if sha is not None:
+            _SHA_MEMO.move_to_end(key)
+            return sha
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    sha = h.hexdigest()
+    with _SHA_MEMO_LOCK:
+        _SHA_MEMO[key] = sha
+        while len(_SHA_MEMO) > MAX_SHA_MEMO:
+            _SHA_MEMO.popitem(last=False)
+    return sha
+
+# ========== geração ==========
+def seed_for(pdf_name: str, article_key: int | str) -> int:
+    h = hashlib.sha256(f"{pdf_name}:{article_key}".encode("utf-8")).hexdigest()
+    return int(h[:16], 16)
+
+def iter_missions(pdf_path: str, pdf_name: str, progress: dict | None = None,
+                  reuse: dict[str, CompactMission] | None = None,
+                  previous: str | None = None) -> Iterator[CompactMission]:
+    """
+    Gera as missões em fluxo: cada artigo vira missão assim que é fechado.
+    A chave (mission_key) e a semente vêm do texto do artigo, não da posição: artigo
+    igual em outra versão do documento dá a mesma missão. Em `reuse` ({chave: missão}
+    da versão anterior) o artigo inalterado aproveita as lacunas já sorteadas; com
+    `previous` (sha256 dessa versão), as páginas inalteradas aproveitam o texto extraído.
+    Artigos repetidos são descartados aqui, uma vez só, para que o mapa e o jogo
+    usem a mesma lista e os mesmos índices.
+    Se `progress` for dado, atualiza progress["pages"], ["articles"] e ["reused"].
+    """
+    def pages():
+        for page in iter_pdf_pages(pdf_path, previous=previous):
+            if progress is not None:
+                progress["pages"] = progress.get("pages", 0) + 1
+            yield page
+
+    order = 1
+    seen: set[str] = set()
+    for art in iter_articles(pages()):
+        if progress is not None:
+            progress["articles"] = progress.get("articles", 0) + 1
+        text = art["text"]
+        key = mission_key(text)
+        if key in seen:
+            continue
+        seen.add(key)
+        seed = seed_for(pdf_name, key)
+        old = reuse.get(key) if reuse else None
+        if old is not None and old.seed == seed and old.text == text:
+            # aponta para o buffer antigo (mesmo texto): lacunas e tokens vêm prontos
+            mission = CompactMission(order, art["title"], old.buf, old.base, old.end, seed,
+                                     old._blanks, old._options, old.tokens, key=key)
+            if progress is not None:
+                progress["reused"] = progress.get("reused", 0) + 1
+        else:
+            mission = compact_mission(order, art["title"], text, seed, key=key)
+            if mission is None:
+                continue
+        yield mission
+        order += 1
+
+def previous_missions(sha: str, pdf_name: str) -> dict[str, CompactMission]:
+    """
+    {chave: missão} do bundle mais recente com o mesmo nome e outro conteúdo (versão
+    anterior de uma resolução alterada); vazio se não houver.
+    """
+    try:
+        from src.storage.db import previous_bundle_sha
+        old_sha = previous_bundle_sha(pdf_name, GENERATOR_VERSION, exclude_sha=sha)
+    except Exception:
+        return {}
+    bundle = load_bundle(old_sha, pdf_name) if old_sha else None
+    return {m.key: m for m in bundle["missions"]} if bundle else {}
+
+def previous_content(sha: str, pdf_name: str) -> str | None:
+    """
+    sha256 da versão anterior do mesmo PDF (último bundle com este nome, de qualquer
+    versão do gerador: o texto das páginas não depende dela); None se não houver.
+    """
+    try:
+        from src.storage.db import previous_bundle_sha
+        return previous_bundle_sha(pdf_name, None, exclude_sha=sha)
+    except Exception:
+        return None
+
+def build_missions(pdf_path: str, pdf_name: str) -> list[CompactMission]:
+    """Extrai, divide em artigos e gera as lacunas de cada missão."""
+    return list(iter_missions(pdf_path, pdf_name))
+
+# ========== bundle persistido ==========
+@traced()
+def load_bundle(sha: str, pdf_name: str) -> dict[str, Any] | None:
+    """
+    Lê o bundle do conteúdo `sha`; None se ausente, corrompido ou de outra versão.
+    bundle["missions"] já vem como CompactMission sobre um único buffer de texto.
+    """
+    p = bundle_path(sha)
+    if not os.path.exists(p):
+        return None
+    try:
+        with open(p, "r", encoding="utf-8") as f:
+            bundle = json.load(f)
+    except Exception:
+        return None
+    if bundle.get("version") != GENERATOR_VERSION or bundle.get("sha256") != sha:
+        return None
+    # as sementes dependem do nome do PDF; outro nome => outras lacunas
+    if bundle.get("seed_name") != pdf_name:
+        return None
+    try:
+        bundle["missions"] = unpack_missions(bundle)
+    except (KeyError, TypeError):
+        return None
+    bundle.pop("text", None)
+    bundle.pop("tokens", None)
+    return bundle
+
+def bundle_is_current(sha: str, pdf_name: str) -> bool:
+    """Já existe bundle desta versão para `sha` compilado com `pdf_name` (sem desempacotar as missões)."""
+    if not os.path.exists(bundle_path(sha)):
+        return False
+    try:
+        from src.storage.db import bundle_seed_name
+        seed_name = bundle_seed_name(sha, GENERATOR_VERSION)
+    except Exception:
+        seed_name = None
+    if seed_name is not None:
+        return seed_name == pdf_name
+    bundle = load_bundle(sha, pdf_name)
+    if bundle is None:
+        return False
+    save_bundle(sha, pdf_name, bundle["missions"], bundle)  # bundle anterior ao banco: registra
+    return True
+
+@traced()
+def save_bundle(sha: str, pdf_name: str, missions: list[CompactMission], stats: dict | None = None) -> str:
+    """
+    Grava o bundle de forma atômica (arquivo temporário + replace).
+    `stats` ({pages, articles} da extração) vai junto, para a biblioteca listar sem reabrir o PDF.
+    """
+    p = bundle_path(sha)
+    stats = stats or {}
+    payload = {
+        "version": GENERATOR_VERSION,
+        "sha256": sha,
+        "seed_name": pdf_name,
+        "created": time.time(),
+        "missions_count": len(missions),
+        "pages": stats.get("pages"),
+        "articles": stats.get("articles"),
+        **pack_missions(missions),
+    }
+    tmp = f"{p}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, p)
+    remove_stale_bundles(sha)  # a versão nova substitui as anteriores do mesmo conteúdo
+    try:
+        from src.storage.db import record_bundle
+        record_bundle(
+            sha, GENERATOR_VERSION, pdf_name, p, [(m.id, m.title, m.seed, m.key) for m in missions],
+            pages=stats.get("pages"), articles=stats.get("articles"),
+        )
+        from src.storage.search import index_missions
+        index_missions(sha, missions)
+    except Exception:
+        pass  # registro e índice de busca são só metadado; o bundle em disco já basta para carregar
+    return p
+
+@traced()
+def load_or_build_missions(pdf_path: str, pdf_name: str, force: bool = False) -> list[CompactMission]:
+    """
+    Retorna as missões do PDF a partir do bundle em disco.
+    Só recompila quando o conteúdo (SHA-256) ou GENERATOR_VERSION mudam, ou com force=True.
+    """
+    sha = file_sha256(pdf_path)
+    if not force:
+        bundle = load_bundle(sha, pdf_name)
+        if bundle is not None:
+            return bundle["missions"]
+    stats: dict = {}
+    missions = list(iter_missions(pdf_path, pdf_name, progress=stats, reuse=previous_missions(sha, pdf_name),
+                                  previous=previous_content(sha, pdf_name)))
+    try:
+        save_bundle(sha, pdf_name, missions, stats)
+    except OSError:
+        pass  # cache é opcional; sem disco gravável seguimos com as missões em memória
+    return missions
+
+def fill_missions(pdf_path: str, pdf_name: str, out: list[CompactMission], status: dict) -> None:
+    """
+    Compila as missões anexando-as em `out` conforme ficam prontas e grava o bundle no fim.
+    Pensado para rodar numa thread: só mexe em `out` e `status` (done/error/pages/articles).
+    """
+    try:
+        sha = file_sha256(pdf_path)
+        with span("bundle.compile", doc=pdf_name) as compile_span:
+            reuse = previous_missions(sha, pdf_name)
+            previous = previous_content(sha, pdf_name)
+            for mission in iter_missions(pdf_path, pdf_name, progress=status, reuse=reuse, previous=previous):
+                out.append(mission)
+            compile_span.set(pages=status.get("pages"), missions=len(out), reused=status.get("reused", 0))
+        try:
+            save_bundle(sha, pdf_name, out, status)
+        except OSError:
+            pass
+    except Exception as e:
+        status["error"] = str(e)
+    finally:
+        status["done"] = True
@@ -0,0 +1,135 @@
+"""
+Compilação offline (deploy): registra os PDFs de um diretório na biblioteca e grava os
+bundles prontos, para nenhum aluno pagar a primeira compilação.
+
+    python -m src.extractor compile src/data/            # só o que mudou (por SHA-256)
+    python -m src.extractor compile pdfs/ --workers 4 --force
+    python -m src.extractor compile pdfs/ --no-register   # só bundles, nome = nome do arquivo
+
+Sai com código 1 se algum PDF falhar.
+"""
+import os, sys, time, argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+def find_pdfs(root: str, recursive: bool = True) -> list[str]:
+    """PDFs em `root` (ordenados), descendo nos subdiretórios se `recursive`."""
+    if os.path.isfile(root):
+        return [root] if root.lower().endswith(".pdf") else []
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        found.extend(os.path.join(dirpath, f) for f in sorted(filenames) if f.lower().endswith(".pdf"))
+        if not recursive:
+            break
+    return found
+
+
+def _limit_extract_workers() -> None:
+    # cada PDF já roda num processo do pool; sem isso cada um abriria outro pool de páginas
+    os.environ["PDF_EXTRACT_WORKERS"] = "1"
+
+
+def compile_pdf(pdf_path: str, pdf_name: str, force: bool = False) -> dict:
+    """Compila um PDF (roda no processo filho); pula se o bundle da versão atual já existe."""
+    from .bundle import bundle_is_current, file_sha256, load_or_build_missions
+    t0 = time.perf_counter()
+    result = {"name": pdf_name, "path": pdf_path, "status": "skipped", "missions": None, "error": None}
+    try:
+        result["sha256"] = sha = file_sha256(pdf_path)
+        if force or not bundle_is_current(sha, pdf_name):
+            result["missions"] = len(load_or_build_missions(pdf_path, pdf_name, force=True))
+            result["status"] = "compiled"
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - t0
+    return result
+
+
+def _register(pdf_path: str) -> tuple[str, str]:
+    """Guarda o PDF no repositório de uploads; devolve (caminho do conteúdo, nome canônico)."""
+    from src.storage.uploads import store_upload
+    with open(pdf_path, "rb") as f:
+        stored = store_upload(f, os.path.basename(pdf_path), max_bytes=sys.maxsize)
+    return stored.path, stored.canonical
+
+
+def compile_directory(root: str, workers: int | None = None, force: bool = False,
+                      register: bool = True, recursive: bool = True, log=print) -> list[dict]:
+    """
+    Compila todos os PDFs de `root` num pool de processos. Com `register`, os PDFs entram
+    na biblioteca (mesmo caminho do upload, então o mesmo conteúdo com outro nome vira
+    apelido e é compilado uma vez, com o nome canônico).
+    """
+    jobs: dict[tuple[str, str], str] = {}  # (caminho, nome) -> arquivo de origem
+    for path in find_pdfs(root, recursive):
+        if register:
+            content_path, name = _register(path)
+        else:
+            content_path, name = os.path.abspath(path), os.path.basename(path)
+        jobs.setdefault((content_path, name), path)
+    if not jobs:
+        log(f"nenhum PDF em {root}")
+        return []
+
+    workers = max(1, workers or os.cpu_count() or 1)
+    results = []
+    if workers == 1 or len(jobs) == 1:
+        # um processo só: a extração de cada PDF ainda usa o pool de páginas
+        for content_path, name in jobs:
+            results.append(compile_pdf(content_path, name, force))
+            _report(results[-1], log)
+    else:
+        from .pdf_extractor import process_context
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), initializer=_limit_extract_workers,
+                                 mp_context=process_context()) as pool:
+            futures = [pool.submit(compile_pdf, content_path, name, force) for content_path, name in jobs]
+            for fut in as_completed(futures):
+                results.append(fut.result())
+                _report(results[-1], log)
+
+    if register:
+        from src.storage.db import upsert_document
+        from src.storage.journal import carry_over_progress
+        from .bundle import collect_content
+        for r in results:
+            if r["missions"] is not None:
+                previous = upsert_document(r["name"], r["path"], r["missions"], sha256=r["sha256"])
+                if previous and previous != r["sha256"]:
+                    carry_over_progress(r["name"], previous, r["sha256"])
+                    collect_content(previous)
+    return results
+
+
+def _report(result: dict, log) -> None:
+    detail = {
+        "compiled": f"{result['missions']} missões",
+        "skipped": "sem mudanças",
+        "error": result["error"],
+    }[result["status"]]
+    log(f"  {result['status']:<9} {result['name']:<40} {result['seconds']:7.2f} s  {detail}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m src.extractor", description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="command", required=True)
+    cp = sub.add_parser("compile", help="compila os PDFs de um diretório em bundles")
+    cp.add_argument("root", help="diretório (ou arquivo) com os PDFs")
+    cp.add_argument("--workers", type=int, default=None, help="processos (padrão: nº de CPUs)")
+    cp.add_argument("--force", action="store_true", help="recompila mesmo com bundle atual")
+    cp.add_argument("--no-register", action="store_true", help="não adiciona os PDFs à biblioteca")
+    cp.add_argument("--no-recursive", action="store_true", help="não desce nos subdiretórios")
+    args = ap.parse_args(argv)
+
+    from .pdf_extractor import GENERATOR_VERSION
+    print(f"compilando {args.root} (gerador v{GENERATOR_VERSION})", flush=True)
+    t0 = time.perf_counter()
+    results = compile_directory(args.root, workers=args.workers, force=args.force,
+                                register=not args.no_register, recursive=not args.no_recursive,
+                                log=lambda msg: print(msg, flush=True))
+    by_status = {s: sum(r["status"] == s for r in results) for s in ("compiled", "skipped", "error")}
+    print(f"{by_status['compiled']} compilados, {by_status['skipped']} sem mudanças, "
+          f"{by_status['error']} com erro em {time.perf_counter() - t0:.1f} s")
+    return 1 if by_status["error"] else 0
@@ -0,0 +1,148 @@
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from itertools import chain
+from random import Random
+from typing import Iterable
+
+from .tokens import TokenIndex
+
+# Distratores confundíveis: palavras do próprio artigo com a mesma terminação (morfologia),
+# o mesmo começo ou o mesmo tamanho da resposta. O índice agrupa as ocorrências do
+# TokenIndex inteiro (um por documento, compartilhado pelos artigos) em baldes; cada
+# balde é a lista ordenada dos tokens, então o trecho do artigo sai por bisect e cada
+# sorteio é um índice aleatório nesse trecho, sem montar pool por artigo. Só o texto do
+# artigo entra na conta: a missão sorteia igual com o índice do artigo ou do documento.
+SUFFIXES = frozenset((
+    "ção", "ções", "são", "sões", "mente", "idade", "dade", "ável", "ível", "ismo", "ista",
+    "ância", "ência", "ante", "ente", "inte", "mento", "ado", "ada", "ados", "adas", "ido",
+    "ida", "idos", "idas", "oso", "osa", "ivo", "iva", "ivos", "ivas", "al", "ais", "ar",
+    "er", "ir", "ia",
+))
+SUFFIX_LENGTHS = sorted({len(s) for s in SUFFIXES}, reverse=True)  # terminação mais longa primeiro
+PREFIX_LEN = 3
+SUFFIX_LEN = 3              # sem terminação conhecida: as últimas letras
+MIN_LEN = 5                 # letras da palavra candidata (como nas lacunas)
+RETRIES = 4                 # sorteios rejeitados (palavra já usada) antes de ir ao próximo balde
+ARRAY_MIN = 64              # baldes maiores que isto viram array("I")
+
+
+@lru_cache(maxsize=1 << 16)
+def word_buckets(word: str) -> tuple[str, str, str]:
+    """Baldes da palavra (minúscula), do mais para o menos confundível: terminação, começo, tamanho."""
+    ending = None
+    for n in SUFFIX_LENGTHS:
+        if len(word) > n + 1 and word[-n:] in SUFFIXES:
+            ending = "m" + word[-n:]
+            break
+    return ending or "s" + word[-SUFFIX_LEN:], "p" + word[:PREFIX_LEN], f"l{len(word)}"
+
+
+class DistractorIndex:
+    """
+    {balde: tokens (ordenados)} das palavras que podem virar opção: as candidatas a
+    lacuna (MIN_LEN+ letras, não tudo maiúsculo).
+    """
+
+    __slots__ = ("buckets", "_vocab")
+
+    def __init__(self, tokens: TokenIndex, positions: Iterable[int] | None = None,
+                 wanted: set[str] | None = None):
+        # positions/wanted: só estes tokens e baldes (índice de um artigo, usado uma vez)
+        vocab = tokens.vocab
+        if positions is None:
+            starts, ends, upper = tokens.starts, tokens.ends, tokens.upper
+            positions = (i for i in range(len(tokens)) if not upper[i] and ends[i] - starts[i] >= MIN_LEN)
+        word_ids = tokens.word_ids
+        by_word: dict[int, list[int]] = {}
+        for i in positions:
+            occ = by_word.get(word_ids[i])
+            if occ is None:
+                by_word[word_ids[i]] = [i]
+            else:
+                occ.append(i)
+        parts: dict[str, list[list[int]]] = {}
+        for wid, occ in by_word.items():
+            for key in word_buckets(vocab[wid]):
+                if wanted is None or key in wanted:
+                    parts.setdefault(key, []).append(occ)
+        buckets = {}
+        for key, lists in parts.items():
+            merged = lists[0] if len(lists) == 1 else sorted(chain.from_iterable(lists))
+            # baldes grandes (índice do documento inteiro) em array: bem menos memória no cache
+            buckets[key] = array("I", merged) if len(merged) > ARRAY_MIN else merged
+        self.buckets = buckets
+        self._vocab = vocab
+
+    def keys(self, word_id: int) -> tuple[str, str, str]:
+        return word_buckets(self._vocab[word_id])
+
+    def pick(self, key: str, lo: int, hi: int, rng: Random, accept) -> int | None:
+        """Token do balde `key` entre os tokens [lo, hi) aceito por `accept`; None se não achar."""
+        postings = self.buckets.get(key)
+        if postings is None:
+            return None
+        a, b = bisect_left(postings, lo), bisect_left(postings, hi)
+        n = b - a
+        if n <= RETRIES:
+            # trecho curto (muitas vezes só a própria resposta): percorre todo, a partir de um ponto sorteado
+            start = int(rng.random() * n) if n else 0
+            for j in range(n):
+                t = postings[a + (start + j) % n]
+                if accept(t):
+                    return t
+            return None
+        for _ in range(RETRIES):
+            t = postings[a + int(rng.random() * n)]
+            if accept(t):
+                return t
+        return None
+
+
+def distractor_index(tokens: TokenIndex) -> DistractorIndex:
+    """Índice de distratores do TokenIndex, montado uma vez e guardado nele."""
+    index = tokens._distractors
+    if index is None:
+        index = tokens._distractors = DistractorIndex(tokens)  # corrida inofensiva: resultado igual
+    return index
+
+
+def pick_distractors(tokens: TokenIndex, token_lo: int, token_hi: int, answers: list[int],
+                     candidates: list[int], min_len: int, count: int, rng: Random) -> list[int]:
+    """
+    Até `count` tokens distintos do artigo (tokens [token_lo, token_hi)) para as opções,
+    cada um parecido com uma das respostas (`answers`, tokens das lacunas, em rodízio).
+    `candidates` são os tokens do artigo que podiam ser lacuna (com `min_len`+ letras);
+    sem parecidos suficientes, completa com eles.
+    """
+    word_ids = tokens.word_ids
+    used = {word_ids[t] for t in answers}
+
+    def accept(t: int) -> bool:
+        return word_ids[t] not in used
+
+    picks: list[int] = []
+    if min_len >= MIN_LEN:  # artigo só com palavras curtas: os baldes não têm nenhuma
+        if token_lo == 0 and token_hi == len(tokens):
+            # o TokenIndex é só deste artigo (missão ainda sem o do documento): baldes das respostas
+            wanted = {key for t in answers for key in word_buckets(tokens.vocab[word_ids[t]])}
+            index = DistractorIndex(tokens, candidates, wanted)
+        else:
+            index = distractor_index(tokens)
+        for k in range(count):
+            answer = answers[k % len(answers)]
+            for key in index.keys(word_ids[answer]):
+                t = index.pick(key, token_lo, token_hi, rng, accept)
+                if t is not None:
+                    picks.append(t)
+                    used.add(word_ids[t])
+                    break
+    if len(picks) < count:
+        # poucas palavras parecidas: 1ª ocorrência das candidatas que sobraram, na ordem do texto
+        rest = []
+        for t in candidates:
+            if word_ids[t] not in used:
+                used.add(word_ids[t])
+                rest.append(t)
+        picks.extend(rng.sample(rest, min(count - len(picks), len(rest))))
+    return picks
@@ -0,0 +1,140 @@
+import os, sys, threading
+from collections import OrderedDict
+
+from .bundle import load_bundle
+from .mission import CompactMission
+from src.telemetry.trace import count
+
+# Teto padrão de memória do cache compartilhado (DOC_CACHE_MB sobrescreve)
+DEFAULT_CACHE_MB = 256
+
+
+def estimate_missions_size(missions: list[CompactMission]) -> int:
+    """Estimativa (bytes) das missões: buffers de texto (contados uma vez) + dados de cada missão."""
+    total = sys.getsizeof(missions)
+    buffers: dict[int, int] = {}
+    for m in missions:
+        buffers.setdefault(id(m.buf), sys.getsizeof(m.buf))
+        total += m.nbytes()
+    return total + sum(buffers.values())
+
+
+class DocumentCache:
+    """
+    Cache de documentos compilados compartilhado por todas as sessões do processo.
+    As sessões guardam só o doc_id; as missões ficam aqui uma única vez, somente leitura.
+    Acima de `max_bytes` os documentos menos usados recentemente são descartados.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._docs: OrderedDict[str, tuple[list[CompactMission], int]] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, doc_id: str) -> list[CompactMission] | None:
+        with self._lock:
+            entry = self._docs.get(doc_id)
+            if entry is None:
+                self.misses += 1
+                count("doc_cache.miss")
+                return None
+            self._docs.move_to_end(doc_id)
+            self.hits += 1
+            count("doc_cache.hit")
+            return entry[0]
+
+    def put(self, doc_id: str, missions: list[CompactMission]) -> None:
+        size = estimate_missions_size(missions)
+        with self._lock:
+            old = self._docs.pop(doc_id, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._docs[doc_id] = (missions, size)
+            self._bytes += size
+            # nunca descarta o recém-inserido, mesmo que sozinho passe do teto
+            while self._bytes > self.max_bytes and len(self._docs) > 1:
+                _, (_, evicted) = self._docs.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+                count("doc_cache.eviction")
+
+    def __contains__(self, doc_id: str) -> bool:
+        # não conta como acerto nem mexe na ordem de uso
+        with self._lock:
+            return doc_id in self._docs
+
+    def discard(self, doc_id: str) -> None:
+        with self._lock:
+            old = self._docs.pop(doc_id, None)
+            if old is not None:
+                self._bytes -= old[1]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "documents": len(self._docs),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_CACHE: DocumentCache | None = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_document_cache() -> DocumentCache:
+    """DocumentCache único do processo."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            env = os.environ.get("DOC_CACHE_MB", "")
+            mb = int(env) if env.strip().isdigit() and int(env) > 0 else DEFAULT_CACHE_MB
+            _CACHE = DocumentCache(max_bytes=mb * 1024 * 1024)
+        return _CACHE
+
+
+def document_id(sha: str, pdf_name: str) -> str:
+    # o nome faz parte da identidade porque as sementes das lacunas dependem dele
+    return f"{sha}:{pdf_name}"
+
+
+def load_document(doc_id: str) -> list[CompactMission] | None:
+    """Missões do documento: do cache, ou do bundle em disco (e então cacheadas)."""
+    cache = get_document_cache()
+    missions = cache.get(doc_id)
+    if missions is None:
+        sha, _, pdf_name = doc_id.partition(":")
+        bundle = load_bundle(sha, pdf_name)
+        if bundle is None:
+            return None
+        missions = bundle["missions"]
+        cache.put(doc_id, missions)
+    return missions
+
+
+def preload_documents(doc_ids: list[str], fill: float = 0.5) -> int:
+    """
+    Carrega bundles já compilados no cache até `fill` do teto (sem despejar nada);
+    devolve quantos documentos entraram. Pensado para o início do processo.
+    """
+    cache = get_document_cache()
+    loaded = 0
+    for doc_id in doc_ids:
+        if cache.stats()["bytes"] >= cache.max_bytes * fill:
+            break
+        if doc_id in cache:
+            continue
+        sha, _, pdf_name = doc_id.partition(":")
+        bundle = load_bundle(sha, pdf_name)
+        if bundle is not None:
+            cache.put(doc_id, bundle["missions"])
+            loaded += 1
+    count("doc_cache.preload", loaded)
+    return loaded
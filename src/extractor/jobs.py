@@ -0,0 +1,96 @@
+import os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+from .bundle import file_sha256, fill_missions
+from .doc_cache import document_id, get_document_cache
+from .mission import CompactMission
+
+# Compilações simultâneas no processo (cada uma ainda pode usar o pool de extração de páginas)
+DEFAULT_JOB_WORKERS = 2
+
+
+class MissionJob:
+    """Compilação de um PDF em andamento; `missions` cresce conforme os artigos ficam prontos."""
+
+    def __init__(self, doc_id: str, pdf_path: str, pdf_name: str):
+        self.doc_id = doc_id
+        self.pdf_path = pdf_path
+        self.pdf_name = pdf_name
+        self.missions: list[CompactMission] = []
+        self.status = {"done": False, "error": None, "pages": 0, "articles": 0}
+        self.waiters = 1
+        self.started = time.time()
+
+    @property
+    def done(self) -> bool:
+        return self.status["done"]
+
+    @property
+    def error(self) -> str | None:
+        return self.status["error"]
+
+    def progress(self) -> dict:
+        return {
+            "name": self.pdf_name,
+            "pages": self.status["pages"],
+            "articles": self.status["articles"],
+            "missions": len(self.missions),
+            "waiters": self.waiters,
+            "done": self.done,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    Fila de compilação compartilhada por todas as sessões do processo.
+    Jobs em andamento são deduplicados pelo doc_id (hash do arquivo + nome): quem pedir
+    o mesmo PDF recebe o mesmo MissionJob e a mesma lista de missões. Ao terminar, as
+    missões vão para o DocumentCache compartilhado.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_JOB_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="missions")
+        self._lock = threading.Lock()
+        self._jobs: dict[str, MissionJob] = {}
+
+    def submit(self, pdf_path: str, pdf_name: str) -> MissionJob:
+        doc_id = document_id(file_sha256(pdf_path), pdf_name)
+        with self._lock:
+            job = self._jobs.get(doc_id)
+            if job is not None:
+                job.waiters += 1
+                return job
+            job = MissionJob(doc_id, pdf_path, pdf_name)
+            self._jobs[doc_id] = job
+        self._pool.submit(self._run, job)
+        return job
+
+    def _run(self, job: MissionJob) -> None:
+        try:
+            fill_missions(job.pdf_path, job.pdf_name, job.missions, job.status)
+            if not job.error:
+                get_document_cache().put(job.doc_id, job.missions)
+        finally:
+            # terminado: novos pedidos passam a ler o bundle gravado em disco
+            with self._lock:
+                self._jobs.pop(job.doc_id, None)
+
+    def active(self) -> list[MissionJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+
+_MANAGER: JobManager | None = None
+_MANAGER_LOCK = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """JobManager único do processo (MISSION_JOB_WORKERS define o nº de workers)."""
+    global _MANAGER
+    with _MANAGER_LOCK:
+        if _MANAGER is None:
+            env = os.environ.get("MISSION_JOB_WORKERS", "")
+            workers = int(env) if env.strip().isdigit() and int(env) > 0 else DEFAULT_JOB_WORKERS
+            _MANAGER = JobManager(max_workers=workers)
+        return _MANAGER
@@ -0,0 +1,238 @@
+import sys
+import hashlib
+import threading
+from array import array
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterable, Iterator
+
+from .pdf_extractor import fill_blank_spans, fill_blank_spans_indexed, has_blank_candidates
+from .tokens import TokenIndex, TokenIndexBuilder
+
+_MISSION_KEYS = ("id", "key", "title", "data", "completed")
+_DATA_KEYS = ("text_segments", "keywords", "options")
+
+
+class CompactMission(Mapping):
+    """
+    Missão guardada como posições num buffer de texto compartilhado.
+    `buf[base:end]` é o texto do artigo; `blanks` e `options` são pares (início, fim)
+    relativos a `base`, em arrays de inteiros. Os trechos só viram str quando lidos.
+    As lacunas em si só são sorteadas (com `seed`) no primeiro acesso e ficam memorizadas:
+    o mapa precisa apenas de id/título. `tokens` é o TokenIndex do buffer, compartilhado
+    pelas missões do documento (None: o artigo é tokenizado na hora de sortear).
+    `key` (mission_key) identifica o artigo entre versões do documento; `id` é o número
+    da missão (1 = primeira; a posição no mapa é id - 1).
+    Também se comporta como o dict antigo: m["title"], m.get("data", {}).get("keywords").
+    """
+
+    __slots__ = ("id", "key", "title", "buf", "base", "end", "seed", "tokens", "_blanks", "_options")
+
+    def __init__(
+        self, id: int, title: str, buf: str, base: int, end: int, seed: int | None,
+        blanks: array | None = None, options: array | None = None, tokens: TokenIndex | None = None,
+        key: str | None = None,
+    ):
+        self.id = id
+        self.key = key or mission_key(buf[base:end])
+        self.title = title
+        self.buf = buf
+        self.base = base
+        self.end = end
+        self.seed = seed
+        self.tokens = tokens
+        self._blanks = blanks
+        self._options = options
+
+    # ----- lacunas sob demanda -----
+    @property
+    def materialized(self) -> bool:
+        return self._blanks is not None
+
+    def materialize(self) -> "CompactMission":
+        """Sorteia lacunas/opções (idempotente; seguro em threads: o resultado é determinístico)."""
+        if self._blanks is None:
+            if self.tokens is not None:
+                blanks, options = fill_blank_spans_indexed(self.tokens, self.base, self.end, seed=self.seed)
+            else:
+                blanks, options = fill_blank_spans(self.text, seed=self.seed)
+            self._options = array("I", [p for span in options for p in span])
+            self._blanks = array("I", [p for span in blanks for p in span])
+        return self
+
+    @property
+    def blanks(self) -> array:
+        return self.materialize()._blanks
+
+    @property
+    def options(self) -> array:
+        return self.materialize()._options
+
+    # ----- conteúdo materializado sob demanda -----
+    @property
+    def text(self) -> str:
+        return self.buf[self.base:self.end]
+
+    def _slices(self, flat: array) -> list[str]:
+        b, buf = self.base, self.buf
+        return [buf[b + flat[i]:b + flat[i + 1]] for i in range(0, len(flat), 2)]
+
+    @property
+    def keywords(self) -> list[str]:
+        return self._slices(self.blanks)
+
+    @property
+    def option_words(self) -> list[str]:
+        return self._slices(self.options)
+
+    @property
+    def text_segments(self) -> list[str]:
+        b, buf, flat = self.base, self.buf, self.blanks
+        segments, cursor = [], b
+        for i in range(0, len(flat), 2):
+            segments.append(buf[cursor:b + flat[i]])
+            cursor = b + flat[i + 1]
+        segments.append(buf[cursor:self.end])
+        return segments
+
+    def nbytes(self) -> int:
+        """Memória própria da missão (sem contar o buffer compartilhado)."""
+        total = sys.getsizeof(self) + sys.getsizeof(self.title) + sys.getsizeof(self.key)
+        if self._blanks is not None:
+            total += sys.getsizeof(self._blanks) + sys.getsizeof(self._options)
+        return total
+
+    # ----- visão compatível com dict -----
+    def __getitem__(self, key: str) -> Any:
+        if key == "id":
+            return self.id
+        if key == "key":
+            return self.key
+        if key == "title":
+            return self.title
+        if key == "completed":
+            return False
+        if key == "data":
+            return MissionData(self)
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(_MISSION_KEYS)
+
+    def __len__(self) -> int:
+        return len(_MISSION_KEYS)
+
+    def __repr__(self) -> str:
+        return f"CompactMission(id={self.id!r}, title={self.title!r}, materialized={self.materialized})"
+
+
+class MissionData(Mapping):
+    """Visão {text_segments, keywords, options} de uma CompactMission."""
+
+    __slots__ = ("_m",)
+
+    def __init__(self, mission: CompactMission):
+        self._m = mission
+
+    def __getitem__(self, key: str) -> list[str]:
+        if key == "text_segments":
+            return self._m.text_segments
+        if key == "keywords":
+            return self._m.keywords
+        if key == "options":
+            return self._m.option_words
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(_DATA_KEYS)
+
+    def __len__(self) -> int:
+        return len(_DATA_KEYS)
+
+
+def mission_key(article_text: str) -> str:
+    """Chave estável do artigo: hash do texto normalizado (espaços colapsados)."""
+    normalized = " ".join(article_text.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def compact_mission(id: int, title: str, article_text: str, seed: int | None,
+                    key: str | None = None) -> CompactMission | None:
+    """
+    Missão preguiçosa do artigo (mesmas lacunas de generate_fill_blanks_from_article
+    quando materializada); None se o artigo não tem nenhuma palavra candidata.
+    """
+    if not has_blank_candidates(article_text):
+        return None
+    return CompactMission(id, title, article_text, 0, len(article_text), seed, key=key)
+
+
+# Pré-geração em segundo plano da próxima missão enquanto o aluno joga a atual; a thread
+# só é criada no primeiro pedido (importar o módulo não inicia nada)
+_PREFETCH: ThreadPoolExecutor | None = None
+_PREFETCH_LOCK = threading.Lock()
+
+
+def get_prefetch_pool() -> ThreadPoolExecutor:
+    """Executor único do processo para a pré-geração."""
+    global _PREFETCH
+    with _PREFETCH_LOCK:
+        if _PREFETCH is None:
+            _PREFETCH = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        return _PREFETCH
+
+
+def prefetch_missions(missions: Iterable[CompactMission]) -> None:
+    for m in missions:
+        if not m.materialized:
+            get_prefetch_pool().submit(m.materialize)
+
+
+# ========== serialização (bundle) ==========
+def pack_missions(missions: list[CompactMission]) -> dict:
+    """
+    Texto de todos os artigos uma única vez + posições e semente por missão (formato do
+    bundle). Lacunas já sorteadas também são gravadas, para não sortear de novo, e o
+    texto é tokenizado uma vez (TokenIndex) para que cargas quentes não tokenizem;
+    missões que já trazem tokens (reaproveitadas de outra versão) só têm os tokens copiados.
+    """
+    parts: list[str] = []
+    packed = []
+    tokens = TokenIndexBuilder()
+    pos = 0
+    for m in missions:
+        text = m.text
+        parts.append(text)
+        if m.tokens is not None:
+            tokens.add_slice(m.tokens, m.base, m.end, pos)  # missão reaproveitada: já tokenizada
+        else:
+            tokens.add_text(text, pos)
+        entry = {
+            "id": m.id,
+            "key": m.key,
+            "title": m.title,
+            "start": pos,
+            "end": pos + len(text),
+            "seed": m.seed,
+        }
+        if m.materialized:
+            entry["blanks"] = m._blanks.tolist()
+            entry["options"] = m._options.tolist()
+        packed.append(entry)
+        pos += len(text) + 1  # separador "\n"
+    return {"text": "\n".join(parts), "tokens": tokens.build().to_payload(), "missions": packed}
+
+
+def unpack_missions(payload: dict) -> list[CompactMission]:
+    """Inverso de pack_missions: todas as missões apontam para o mesmo buffer."""
+    buf = payload["text"]
+    tokens = TokenIndex.from_payload(payload["tokens"])
+    missions = []
+    for m in payload["missions"]:
+        blanks = options = None
+        if "blanks" in m:
+            blanks, options = array("I", m["blanks"]), array("I", m["options"])
+        missions.append(CompactMission(
+            m["id"], m["title"], buf, m["start"], m["end"], m["seed"], blanks, options, tokens, m.get("key")
+        ))
+    return missions
@@ -1,142 +1,424 @@
+import os
 import re
 import random
-from typing import List, Dict, Any
+from bisect import bisect_left
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
 
-try:
-    from PyPDF2 import PdfReader
-except Exception:
-    PdfReader = None  # type: ignore
+from .tokens import TokenIndex, WORD_RE
+from .distractors import pick_distractors
+from src.telemetry.trace import traced
 
+# Versão do gerador de missões: incremente ao mudar a extração/divisão/lacunas
+# para invalidar os bundles persistidos em data/bundles.
+GENERATOR_VERSION = 7  # 7: distratores parecidos com as respostas (src.extractor.distractors)
 
-def extract_pdf_text(pdf_path: str) -> str:
-    """Extrai o texto bruto do PDF."""
-    if PdfReader is None:
-        raise RuntimeError("PyPDF2 não disponível. Instale PyPDF2.")
-    reader = PdfReader(pdf_path)
-    text_parts = []
-    for page in reader.pages:
+
+# Extração paralela: abaixo deste nº de páginas o custo de subir processos não compensa
+PARALLEL_MIN_PAGES = 24
+# Tarefas por worker: cada tarefa reabre o PDF, então poucos blocos grandes por núcleo
+TASKS_PER_WORKER = 2
+# Páginas novas acumuladas antes de gravar no cache de texto (src.storage.db.page_text)
+PAGE_CACHE_BATCH = 32
+# Distratores por missão, além das respostas
+DISTRACTORS = 5
+
+
+def _default_workers() -> int:
+    env = os.environ.get("PDF_EXTRACT_WORKERS")
+    if env and env.strip().isdigit():
+        return max(1, int(env))
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+def process_context():
+    """
+    Contexto multiprocessing dos pools de processos (páginas e compilação offline):
+    forkserver (ou spawn), nunca fork. O app cria o pool numa thread de um servidor com
+    várias threads, e um fork enquanto outra thread segura um lock (logging, SQLite,
+    import) pode deixar o filho travado para sempre.
+    """
+    import multiprocessing
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload([__name__])  # os filhos já nascem com este módulo importado
+        return ctx
+    return multiprocessing.get_context("spawn")
+
+
+def _extract_pages(backend_name: str, pdf_path: str, pages: list[int]) -> Dict[int, str]:
+    """Extrai as páginas `pages` (roda no processo filho); as que falharem ficam de fora."""
+    from .backends import BACKENDS
+    backend = BACKENDS[backend_name]
+    doc = backend.open(pdf_path)
+    try:
+        out = {}
+        for i in pages:
+            try:
+                out[i] = backend.page_text(doc, i)
+            except Exception:
+                continue
+        return out
+    finally:
+        backend.close(doc)
+
+
+def _cached_pages(pdf_path: str, backend_name: str) -> Tuple[str | None, Dict[int, str]]:
+    """(sha256, {página: texto}) já extraídas com este extrator; cache indisponível => (None, {})."""
+    try:
+        from .bundle import file_sha256
+        from src.storage.db import load_page_texts
+        sha = file_sha256(pdf_path)
+        return sha, load_page_texts(sha, backend_name)
+    except Exception:
+        return None, {}
+
+
+def _reuse_identical_pages(extractor, doc, backend_name: str, missing: List[int],
+                           previous: str | None) -> Tuple[Dict[int, str], Dict[int, str]]:
+    """
+    Impressão digital das páginas que faltam (gravada junto com o texto) e o texto das
+    que já foram extraídas na versão anterior do mesmo PDF (`previous`, sha256):
+    ({página: fp}, {página: texto}). Só a versão anterior: outro documento com o mesmo
+    conteúdo de página nunca empresta o texto.
+    """
+    fingerprints: Dict[int, str] = {}
+    for i in missing:
         try:
-            text_parts.append(page.extract_text() or "")
+            fp = extractor.page_fingerprint(doc, i)
         except Exception:
+            fp = None
+        if fp is None:
             continue
-    return "\n".join(text_parts)
+        fingerprints[i] = fp
+    if not fingerprints or previous is None:
+        return fingerprints, {}
+    try:
+        from src.storage.db import page_texts_by_fingerprint
+        known = page_texts_by_fingerprint(previous, backend_name, list(fingerprints.values()))
+    except Exception:
+        return fingerprints, {}
+    return fingerprints, {i: known[fp] for i, fp in fingerprints.items() if fp in known}
 
 
-def split_into_articles(text: str) -> List[Dict[str, Any]]:
+def _save_pages(sha: str | None, backend_name: str, pages: Dict[int, str], fingerprints: Dict[int, str]) -> None:
+    if sha is None or not pages:
+        return
+    try:
+        from src.storage.db import save_page_texts
+        save_page_texts(sha, backend_name, pages, fingerprints)
+    except Exception:
+        pass  # cache é opcional
+    pages.clear()
+
+
+def iter_pdf_pages(pdf_path: str, workers: int | None = None, backend: str | None = None,
+                   cache: bool = True, previous: str | None = None) -> Iterator[str]:
     """
-    Divide o texto em artigos pelo padrão 'Art. N'.
-    Retorna [{id, title, text}].
+    Gera o texto de cada página, na ordem, à medida que é extraído.
+    O extrator vem de src.extractor.backends (`backend`, PDF_BACKEND ou PyPDF2; texto puro
+    vai direto). Com `cache`, páginas já extraídas deste conteúdo com o mesmo extrator saem
+    do banco e as novas são gravadas em lotes, então repetir ou retomar não reextrai nada;
+    páginas idênticas às de `previous` (sha256 da versão anterior do mesmo PDF, mesma
+    impressão digital) também não.
+    Com workers > 1 e muitas páginas faltando, divide-as entre um pool de processos
+    (padrão: PDF_EXTRACT_WORKERS ou nº de CPUs); páginas com erro são ignoradas.
     """
-    norm = re.sub(r"[ \t]+", " ", text)
-    parts = re.split(r"(?=(?:\bArt\.\s*\d+))", norm, flags=re.IGNORECASE)
-    articles = []
-    for part in parts:
+    from .backends import BACKENDS, backend_for
+    extractor = backend_for(pdf_path, backend)
+    doc = extractor.open(pdf_path)
+    pool = None
+    sha, cached = (None, {})
+    fingerprints: Dict[int, str] = {}
+    fresh: Dict[int, str] = {}  # extraídas (ou reaproveitadas) agora, ainda não gravadas
+    try:
+        n_pages = extractor.page_count(doc)
+        if cache and extractor.cacheable:
+            sha, cached = _cached_pages(pdf_path, extractor.name)
+        missing = [i for i in range(n_pages) if i not in cached]
+        if sha is not None and missing:
+            fingerprints, reused = _reuse_identical_pages(extractor, doc, extractor.name, missing, previous)
+            cached.update(reused)
+            fresh.update(reused)
+            missing = [i for i in missing if i not in reused]
+        workers = _default_workers() if workers is None else max(1, workers)
+
+        futures: dict = {}  # página -> future do bloco que a contém
+        if workers > 1 and len(missing) >= PARALLEL_MIN_PAGES and extractor.name in BACKENDS:
+            try:
+                from concurrent.futures import ProcessPoolExecutor
+                step = -(-len(missing) // (workers * TASKS_PER_WORKER))  # teto
+                chunks = [missing[k:k + step] for k in range(0, len(missing), step)]
+                pool = ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=process_context())
+                for chunk in chunks:
+                    futures.update(dict.fromkeys(chunk, pool.submit(_extract_pages, extractor.name, pdf_path, chunk)))
+            except Exception:
+                futures = {}
+
+        def extract(i: int) -> str | None:
+            nonlocal futures
+            fut = futures.get(i)
+            if fut is not None:
+                try:
+                    return fut.result().get(i)
+                except Exception:
+                    futures = {}  # pool indisponível (ambiente restrito etc.): segue serial daqui
+            try:
+                return extractor.page_text(doc, i)
+            except Exception:
+                return None
+
+        for i in range(n_pages):
+            if i in cached:
+                yield cached[i]
+                continue
+            text = extract(i)
+            if text is None:
+                continue
+            if sha is not None:
+                fresh[i] = text
+                if len(fresh) >= PAGE_CACHE_BATCH:
+                    _save_pages(sha, extractor.name, fresh, fingerprints)
+            yield text
+    finally:
+        _save_pages(sha, extractor.name, fresh, fingerprints)  # inclusive se o consumidor parar no meio
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        extractor.close(doc)
+
+
+@traced()
+def extract_pdf_text(pdf_path: str, workers: int | None = None, backend: str | None = None,
+                     cache: bool = True) -> str:
+    """Extrai o texto bruto do PDF."""
+    return "\n".join(iter_pdf_pages(pdf_path, workers=workers, backend=backend, cache=cache))
+
+
+_ART_BOUNDARY = re.compile(r"(?=(?:\bArt\.\s*\d+))", flags=re.IGNORECASE)
+
+
+def iter_articles(pages: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Versão incremental de split_into_articles: recebe o texto página a página
+    e emite cada artigo assim que o próximo 'Art. N' aparece (inclusive em outra página).
+    """
+    buf = ""
+    first = True
+    next_id = 0
+
+    def emit(part: str):
+        nonlocal next_id
         clean = part.strip()
         if not clean:
-            continue
+            return None
         m = re.match(r"(Art\.\s*\d+)", clean, flags=re.IGNORECASE)
-        title = m.group(1) if m else "Introdução"
-        articles.append({
-            "id": len(articles),
-            "title": title,
+        art = {
+            "id": next_id,
+            "title": m.group(1) if m else "Introdução",
             "text": clean,
-        })
-    return articles
+        }
+        next_id += 1
+        return art
 
+    for page in pages:
+        page = re.sub(r"[ \t]+", " ", page)
+        buf = page if first else f"{buf}\n{page}"
+        first = False
+        starts = [m.start() for m in _ART_BOUNDARY.finditer(buf)]
+        if not starts or starts[-1] == 0:
+            continue
+        # tudo antes do último 'Art. N' visto está completo; o resto aguarda mais páginas
+        bounds = [0] + [s for s in starts if s > 0]
+        for a, b in zip(bounds, bounds[1:]):
+            art = emit(buf[a:b])
+            if art is not None:
+                yield art
+        buf = buf[bounds[-1]:]
 
-def _pick_candidate_words(text: str) -> List[str]:
+    art = emit(buf)
+    if art is not None:
+        yield art
+
+
+@traced()
+def split_into_articles(text: str) -> List[Dict[str, Any]]:
+    """
+    Divide o texto em artigos pelo padrão 'Art. N'.
+    Retorna [{id, title, text}].
+    """
+    return list(iter_articles([text]))
+
+
+def _pick_candidate_words(text: str, tokens: TokenIndex | None = None) -> List[str]:
     # Palavras candidatas: 5+ letras, não tudo maiúsculo, sem números
-    words = re.findall(r"\b[^\W\d_]{5,}\b", text, flags=re.UNICODE)
-    words = [w for w in words if not w.isupper()]
+    tokens = tokens or TokenIndex.build(text)
     uniq = []
     seen = set()
-    for w in words:
-        lw = w.lower()
-        if lw not in seen:
-            seen.add(lw)
-            uniq.append(w)
+    for i in range(len(tokens)):
+        if tokens.upper[i] or tokens.ends[i] - tokens.starts[i] < 5:
+            continue
+        wid = tokens.word_ids[i]
+        if wid not in seen:
+            seen.add(wid)
+            uniq.append(text[tokens.starts[i]:tokens.ends[i]])
     return uniq
 
 
-def generate_fill_blanks_from_article(article_text: str, max_blanks: int = 5, seed: int | None = None) -> Dict[str, Any]:
+Span = Tuple[int, int]
+
+
+def has_blank_candidates(article_text: str) -> bool:
     """
-    Gera dados para o jogo de lacunas a partir do texto do artigo.
-    Retorna {text_segments, keywords, options}.
-    Estratégia:
-      - escolhe até 5 ocorrências espalhadas ao longo do texto (estratificado por posição)
-      - opções incluem as 5 corretas + distratores retirados do próprio texto
-      - usa semente (seed) para gerar sempre o mesmo conjunto por PDF/artigo
+    True se fill_blank_spans vai achar ao menos uma lacuna (com max_blanks >= 1).
+    Barato: para na 1ª palavra candidata, sem sortear nada.
+    """
+    # toda palavra de 5+ letras também casa {3,}, então basta o padrão mais largo
+    return any(not m.group(0).isupper() for m in WORD_RE.finditer(article_text))
+
+
+@traced()
+def fill_blank_spans(article_text: str, max_blanks: int = 5, seed: int | None = None) -> Tuple[List[Span], List[Span]]:
+    """
+    Núcleo de generate_fill_blanks_from_article trabalhando só com posições.
+    Retorna (lacunas, opções): spans (início, fim) no texto do artigo, lacunas em ordem
+    de posição e opções já embaralhadas (lacunas + distratores).
+    """
+    return fill_blank_spans_indexed(TokenIndex.build(article_text), 0, len(article_text), max_blanks, seed)
+
+
+@traced()
+def fill_blank_spans_indexed(
+    tokens: TokenIndex, base: int, end: int, max_blanks: int = 5, seed: int | None = None
+) -> Tuple[List[Span], List[Span]]:
+    """
+    Igual a fill_blank_spans para o artigo text[base:end], mas lendo as palavras de um
+    TokenIndex já construído (do documento inteiro); spans relativos a `base`.
+    As faixas são localizadas por bisect sobre os inícios (já ordenados), então o custo
+    é linear no nº de ocorrências; a sequência de sorteios é a mesma da versão original.
     """
     rng = random.Random(seed)
-    text = article_text
+    t_starts, t_ends, t_upper, word_ids, vocab = tokens.starts, tokens.ends, tokens.upper, tokens.word_ids, tokens.vocab
+    in_article = tokens.token_range(base, end)
 
-    def iter_candidates(regex_pat: str):
-        for m in re.finditer(regex_pat, text, flags=re.UNICODE):
-            w = m.group(0)
-            if not w.isupper():
-                yield (m.start(), m.end(), w)
+    # candidatas: 5+ letras e não tudo maiúsculo; sem nenhuma, aceita 3+ letras
+    min_len = 5
+    idx = [i for i in in_article if not t_upper[i] and t_ends[i] - t_starts[i] >= min_len]
+    if not idx:
+        min_len = 3
+        idx = [i for i in in_article if not t_upper[i]]
 
-    occ = list(iter_candidates(r"\b[^\W\d_]{5,}\b"))
-    if not occ:
-        occ = list(iter_candidates(r"\b[^\W\d_]{3,}\b"))
+    if not idx:
+        return [], []
 
-    if not occ:
-        return {"text_segments": [text], "keywords": [], "options": []}
+    occ = [(t_starts[i] - base, t_ends[i] - base) for i in idx]
+    lowers = [vocab[word_ids[i]] for i in idx]
+    total_len = end - base
 
-    occ.sort(key=lambda t: t[0])
-    total_len = len(text)
+    starts = [o[0] for o in occ]
 
     desired = min(max_blanks, len(occ))
     chosen = []
     used_words_lower = set()
+    used_occ = 0  # nº de ocorrências cujas palavras já foram usadas
+    counts: Dict[str, int] = {}
+    for lw in lowers:
+        counts[lw] = counts.get(lw, 0) + 1
 
     for k in range(desired):
         start_band = int(k * (total_len / desired))
         end_band = int((k + 1) * (total_len / desired))
-        band = [o for o in occ if start_band <= o[0] < end_band and o[2].lower() not in used_words_lower]
+        lo = bisect_left(starts, start_band)
+        hi = bisect_left(starts, end_band)
+        band = [i for i in range(lo, hi) if lowers[i] not in used_words_lower]
         pick = None
         if band:
             pick = rng.choice(band)
         else:
-            remaining = [o for o in occ if o[2].lower() not in used_words_lower]
-            if remaining:
-                pick = rng.choice(remaining)
-        if pick:
-            chosen.append(pick)
-            used_words_lower.add(pick[2].lower())
+            n_remaining = len(occ) - used_occ
+            if n_remaining:
+                # i-ésima ocorrência ainda não usada, sem montar a lista inteira
+                target = rng.choice(range(n_remaining))  # mesmo sorteio que rng.choice(lista)
+                for i, lw in enumerate(lowers):
+                    if lw not in used_words_lower:
+                        if target == 0:
+                            pick = i
+                            break
+                        target -= 1
+        if pick is not None:
+            chosen.append((*occ[pick], lowers[pick], idx[pick]))
+            used_words_lower.add(lowers[pick])
+            used_occ += counts[lowers[pick]]
 
     if not chosen:
-        return {"text_segments": [text], "keywords": [], "options": []}
+        return [], []
 
     chosen.sort(key=lambda t: t[0])
+    blanks = [(s, e) for (s, e, _, _) in chosen]
+
+    # distratores: palavras do artigo parecidas com as respostas (mesma terminação, começo
+    # ou tamanho), sorteadas no índice de baldes do TokenIndex (src.extractor.distractors)
+    picks = pick_distractors(tokens, in_article.start, in_article.stop, [t for (_, _, _, t) in chosen],
+                             idx, min_len, DISTRACTORS, rng)
+    distractors = [(t_starts[t] - base, t_ends[t] - base) for t in picks]
+
+    options = blanks[:] + distractors
+    rng.shuffle(options)
+    return blanks, options
+
+
+@traced()
+def generate_fill_blanks_from_article(article_text: str, max_blanks: int = 5, seed: int | None = None) -> Dict[str, Any]:
+    """
+    Gera dados para o jogo de lacunas a partir do texto do artigo.
+    Retorna {text_segments, keywords, options}.
+    Estratégia:
+      - escolhe até 5 ocorrências espalhadas ao longo do texto (estratificado por posição)
+      - opções incluem as 5 corretas + distratores do próprio texto parecidos com elas
+        (mesma terminação, começo ou tamanho)
+      - usa semente (seed) para gerar sempre o mesmo conjunto por PDF/artigo
+    """
+    text = article_text
+    return _fill_blanks_data(text, *fill_blank_spans(text, max_blanks=max_blanks, seed=seed))
+
+
+def _fill_blanks_data(text: str, blanks: List[Span], options: List[Span]) -> Dict[str, Any]:
+    if not blanks:
+        return {"text_segments": [text], "keywords": [], "options": []}
 
     segments: List[str] = []
-    blanks: List[str] = []
     cursor = 0
-    for (start, end, w) in chosen:
+    for (start, end) in blanks:
         segments.append(text[cursor:start])
-        blanks.append(text[start:end])
         cursor = end
     segments.append(text[cursor:])
 
-    chosen_set = {b.lower() for b in blanks}
-    pool_words = [w for (_, _, w) in occ if w.lower() not in chosen_set]
-    seen = set()
-    pool_unique = []
-    for w in pool_words:
-        lw = w.lower()
-        if lw not in seen:
-            seen.add(lw)
-            pool_unique.append(w)
-
-    distractor_count = min(5, max(0, len(pool_unique)))
-    distractors = rng.sample(pool_unique, distractor_count) if pool_unique else []
-
-    options = blanks[:] + distractors
-    rng.shuffle(options)
-
     return {
         "text_segments": segments,
-        "keywords": blanks,
-        "options": options,
-    }
\ No newline at end of file
+        "keywords": [text[s:e] for (s, e) in blanks],
+        "options": [text[s:e] for (s, e) in options],
+    }
+
+
+@traced()
+def generate_fill_blanks_for_articles(
+    articles: Iterable[Dict[str, Any]],
+    seeds: Iterable[int | None],
+    max_blanks: int = 5,
+) -> List[Dict[str, Any]]:
+    """
+    Versão em lote: gera as lacunas de todos os artigos de um documento numa chamada.
+    Os artigos são tokenizados uma vez num buffer só, e o TokenIndex (com o índice de
+    distratores, montado no primeiro sorteio) serve a todos; o resultado é o mesmo de
+    generate_fill_blanks_from_article artigo a artigo.
+    """
+    texts = [art["text"] for art in articles]
+    bases, pos = [], 0
+    for t in texts:
+        bases.append(pos)
+        pos += len(t) + 1
+    tokens = TokenIndex.build("\n".join(texts))
+    return [
+        _fill_blanks_data(t, *fill_blank_spans_indexed(tokens, base, base + len(t), max_blanks, seed))
+        for t, base, seed in zip(texts, bases, seeds)
+    ]
@@ -0,0 +1,143 @@
+import re
+import base64
+from array import array
+from bisect import bisect_left
+
+# Palavra candidata: só letras, 3+ caracteres, isolada (\b). As de 5+ letras são
+# exatamente o subconjunto com comprimento >= 5.
+WORD_RE = re.compile(r"\b[^\W\d_]{3,}\b", flags=re.UNICODE)
+
+
+def _pack(arr) -> str:
+    return base64.b64encode(bytes(arr) if isinstance(arr, bytearray) else arr.tobytes()).decode("ascii")
+
+
+def _unpack_array(code: str, data: str) -> array:
+    arr = array(code)
+    arr.frombytes(base64.b64decode(data))
+    return arr
+
+
+class TokenIndex:
+    """
+    Tokenização única de um texto (documento inteiro ou artigo).
+    Para cada palavra: início/fim (array), id da forma minúscula em `vocab` e flag de
+    "tudo maiúsculo". Quem precisa de palavras (lacunas, distratores, renderização)
+    consulta o índice em vez de rodar regex de novo.
+    """
+
+    __slots__ = ("starts", "ends", "word_ids", "upper", "vocab", "_postings", "_distractors")
+
+    def __init__(self, starts: array, ends: array, word_ids: array, upper: bytearray, vocab: list[str]):
+        self.starts = starts
+        self.ends = ends
+        self.word_ids = word_ids
+        self.upper = upper
+        self.vocab = vocab
+        self._postings: dict[str, list[int]] | None = None
+        self._distractors = None  # DistractorIndex (src.extractor.distractors), montado sob demanda
+
+    @classmethod
+    def build(cls, text: str) -> "TokenIndex":
+        starts, ends, word_ids = array("I"), array("I"), array("I")
+        upper = bytearray()
+        vocab: list[str] = []
+        ids: dict[str, int] = {}
+        for m in WORD_RE.finditer(text):
+            w = m.group(0)
+            lw = w.lower()
+            wid = ids.get(lw)
+            if wid is None:
+                wid = ids[lw] = len(vocab)
+                vocab.append(lw)
+            starts.append(m.start())
+            ends.append(m.end())
+            word_ids.append(wid)
+            upper.append(w.isupper())
+        return cls(starts, ends, word_ids, upper, vocab)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def token_range(self, lo: int, hi: int) -> range:
+        """Índices dos tokens que começam em [lo, hi)."""
+        return range(bisect_left(self.starts, lo), bisect_left(self.starts, hi))
+
+    def lower(self, i: int) -> str:
+        return self.vocab[self.word_ids[i]]
+
+    def occurrences(self, word: str) -> list[int]:
+        """Índices dos tokens cuja forma minúscula é word.lower(), em ordem de posição."""
+        if self._postings is None:
+            postings: dict[str, list[int]] = {}
+            vocab = self.vocab
+            for i, wid in enumerate(self.word_ids):
+                postings.setdefault(vocab[wid], []).append(i)
+            self._postings = postings
+        return self._postings.get(word.lower(), [])
+
+    # ----- persistência (junto do bundle) -----
+    def to_payload(self) -> dict:
+        return {
+            "starts": _pack(self.starts),
+            "ends": _pack(self.ends),
+            "word_ids": _pack(self.word_ids),
+            "upper": _pack(self.upper),
+            "vocab": self.vocab,
+        }
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> "TokenIndex":
+        return cls(
+            _unpack_array("I", payload["starts"]),
+            _unpack_array("I", payload["ends"]),
+            _unpack_array("I", payload["word_ids"]),
+            bytearray(base64.b64decode(payload["upper"])),
+            payload["vocab"],
+        )
+
+
+class TokenIndexBuilder:
+    """
+    Monta um TokenIndex trecho a trecho: texto novo é tokenizado; trecho de outro índice
+    é copiado (posições deslocadas, ids traduzidos para o vocabulário novo) sem regex.
+    """
+
+    def __init__(self):
+        self.starts, self.ends, self.word_ids = array("I"), array("I"), array("I")
+        self.upper = bytearray()
+        self.vocab: list[str] = []
+        self._ids: dict[str, int] = {}
+        self._remaps: dict[int, tuple[TokenIndex, list[int]]] = {}  # id(índice) -> ids no vocabulário novo
+
+    def _word_id(self, lw: str) -> int:
+        wid = self._ids.get(lw)
+        if wid is None:
+            wid = self._ids[lw] = len(self.vocab)
+            self.vocab.append(lw)
+        return wid
+
+    def add_text(self, text: str, offset: int) -> None:
+        """Tokeniza `text`, que começa na posição `offset` do texto final."""
+        for m in WORD_RE.finditer(text):
+            w = m.group(0)
+            self.starts.append(m.start() + offset)
+            self.ends.append(m.end() + offset)
+            self.word_ids.append(self._word_id(w.lower()))
+            self.upper.append(w.isupper())
+
+    def add_slice(self, index: TokenIndex, lo: int, hi: int, offset: int) -> None:
+        """Copia os tokens de `index` em [lo, hi) para a posição `offset` do texto final."""
+        cached = self._remaps.get(id(index))
+        if cached is None:
+            cached = self._remaps[id(index)] = (index, [self._word_id(w) for w in index.vocab])
+        remap = cached[1]
+        a, b = bisect_left(index.starts, lo), bisect_left(index.starts, hi)
+        shift = offset - lo
+        self.word_ids.extend(map(remap.__getitem__, index.word_ids[a:b]))
+        self.starts.extend(map(shift.__add__, index.starts[a:b]))
+        self.ends.extend(map(shift.__add__, index.ends[a:b]))
+        self.upper += index.upper[a:b]
+
+    def build(self) -> TokenIndex:
+        return TokenIndex(self.starts, self.ends, self.word_ids, self.upper, self.vocab)
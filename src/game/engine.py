@@ -1,62 +1,121 @@
-from typing import List, Dict, Tuple, Optional
-from src.extractor.pdf_extractor import PDFExtractor
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping, Sequence
+
+# Motor de níveis sobre as missões já compiladas (DocumentCache ou job em andamento).
+# Um GameEngine por documento no processo, compartilhado por todas as sessões: ele é
+# somente leitura; a missão atual, as respostas e o progresso de cada aluno ficam na sessão.
+MAX_ENGINES = 32        # documentos com motor em memória (LRU)
+MAX_LEVELS = 64         # níveis montados memorizados por motor (LRU)
+
 
 class GameLevel:
-    """Representa um nível no jogo de aprendizado."""
-    
-    def __init__(self, article_id: str, article_text: str, keywords: List[str]):
-        self.article_id = article_id
-        self.article_text = article_text
-        self.keywords = keywords
-        
-    def _create_masked_text(self) -> str:
-        """Cria uma versão do texto com palavras-chave mascaradas."""
-        masked_text = self.article_text
-        for keyword in self.keywords:
-            masked_text = masked_text.replace(keyword, "_____")
-        return masked_text
+    """Uma missão vista como nível: texto com lacunas, respostas e opções."""
+
+    __slots__ = ("index", "mission_id", "title", "text_segments", "keywords", "options")
+
+    def __init__(self, index: int, mission: Mapping):
+        data = mission.get("data", {})
+        self.index = index
+        self.mission_id = mission.get("id", index)
+        self.title = mission.get("title", "")
+        self.text_segments: list[str] = list(data.get("text_segments") or [])
+        self.keywords: list[str] = list(data.get("keywords") or [])
+        self.options: list[str] = list(data.get("options") or self.keywords)
+
+    def is_correct(self, blank_index: int, word: str) -> bool:
+        if blank_index < 0 or blank_index >= len(self.keywords):
+            return False
+        return word.lower() == self.keywords[blank_index].lower()
+
+    def score(self, selected: Mapping[int, str]) -> int:
+        """Quantas lacunas de `selected` estão certas."""
+        return sum(1 for i, w in selected.items() if self.is_correct(i, w))
+
 
 class GameEngine:
-    """Motor do jogo para gerenciar níveis e interação."""
-    
-    def __init__(self, pdf_extractor: PDFExtractor):
-        self.pdf_extractor = pdf_extractor
-        self.current_level_index = 0
-        self.levels = self._initialize_levels()
-        
-    def _initialize_levels(self) -> List[GameLevel]:
-        """Inicializa os níveis do jogo a partir do PDF."""
-        # Para simplificar, usamos um texto de exemplo com algumas palavras-chave
-        article_text = """A Assembleia Legislativa do Estado de Goiás, com sede na Capital do Estado, funciona normalmente no Palácio Maguito Vilela.
-        
-§ 1º Havendo motivo relevante ou de força maior, a Assembleia Legislativa poderá, por deliberação da Mesa e ad referendum da maioria absoluta dos seus Membros, reunir-se em outro edifício ou em ponto diverso no território estadual, observado o que dispõe este Regimento.
-
-§ 2º No Plenário do Palácio Maguito Vilela não se realizarão atos estranhos à função da Assembleia Legislativa.
-
-CAPÍTULO II
-DA HABILITAÇÃO PARA POSSE"""
-        
-        keywords = ["deliberação", "Membros", "edifício", "atos", "poder"]
-        
-        # Criar um nível de jogo básico
-        level = GameLevel("1", article_text, keywords)
-        
-        return [level]
-        
-    def get_current_level(self) -> Optional[GameLevel]:
-        """Retorna o nível atual."""
-        if 0 <= self.current_level_index < len(self.levels):
-            return self.levels[self.current_level_index]
+    """Níveis de um documento, montados sob demanda a partir da lista de missões."""
+
+    def __init__(self, doc_id: str, missions: Sequence[Mapping]):
+        self.doc_id = doc_id
+        self.missions = missions  # mesma lista do cache/job: cresce junto durante a compilação
+        self._lock = threading.Lock()
+        self._levels: OrderedDict[int, GameLevel] = OrderedDict()
+        self._keys: dict[str, int] = {}  # chave estável da missão -> índice (estendido sob demanda)
+        self._keyed = 0
+
+    def __len__(self) -> int:
+        return len(self.missions)
+
+    def _key_index(self) -> dict[str, int]:
+        with self._lock:
+            for i in range(self._keyed, len(self.missions)):
+                self._keys.setdefault(self.missions[i].get("key") or f"#{i}", i)
+            self._keyed = len(self.missions)
+            return self._keys
+
+    def keys(self) -> set[str]:
+        """Chaves das missões já disponíveis."""
+        return set(self._key_index())
+
+    def index_of(self, key: str) -> int | None:
+        return self._key_index().get(key)
+
+    def key_of(self, index: int) -> str:
+        """Chave estável da missão `index` (missões antigas sem chave usam a posição)."""
+        return self.missions[index].get("key") or f"#{index}"
+
+    def level(self, index: int | None) -> GameLevel | None:
+        if index is None or index < 0 or index >= len(self.missions):
+            return None
+        with self._lock:
+            level = self._levels.get(index)
+            if level is not None:
+                self._levels.move_to_end(index)
+                return level
+        level = GameLevel(index, self.missions[index])  # fora do lock: sorteia as lacunas
+        with self._lock:
+            self._levels[index] = level
+            while len(self._levels) > MAX_LEVELS:
+                self._levels.popitem(last=False)
+        return level
+
+    def check_answer(self, index: int | None, blank_index: int, word: str) -> bool | None:
+        """Certo/errado para a lacuna do nível `index`; None se o nível ou a lacuna não existem."""
+        level = self.level(index)
+        if level is None or blank_index < 0 or blank_index >= len(level.keywords):
+            return None
+        return level.is_correct(blank_index, word)
+
+    def next_level(self, index: int | None, completed: set[int]) -> int | None:
+        """Primeiro nível não concluído depois de `index` (None se não houver)."""
+        start = -1 if index is None else index
+        for i in range(start + 1, len(self.missions)):
+            if i not in completed:
+                return i
         return None
-        
-    def advance_level(self) -> bool:
-        """Avança para o próximo nível se houver."""
-        if self.current_level_index < len(self.levels) - 1:
-            self.current_level_index += 1
-            return True
-        return False
-        
-    def reset_level(self) -> None:
-        """Reinicia o nível atual."""
-        # Por enquanto não faz nada, mas pode ser expandido depois
-        pass
\ No newline at end of file
+
+
+_ENGINES: OrderedDict[str, GameEngine] = OrderedDict()
+_ENGINES_LOCK = threading.Lock()
+
+
+def get_engine(doc_id: str, missions: Sequence[Mapping]) -> GameEngine:
+    """
+    GameEngine do documento, criado uma vez por processo. Só é refeito se a lista de
+    missões mudar de objeto (ex.: o bundle foi recompilado ou o documento saiu do cache).
+    """
+    with _ENGINES_LOCK:
+        engine = _ENGINES.get(doc_id)
+        if engine is None or engine.missions is not missions:
+            engine = GameEngine(doc_id, missions)
+            _ENGINES[doc_id] = engine
+        _ENGINES.move_to_end(doc_id)
+        while len(_ENGINES) > MAX_ENGINES:
+            _ENGINES.popitem(last=False)
+        return engine
+
+
+def discard_engine(doc_id: str) -> None:
+    with _ENGINES_LOCK:
+        _ENGINES.pop(doc_id, None)
@@ -1,46 +1,11 @@
 import streamlit as st
-import os
-from src.extractor.pdf_extractor import PDFExtractor
+from src.telemetry.trace import count
 
 def initialize_game_state():
     """Inicializa o estado do jogo se ainda não existir."""
-    if 'game_engine' not in st.session_state:
-        from src.game.engine import GameEngine
-        
-        # Definir um caminho padrão para o PDF de exemplo
-        # Substitua pelo caminho real do seu PDF
-        default_pdf_path = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
-            "data",
-            "sample.pdf"
-        )
-        
-        # Verificar se o diretório e o arquivo existem
-        data_dir = os.path.dirname(default_pdf_path)
-        if not os.path.exists(data_dir):
-            os.makedirs(data_dir)
-        
-        # Se o PDF não existir, criar um arquivo mock
-        if not os.path.exists(default_pdf_path):
-            create_mock_pdf(default_pdf_path)
-            
-        # Criar o extractor com o caminho do PDF
-        pdf_extractor = PDFExtractor(default_pdf_path)
-        
-        # Agora passar o extractor para o GameEngine
-        st.session_state.game_engine = GameEngine(pdf_extractor)
-    
-    if 'selected_words' not in st.session_state:
-        st.session_state.selected_words = {}
-    
-    if 'correct_positions' not in st.session_state:
-        st.session_state.correct_positions = set()
-    
-    if 'correct_answers' not in st.session_state:
-        st.session_state.correct_answers = 0
-    
-    if 'total_questions' not in st.session_state:
-        st.session_state.total_questions = 0
+    # o motor (src.game.engine) é por documento e vive no processo, não na sessão
+    from src.ui.init_state import ensure_state_initialized
+    ensure_state_initialized()
 
 def create_mock_pdf(filepath):
     """Cria um arquivo PDF mock para testes."""
@@ -63,21 +28,19 @@ def update_game_state(blank_index, word):
     
     # CRUCIAL: Garantir que a palavra seja armazenada
     st.session_state.selected_words[blank_index] = word
-    print(f"update_game_state: palavra '{word}' armazenada no índice {blank_index}")
-    print(f"Estado após armazenamento: {st.session_state.selected_words}")
+    count("answer.stored")
     
-    # Verificar se a palavra está correta
-    current_level = st.session_state.game_engine.get_current_level()
+    # Verificar se a palavra está correta (nível da missão aberta)
+    from src.ui.init_state import current_level
+    level = current_level()
     
-    if current_level and blank_index < len(current_level.keywords):
-        expected_word = current_level.keywords[blank_index]
-        is_correct = word.lower() == expected_word.lower()
+    if level and blank_index < len(level.keywords):
+        is_correct = level.is_correct(blank_index, word)
         
         if is_correct:
             # CRUCIAL: Registrar posição como correta
             st.session_state.correct_positions.add(blank_index)
-            print(f"Posição {blank_index} marcada como correta!")
-            print(f"Posições corretas: {st.session_state.correct_positions}")
+            count("answer.correct")
             
             st.session_state.correct_answers += 1
             st.toast(f"Correto! '{word}' colocado com sucesso!", icon="✅")
@@ -97,11 +60,11 @@ def check_answer(blank_index, selected_word):
     # Garantir que o estado esteja inicializado
     initialize_game_state()
     
-    current_level = st.session_state.game_engine.get_current_level()
+    from src.ui.init_state import current_level
+    level = current_level()
     
-    if current_level and blank_index < len(current_level.keywords):
-        expected_word = current_level.keywords[blank_index]
-        is_correct = selected_word.lower() == expected_word.lower()
+    if level and blank_index < len(level.keywords):
+        is_correct = level.is_correct(blank_index, selected_word)
         
         if is_correct:
             st.session_state.correct_answers += 1
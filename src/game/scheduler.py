@@ -0,0 +1,244 @@
+import heapq, threading, time
+from dataclasses import asdict, dataclass
+from typing import Iterable
+
+# Revisão espaçada (SM-2 simplificado) das missões concluídas. Cada (usuário, documento,
+# chave da missão) tem facilidade, intervalo e vencimento; os vencimentos ficam num heap
+# por usuário e documento e outro por usuário (todos os documentos), então "próxima a
+# revisar" custa O(log n). Entradas velhas no heap (missão reagendada) são descartadas
+# quando chegam ao topo. Estado em memória do processo, gravado na tabela `reviews` e
+# recarregado quando ela muda (revisões gravadas por outro worker); a mudança é conferida
+# no máximo uma vez por execução do app (refresh() marca a conferência como pendente).
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+RETRY_INTERVAL = 10 * 60          # s: errou muito, volta logo
+FIRST_INTERVAL = 24 * 3600        # s: 1ª revisão certa
+SECOND_INTERVAL = 6 * 24 * 3600   # s: 2ª revisão certa
+
+
+@dataclass(slots=True)
+class ReviewItem:
+    document: str
+    key: str
+    ease: float = DEFAULT_EASE
+    interval: float = 0.0
+    due: float = 0.0
+    reps: int = 0
+    lapses: int = 0
+    errors: int = 0        # respostas erradas acumuladas
+
+
+def quality(misses: int, blanks: int, correct: int) -> int:
+    """
+    Nota 0-5 da tentativa. `misses`: lacunas erradas pelo menos uma vez ou que ficaram sem a
+    resposta certa, cada uma contada uma vez; `correct`: lacunas certas no fim.
+    """
+    if misses == 0:
+        return 5
+    if misses < blanks:  # errar todas nunca passa, nem numa missão de uma lacuna só
+        if misses == 1:
+            return 4
+        if misses <= max(blanks // 2, 1):
+            return 3
+    return 2 if correct else 1
+
+
+def schedule(item: ReviewItem, q: int, now: float) -> ReviewItem:
+    """Atualiza facilidade/intervalo/vencimento de `item` com a nota `q` (SM-2)."""
+    if q < 3:
+        item.reps = 0
+        item.lapses += 1
+        item.interval = RETRY_INTERVAL
+    else:
+        item.reps += 1
+        if item.reps == 1:
+            item.interval = FIRST_INTERVAL
+        elif item.reps == 2:
+            item.interval = SECOND_INTERVAL
+        else:
+            item.interval = item.interval * item.ease
+    item.ease = max(MIN_EASE, item.ease + 0.1 - (5 - q) * (0.08 + (5 - q) * 0.02))
+    item.due = now + item.interval
+    return item
+
+
+class _UserQueue:
+    """Itens de um usuário e os heaps de vencimento (por documento e geral)."""
+
+    def __init__(self, items: Iterable[ReviewItem], stamp: tuple = ()):
+        self.items: dict[tuple[str, str], ReviewItem] = {}
+        self.by_doc: dict[str, list[tuple[float, str]]] = {}
+        self.all: list[tuple[float, str, str]] = []
+        # erros da tentativa em andamento: {(documento, chave): {lacuna: respostas erradas}}
+        self.attempts: dict[tuple[str, str], dict[int, int]] = {}
+        self.stamp = stamp  # db.reviews_stamp() quando foi carregada (ou da última gravação nossa)
+        self.checked = True  # stamp já conferido com o banco nesta execução
+        for item in items:
+            self.items[(item.document, item.key)] = item
+            self.by_doc.setdefault(item.document, []).append((item.due, item.key))
+            self.all.append((item.due, item.document, item.key))
+        for heap in (self.all, *self.by_doc.values()):
+            heapq.heapify(heap)
+
+    def push(self, item: ReviewItem) -> None:
+        heapq.heappush(self.by_doc.setdefault(item.document, []), (item.due, item.key))
+        heapq.heappush(self.all, (item.due, item.document, item.key))
+
+    def _fresh(self, due: float, document: str, key: str) -> bool:
+        item = self.items.get((document, key))
+        return item is not None and item.due == due
+
+    def peek_doc(self, document: str, valid: set[str] | None = None) -> ReviewItem | None:
+        heap = self.by_doc.get(document)
+        while heap and not self._fresh(heap[0][0], document, heap[0][1]):
+            heapq.heappop(heap)  # reagendada ou esquecida
+        if not heap:
+            return None
+        # chaves fora de `valid` (de outra versão do documento) continuam no heap: percorre
+        # em ordem de vencimento a partir do topo sem tirar nada
+        frontier = [(heap[0], 0)]
+        while frontier:
+            (due, key), i = heapq.heappop(frontier)
+            if self._fresh(due, document, key) and (valid is None or key in valid):
+                return self.items[(document, key)]
+            for j in (2 * i + 1, 2 * i + 2):
+                if j < len(heap):
+                    heapq.heappush(frontier, (heap[j], j))
+        return None
+
+    def due_in_doc(self, document: str, now: float) -> set[str]:
+        """Chaves vencidas do documento: desce no heap só pelos ramos com vencimento <= now."""
+        heap = self.by_doc.get(document, [])
+        keys, stack = set(), [0] if heap else []
+        while stack:
+            i = stack.pop()
+            due, key = heap[i]
+            if due > now:
+                continue
+            if self._fresh(due, document, key):
+                keys.add(key)
+            stack.extend(j for j in (2 * i + 1, 2 * i + 2) if j < len(heap))
+        return keys
+
+    def peek_all(self) -> ReviewItem | None:
+        heap = self.all
+        while heap:
+            due, document, key = heap[0]
+            if self._fresh(due, document, key):
+                return self.items[(document, key)]
+            heapq.heappop(heap)
+        return None
+
+
+class ReviewScheduler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users: dict[str, _UserQueue] = {}
+
+    def _queue(self, user_id: str) -> _UserQueue:
+        # chamado com o lock: carrega do banco o usuário na 1ª vez; depois de refresh(),
+        # confere uma vez se a tabela mudou (revisão de outro worker) e recarrega se sim
+        from src.storage.db import load_reviews, reviews_stamp
+        q = self._users.get(user_id)
+        if q is not None and q.checked:
+            return q
+        stamp = reviews_stamp(user_id)
+        if q is None or q.stamp != stamp:
+            fresh = _UserQueue((ReviewItem(**row) for row in load_reviews(user_id)), stamp)
+            if q is not None:
+                fresh.attempts = q.attempts  # tentativas em andamento são só da memória
+            q = self._users[user_id] = fresh
+        q.checked = True
+        return q
+
+    def refresh(self, user_id: str) -> None:
+        """Nova execução do app: a próxima consulta confere se outro worker gravou revisões."""
+        with self._lock:
+            q = self._users.get(user_id)
+            if q is not None:
+                q.checked = False
+
+    # ----- registro (jogo) -----
+    def record_answer(self, user_id: str, document: str, key: str, correct: bool, blank: int = 0) -> None:
+        """Resposta na lacuna `blank`: os erros contam para a nota quando a missão for concluída."""
+        if correct:
+            return
+        with self._lock:
+            q = self._queue(user_id)
+            wrong = q.attempts.setdefault((document, key), {})
+            wrong[blank] = wrong.get(blank, 0) + 1
+
+    def review(self, user_id: str, document: str, key: str, blanks: int, correct: Iterable[int],
+               now: float | None = None) -> ReviewItem:
+        """Missão concluída (`correct`: lacunas certas no fim): dá a nota, reagenda e grava."""
+        now = time.time() if now is None else now
+        correct = set(correct)
+        with self._lock:
+            q = self._queue(user_id)
+            wrong = q.attempts.pop((document, key), {})
+            misses = len(set(wrong) | (set(range(blanks)) - correct))
+            item = q.items.get((document, key))
+            if item is None:
+                item = q.items[(document, key)] = ReviewItem(document, key)
+            item.errors += sum(wrong.values())
+            schedule(item, quality(misses, blanks, len(correct)), now)
+            q.push(item)
+            row = asdict(item)
+            from src.storage.db import save_review
+            # a gravação é nossa: o stamp acompanha, sem recarregar na próxima conferência
+            q.stamp = (save_review(user_id, row), len(q.items))
+        return ReviewItem(**row)
+
+    # ----- consulta -----
+    def next_due(self, user_id: str, document: str | None = None, now: float | None = None,
+                 valid: set[str] | None = None) -> ReviewItem | None:
+        """
+        Revisão vencida mais antiga (do documento, ou de todos com document=None);
+        None se nada venceu. `valid` restringe às chaves da versão atual do documento.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            q = self._queue(user_id)
+            item = q.peek_doc(document, valid) if document is not None else q.peek_all()
+        return item if item is not None and item.due <= now else None
+
+    def due_keys(self, user_id: str, document: str, now: float | None = None) -> set[str]:
+        """Chaves vencidas do documento (para marcar no mapa)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            return self._queue(user_id).due_in_doc(document, now)
+
+    def forget(self, document: str) -> None:
+        """Documento removido: some dos itens (os heaps descartam as entradas ao chegar nelas)."""
+        with self._lock:
+            for q in self._users.values():
+                for k in [k for k in q.items if k[0] == document]:
+                    del q.items[k]
+                q.by_doc.pop(document, None)
+
+
+_SCHEDULER: ReviewScheduler | None = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def get_scheduler() -> ReviewScheduler:
+    """ReviewScheduler único do processo."""
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            _SCHEDULER = ReviewScheduler()
+        return _SCHEDULER
+
+
+def next_mission(user_id: str, document: str, engine, completed: set[int],
+                 now: float | None = None) -> tuple[int | None, str | None]:
+    """
+    Próxima missão a jogar no GameEngine do documento: a revisão vencida mais antiga ou,
+    se nenhuma venceu, a primeira ainda não concluída. Devolve (índice, "review" | "new")
+    ou (None, None).
+    """
+    item = get_scheduler().next_due(user_id, document, now, valid=engine.keys())
+    if item is not None:
+        return engine.index_of(item.key), "review"
+    index = engine.next_level(None, completed)
+    return (index, "new") if index is not None else (None, None)
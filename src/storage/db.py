@@ -0,0 +1,725 @@
+import os, json, glob, time, sqlite3, threading
+from contextlib import contextmanager
+from typing import Iterator
+
+# Banco único em data/saves (GAME_DB_PATH sobrescreve). WAL permite vários leitores
+# e um escritor ao mesmo tempo, então vários workers do Streamlit podem compartilhar
+# o mesmo volume de dados.
+DEFAULT_USER = "local"
+BUSY_TIMEOUT_MS = 5000
+SEARCH_INDEX_VERSION = 2    # formato das tabelas search_*: muda => o índice é refeito no aquecimento
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    name            TEXT PRIMARY KEY,
+    pdf_path        TEXT NOT NULL,
+    title           TEXT,
+    sha256          TEXT,
+    missions_count  INTEGER NOT NULL DEFAULT 0,
+    updated_at      REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS contents (
+    sha256      TEXT PRIMARY KEY,
+    path        TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    name        TEXT NOT NULL,      -- 1º nome enviado: nome canônico (sementes, doc_id, progresso)
+    created_at  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS uploads (
+    name        TEXT PRIMARY KEY,
+    sha256      TEXT NOT NULL REFERENCES contents (sha256) ON DELETE CASCADE,
+    created_at  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bundles (
+    sha256          TEXT NOT NULL,
+    version         INTEGER NOT NULL,
+    seed_name       TEXT NOT NULL,
+    path            TEXT NOT NULL,
+    missions_count  INTEGER NOT NULL,
+    pages           INTEGER,
+    articles        INTEGER,
+    created_at      REAL NOT NULL,
+    PRIMARY KEY (sha256, version)
+);
+CREATE TABLE IF NOT EXISTS missions (
+    sha256          TEXT NOT NULL,
+    version         INTEGER NOT NULL,
+    mission_id      INTEGER NOT NULL,
+    title           TEXT NOT NULL,
+    seed            TEXT,       -- 64 bits sem sinal não cabem em INTEGER
+    key             TEXT,       -- chave estável do artigo (hash do texto), igual entre versões do PDF
+    PRIMARY KEY (sha256, version, mission_id),
+    FOREIGN KEY (sha256, version) REFERENCES bundles (sha256, version) ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS page_text (
+    sha256      TEXT NOT NULL,
+    backend     TEXT NOT NULL,      -- extrator que produziu o texto (src.extractor.backends)
+    page        INTEGER NOT NULL,
+    text        TEXT NOT NULL,
+    fingerprint TEXT,               -- hash do conteúdo e das fontes da página: reaproveita o texto na versão seguinte do PDF
+    PRIMARY KEY (sha256, backend, page)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS search_docs (
+    doc         INTEGER PRIMARY KEY,    -- id curto do conteúdo nas postagens (o sha repetido pesa)
+    sha256      TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS search_articles (
+    doc         INTEGER NOT NULL REFERENCES search_docs (doc) ON DELETE CASCADE,
+    mission_id  INTEGER NOT NULL,   -- posição da missão no mapa (0 = 1ª), não o id da missão
+    key         TEXT,
+    title       TEXT NOT NULL,
+    length      INTEGER NOT NULL,   -- termos do artigo (BM25)
+    PRIMARY KEY (doc, mission_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS search_postings (
+    term        TEXT NOT NULL,      -- minúsculo e sem acento (src.storage.library.fold)
+    doc         INTEGER NOT NULL,
+    mission_id  INTEGER NOT NULL,
+    tf          INTEGER NOT NULL,
+    positions   TEXT NOT NULL,      -- posições do termo no artigo, separadas por espaço
+    PRIMARY KEY (term, doc, mission_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS search_postings_doc ON search_postings (doc);
+CREATE TABLE IF NOT EXISTS progress (
+    user_id                 TEXT NOT NULL,
+    document                TEXT NOT NULL,
+    mission_progress        TEXT NOT NULL DEFAULT '[]',
+    current_mission_index   INTEGER,
+    draft                   TEXT,               -- lacunas da missão em andamento (JSON)
+    journal_seq             INTEGER NOT NULL DEFAULT 0,  -- último registro do diário já compactado
+    updated_at              REAL NOT NULL,
+    PRIMARY KEY (user_id, document)
+);
+CREATE TABLE IF NOT EXISTS progress_journal (
+    seq         INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id     TEXT NOT NULL,
+    document    TEXT NOT NULL,
+    kind        TEXT NOT NULL,
+    data        TEXT NOT NULL,
+    ts          REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS progress_journal_key ON progress_journal (user_id, document, seq);
+CREATE TABLE IF NOT EXISTS reviews (
+    user_id     TEXT NOT NULL,
+    document    TEXT NOT NULL,
+    mission_key TEXT NOT NULL,      -- chave estável da missão (sobrevive a novas versões do PDF)
+    ease        REAL NOT NULL,
+    interval    REAL NOT NULL,      -- segundos até a próxima revisão
+    due         REAL NOT NULL,
+    reps        INTEGER NOT NULL,
+    lapses      INTEGER NOT NULL,
+    errors      INTEGER NOT NULL,
+    updated_at  REAL NOT NULL,
+    PRIMARY KEY (user_id, document, mission_key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key     TEXT PRIMARY KEY,
+    value   TEXT
+);
+"""
+
+# ========== conexão ==========
+def save_dir() -> str:
+    d = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "saves")  # .../src/data/saves
+    os.makedirs(d, exist_ok=True)
+    return d
+
+def db_path() -> str:
+    env = os.environ.get("GAME_DB_PATH", "").strip()
+    return env or os.path.join(save_dir(), "game.db")
+
+# uma conexão por thread (sqlite3 não compartilha conexões entre threads)
+_LOCAL = threading.local()
+_INIT_LOCK = threading.Lock()
+_INITIALIZED: set[str] = set()
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+def connection() -> sqlite3.Connection:
+    """Conexão da thread atual (cria o esquema e migra os JSON antigos na 1ª vez)."""
+    path = db_path()
+    conns = getattr(_LOCAL, "conns", None)
+    if conns is None:
+        conns = _LOCAL.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        conn = conns[path] = _connect(path)
+        with _INIT_LOCK:
+            if path not in _INITIALIZED:
+                conn.executescript(_SCHEMA)
+                _ensure_columns(conn, "progress", {
+                    "draft": "TEXT",
+                    "journal_seq": "INTEGER NOT NULL DEFAULT 0",
+                })
+                _ensure_columns(conn, "bundles", {"pages": "INTEGER", "articles": "INTEGER"})
+                _ensure_columns(conn, "missions", {"key": "TEXT"})
+                _ensure_columns(conn, "page_text", {"fingerprint": "TEXT"})
+                conn.execute("DROP INDEX IF EXISTS page_text_fingerprint")  # a busca agora é por (sha256, backend)
+                _check_search_index(conn)
+                _migrate_legacy_json(conn, save_dir())
+                _INITIALIZED.add(path)
+    return conn
+
+def _ensure_columns(conn: sqlite3.Connection, table: str, columns: dict[str, str]) -> None:
+    """Acrescenta colunas novas a tabelas criadas por versões anteriores do esquema."""
+    existing = {r["name"] for r in conn.execute(f"PRAGMA table_info({table})")}
+    for name, decl in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+def _check_search_index(conn: sqlite3.Connection) -> None:
+    """Índice de busca de outro formato (v1 guardava o id da missão, não a posição): esvazia."""
+    r = conn.execute("SELECT value FROM meta WHERE key = 'search_index_version'").fetchone()
+    if r is not None and int(r["value"]) == SEARCH_INDEX_VERSION:
+        return
+    conn.execute("DELETE FROM search_postings")
+    conn.execute("DELETE FROM search_articles")
+    conn.execute("DELETE FROM search_docs")
+    conn.execute(
+        "INSERT OR REPLACE INTO meta (key, value) VALUES ('search_index_version', ?)", (str(SEARCH_INDEX_VERSION),)
+    )
+
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    """
+    Transação de escrita atômica: BEGIN IMMEDIATE pega o lock de escrita logo no início,
+    então dois workers não intercalam leitura-e-escrita; erro => rollback.
+    """
+    conn = connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+# ========== versão da biblioteca ==========
+# contador no banco, incrementado por toda escrita que muda a listagem (uploads, documentos,
+# bundles): os índices em memória de qualquer worker comparam com ele para se invalidar
+def _bump_library(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        INSERT INTO meta (key, value) VALUES ('library_version', '1')
+        ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+        """
+    )
+
+def library_version() -> int:
+    r = connection().execute("SELECT value FROM meta WHERE key = 'library_version'").fetchone()
+    return int(r["value"]) if r else 0
+
+# ========== documentos ==========
+def upsert_document(name: str, pdf_path: str, missions_count: int, sha256: str | None = None) -> str | None:
+    """Grava o documento; devolve o sha256 registrado antes (conteúdo a que o progresso se refere)."""
+    with transaction() as conn:
+        previous = conn.execute("SELECT sha256 FROM documents WHERE name = ?", (name,)).fetchone()
+        conn.execute(
+            """
+            INSERT INTO documents (name, pdf_path, title, sha256, missions_count, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (name) DO UPDATE SET
+                pdf_path = excluded.pdf_path,
+                sha256 = COALESCE(excluded.sha256, documents.sha256),
+                missions_count = excluded.missions_count,
+                updated_at = excluded.updated_at
+            """,
+            (name, pdf_path, name, sha256, missions_count, time.time()),
+        )
+        _bump_library(conn)
+    return previous["sha256"] if previous else None
+
+def list_documents() -> dict[str, dict]:
+    """{nome: {pdf_path, document_title, missions_count, sha256}} (mesmo formato do index.json)."""
+    rows = connection().execute(
+        "SELECT name, pdf_path, title, sha256, missions_count FROM documents"
+    ).fetchall()
+    return {
+        r["name"]: {
+            "pdf_path": r["pdf_path"],
+            "document_title": r["title"],
+            "missions_count": r["missions_count"],
+            "sha256": r["sha256"],
+        }
+        for r in rows
+    }
+
+def delete_document(name: str) -> None:
+    """Remove o documento e o progresso de todos os usuários nele."""
+    with transaction() as conn:
+        conn.execute("DELETE FROM documents WHERE name = ?", (name,))
+        conn.execute("DELETE FROM progress WHERE document = ?", (name,))
+        conn.execute("DELETE FROM progress_journal WHERE document = ?", (name,))
+        conn.execute("DELETE FROM reviews WHERE document = ?", (name,))
+        _bump_library(conn)
+
+# ========== uploads (nome -> conteúdo) ==========
+def register_upload(name: str, sha256: str, path: str, size: int) -> tuple[str, list[tuple[str, str]]]:
+    """
+    Associa `name` ao conteúdo `sha256` (gravado em `path`). Devolve o nome canônico do
+    conteúdo e os (sha, caminho) que ficaram sem nenhum nome (reenvio com outro conteúdo).
+    """
+    now = time.time()
+    with transaction() as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO contents (sha256, path, size, name, created_at) VALUES (?, ?, ?, ?, ?)",
+            (sha256, path, size, name, now),
+        )
+        old = conn.execute("SELECT sha256 FROM uploads WHERE name = ?", (name,)).fetchone()
+        conn.execute(
+            "INSERT OR REPLACE INTO uploads (name, sha256, created_at) VALUES (?, ?, ?)", (name, sha256, now)
+        )
+        orphans = []
+        if old is not None and old["sha256"] != sha256:
+            orphans = _drop_unreferenced(conn, old["sha256"])
+            if not orphans:
+                # o conteúdo antigo segue com outros apelidos: o nome canônico passa para o
+                # apelido mais antigo, senão dois conteúdos ficariam com o mesmo nome
+                conn.execute(
+                    """
+                    UPDATE contents SET name = (
+                        SELECT name FROM uploads WHERE sha256 = ? ORDER BY created_at, name LIMIT 1
+                    ) WHERE sha256 = ? AND name = ?
+                    """,
+                    (old["sha256"], old["sha256"], name),
+                )
+        canonical = conn.execute("SELECT name FROM contents WHERE sha256 = ?", (sha256,)).fetchone()["name"]
+        _bump_library(conn)
+    return canonical, orphans
+
+def _drop_unreferenced(conn: sqlite3.Connection, sha256: str) -> list[tuple[str, str]]:
+    if conn.execute("SELECT 1 FROM uploads WHERE sha256 = ?", (sha256,)).fetchone():
+        return []
+    row = conn.execute("SELECT path FROM contents WHERE sha256 = ?", (sha256,)).fetchone()
+    conn.execute("DELETE FROM contents WHERE sha256 = ?", (sha256,))
+    return [(sha256, row["path"])] if row else []
+
+def list_contents() -> list[dict]:
+    """Um item por conteúdo: {sha256, path, size, name (canônico), aliases (outros nomes)}, por nome."""
+    conn = connection()
+    contents = {
+        r["sha256"]: {"sha256": r["sha256"], "path": r["path"], "size": r["size"], "name": r["name"], "aliases": []}
+        for r in conn.execute("SELECT sha256, path, size, name FROM contents")
+    }
+    for r in conn.execute("SELECT name, sha256 FROM uploads ORDER BY name"):
+        c = contents.get(r["sha256"])
+        if c is not None and r["name"] != c["name"]:
+            c["aliases"].append(r["name"])
+    return sorted(contents.values(), key=lambda c: c["name"])
+
+def upload_names() -> set[str]:
+    return {r["name"] for r in connection().execute("SELECT name FROM uploads")}
+
+def delete_content(name: str) -> tuple[str, str] | None:
+    """Esquece o conteúdo para o qual `name` aponta hoje e todos os seus apelidos; devolve (sha, caminho)."""
+    with transaction() as conn:
+        row = conn.execute(
+            "SELECT c.sha256, c.path FROM uploads u JOIN contents c ON c.sha256 = u.sha256 WHERE u.name = ?",
+            (name,),
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("DELETE FROM uploads WHERE sha256 = ?", (row["sha256"],))
+        conn.execute("DELETE FROM contents WHERE sha256 = ?", (row["sha256"],))
+        _bump_library(conn)
+    return row["sha256"], row["path"]
+
+# ========== bundles e missões ==========
+def record_bundle(
+    sha256: str, version: int, seed_name: str, path: str, missions: list[tuple[int, str, int | None, str]],
+    pages: int | None = None, articles: int | None = None,
+) -> None:
+    """
+    Registra o bundle gravado em disco, suas contagens e o (id, título, semente, chave) de
+    cada missão; os registros de outras versões do mesmo conteúdo saem (arquivos já apagados).
+    """
+    with transaction() as conn:
+        conn.execute("DELETE FROM bundles WHERE sha256 = ?", (sha256,))
+        conn.execute(
+            """
+            INSERT INTO bundles (sha256, version, seed_name, path, missions_count, pages, articles, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (sha256, version, seed_name, path, len(missions), pages, articles, time.time()),
+        )
+        conn.executemany(
+            "INSERT INTO missions (sha256, version, mission_id, title, seed, key) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (sha256, version, mid, title, None if seed is None else str(seed), key)
+                for mid, title, seed, key in missions
+            ],
+        )
+        _bump_library(conn)
+
+def collect_unreferenced(sha256: str) -> list[str] | None:
+    """
+    Conteúdo que nenhum documento nem upload usa mais: apaga bundles (e missões), texto
+    das páginas e índice de busca dele. Devolve os caminhos dos bundles registrados
+    (arquivos a apagar) ou None se o conteúdo ainda é usado (nada muda).
+    """
+    with transaction() as conn:
+        if conn.execute(
+            "SELECT 1 FROM contents WHERE sha256 = ? UNION ALL SELECT 1 FROM documents WHERE sha256 = ? LIMIT 1",
+            (sha256, sha256),
+        ).fetchone():
+            return None
+        paths = [r["path"] for r in conn.execute("SELECT path FROM bundles WHERE sha256 = ?", (sha256,))]
+        conn.execute("DELETE FROM bundles WHERE sha256 = ?", (sha256,))
+        conn.execute("DELETE FROM page_text WHERE sha256 = ?", (sha256,))
+        _delete_search(conn, sha256)
+        _bump_library(conn)
+    return paths
+
+def bundle_stats(version: int) -> dict[str, dict]:
+    """{sha256: {missions, pages, articles}} dos bundles da versão `version`."""
+    rows = connection().execute(
+        "SELECT sha256, missions_count, pages, articles FROM bundles WHERE version = ?", (version,)
+    ).fetchall()
+    return {r["sha256"]: {"missions": r["missions_count"], "pages": r["pages"], "articles": r["articles"]} for r in rows}
+
+def bundle_seed_name(sha256: str, version: int) -> str | None:
+    """Nome usado nas sementes do bundle registrado (None se não há registro)."""
+    r = connection().execute(
+        "SELECT seed_name FROM bundles WHERE sha256 = ? AND version = ?", (sha256, version)
+    ).fetchone()
+    return r["seed_name"] if r else None
+
+def previous_bundle_sha(seed_name: str, version: int | None, exclude_sha: str) -> str | None:
+    """Conteúdo do bundle mais recente compilado com este nome, fora `exclude_sha` (version=None: qualquer versão)."""
+    r = connection().execute(
+        """
+        SELECT sha256 FROM bundles WHERE seed_name = ? AND (? IS NULL OR version = ?) AND sha256 != ?
+        ORDER BY created_at DESC LIMIT 1
+        """,
+        (seed_name, version, version, exclude_sha),
+    ).fetchone()
+    return r["sha256"] if r else None
+
+def mission_keys(sha256: str, version: int | None = None) -> list[str | None]:
+    """
+    Chave de cada missão, na ordem do mapa (posição i = índice salvo no progresso).
+    Com `version` None, as da versão com que o conteúdo foi registrado por último.
+    """
+    if version is None:
+        row = connection().execute(
+            "SELECT MAX(version) AS v FROM bundles WHERE sha256 = ?", (sha256,)
+        ).fetchone()
+        if row is None or row["v"] is None:
+            return []
+        version = row["v"]
+    rows = connection().execute(
+        "SELECT key FROM missions WHERE sha256 = ? AND version = ? ORDER BY mission_id", (sha256, version)
+    ).fetchall()
+    return [r["key"] for r in rows]
+
+def mission_titles(sha256: str, version: int) -> list[tuple[int, str]]:
+    rows = connection().execute(
+        "SELECT mission_id, title FROM missions WHERE sha256 = ? AND version = ? ORDER BY mission_id",
+        (sha256, version),
+    ).fetchall()
+    return [(r["mission_id"], r["title"]) for r in rows]
+
+# ========== texto extraído por página ==========
+def load_page_texts(sha256: str, backend: str) -> dict[int, str]:
+    """{página: texto} já extraídas deste conteúdo com este extrator."""
+    rows = connection().execute(
+        "SELECT page, text FROM page_text WHERE sha256 = ? AND backend = ?", (sha256, backend)
+    ).fetchall()
+    return {r["page"]: r["text"] for r in rows}
+
+def save_page_texts(sha256: str, backend: str, pages: dict[int, str],
+                    fingerprints: dict[int, str] | None = None) -> None:
+    if not pages:
+        return
+    fingerprints = fingerprints or {}
+    with transaction() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO page_text (sha256, backend, page, text, fingerprint) VALUES (?, ?, ?, ?, ?)",
+            [(sha256, backend, page, text, fingerprints.get(page)) for page, text in pages.items()],
+        )
+
+def page_texts_by_fingerprint(sha256: str, backend: str, fingerprints: list[str]) -> dict[str, str]:
+    """{fingerprint: texto} das páginas idênticas já extraídas do conteúdo `sha256`."""
+    found: dict[str, str] = {}
+    conn = connection()
+    unique = list(dict.fromkeys(fingerprints))
+    for i in range(0, len(unique), 500):  # limite de parâmetros do SQLite
+        chunk = unique[i:i + 500]
+        rows = conn.execute(
+            f"""
+            SELECT fingerprint, text FROM page_text
+            WHERE sha256 = ? AND backend = ? AND fingerprint IN ({','.join('?' * len(chunk))})
+            """,
+            (sha256, backend, *chunk),
+        ).fetchall()
+        found.update((r["fingerprint"], r["text"]) for r in rows)
+    return found
+
+def delete_page_texts(sha256: str) -> None:
+    with transaction() as conn:
+        conn.execute("DELETE FROM page_text WHERE sha256 = ?", (sha256,))
+
+# ========== busca nos artigos (src.storage.search) ==========
+def save_search_index(sha256: str, articles: list[tuple[int, str | None, str, int]],
+                      postings: list[tuple[str, int, int, str]]) -> None:
+    """Troca o índice do conteúdo: artigos (posição, chave, título, tamanho) e (termo, posição, tf, posições)."""
+    with transaction() as conn:
+        _delete_search(conn, sha256)
+        doc = conn.execute("INSERT INTO search_docs (sha256) VALUES (?)", (sha256,)).lastrowid
+        conn.executemany(
+            "INSERT INTO search_articles (doc, mission_id, key, title, length) VALUES (?, ?, ?, ?, ?)",
+            [(doc, mid, key, title, length) for mid, key, title, length in articles],
+        )
+        conn.executemany(
+            "INSERT INTO search_postings (term, doc, mission_id, tf, positions) VALUES (?, ?, ?, ?, ?)",
+            [(term, doc, mid, tf, positions) for term, mid, tf, positions in postings],
+        )
+        _bump_library(conn)
+
+def _delete_search(conn: sqlite3.Connection, sha256: str) -> None:
+    r = conn.execute("SELECT doc FROM search_docs WHERE sha256 = ?", (sha256,)).fetchone()
+    if r is not None:
+        conn.execute("DELETE FROM search_postings WHERE doc = ?", (r["doc"],))
+        conn.execute("DELETE FROM search_docs WHERE doc = ?", (r["doc"],))  # artigos em cascata
+
+def indexed_contents() -> set[str]:
+    return {r["sha256"] for r in connection().execute("SELECT sha256 FROM search_docs")}
+
+def search_corpus() -> dict[int, tuple[str, list[int]]]:
+    """{doc: (sha256, termos de cada artigo na ordem do mapa)} dos conteúdos indexados ainda na biblioteca."""
+    corpus: dict[int, tuple[str, list[int]]] = {}
+    rows = connection().execute(
+        """
+        SELECT d.doc, d.sha256, a.mission_id, a.length FROM search_docs d
+        JOIN search_articles a ON a.doc = d.doc
+        WHERE d.sha256 IN (SELECT sha256 FROM contents)
+        ORDER BY d.doc, a.mission_id
+        """
+    )
+    for doc, sha256, _, length in rows:
+        corpus.setdefault(doc, (sha256, []))[1].append(length)  # posições 0..n-1, sem buracos
+    return corpus
+
+def search_postings(term: str, prefix: bool = False) -> list[tuple[int, int, int, str]]:
+    """(doc, posição, tf, posições) do termo, ou de todos os termos que começam com ele (juntos por artigo)."""
+    if prefix:
+        rows = connection().execute(
+            """
+            SELECT doc, mission_id, SUM(tf), GROUP_CONCAT(positions, ' ') FROM search_postings
+            WHERE term >= ? AND term < ? GROUP BY doc, mission_id
+            """,
+            (term, term + "\uffff"),
+        )
+    else:
+        rows = connection().execute(
+            "SELECT doc, mission_id, tf, positions FROM search_postings WHERE term = ?", (term,)
+        )
+    return rows.fetchall()
+
+def search_articles(hits: list[tuple[int, int]]) -> dict[tuple[int, int], dict]:
+    """{(doc, posição): {sha256, title, key, document, path}} dos artigos achados (documento = nome canônico)."""
+    conn = connection()
+    out = {}
+    for doc, mid in hits:
+        r = conn.execute(
+            """
+            SELECT d.sha256, a.title, a.key, c.name, c.path FROM search_articles a
+            JOIN search_docs d ON d.doc = a.doc
+            JOIN contents c ON c.sha256 = d.sha256
+            WHERE a.doc = ? AND a.mission_id = ?
+            """,
+            (doc, mid),
+        ).fetchone()
+        if r is not None:
+            out[(doc, mid)] = {"sha256": r["sha256"], "title": r["title"], "key": r["key"],
+                               "document": r["name"], "path": r["path"]}
+    return out
+
+# ========== progresso por usuário ==========
+def load_progress(user_id: str, document: str, conn: sqlite3.Connection | None = None) -> dict | None:
+    """
+    Snapshot salvo: {mission_progress, current_mission_index, draft, journal_seq, updated_at}
+    ou None se nunca salvo. Não inclui o diário (ver src.storage.journal.replay).
+    """
+    r = (conn or connection()).execute(
+        """
+        SELECT mission_progress, current_mission_index, draft, journal_seq, updated_at
+        FROM progress WHERE user_id = ? AND document = ?
+        """,
+        (user_id, document),
+    ).fetchone()
+    if r is None:
+        return None
+    return {
+        "mission_progress": json.loads(r["mission_progress"]),
+        "current_mission_index": r["current_mission_index"],
+        "draft": json.loads(r["draft"]) if r["draft"] else None,
+        "journal_seq": r["journal_seq"],
+        "updated_at": r["updated_at"],
+    }
+
+def progress_users(document: str, conn: sqlite3.Connection | None = None) -> list[str]:
+    """Usuários com snapshot ou diário neste documento."""
+    rows = (conn or connection()).execute(
+        """
+        SELECT user_id FROM progress WHERE document = ?
+        UNION SELECT user_id FROM progress_journal WHERE document = ?
+        """,
+        (document, document),
+    ).fetchall()
+    return [r["user_id"] for r in rows]
+
+# ========== revisão espaçada (src.game.scheduler) ==========
+def load_reviews(user_id: str) -> list[dict]:
+    """Agenda de revisões do usuário em todos os documentos."""
+    rows = connection().execute(
+        """
+        SELECT document, mission_key AS key, ease, interval, due, reps, lapses, errors
+        FROM reviews WHERE user_id = ?
+        """,
+        (user_id,),
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+def save_review(user_id: str, review: dict) -> float:
+    """Grava {document, key, ease, interval, due, reps, lapses, errors} de uma missão; devolve o updated_at."""
+    updated_at = time.time()
+    with transaction() as conn:
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO reviews
+                (user_id, document, mission_key, ease, interval, due, reps, lapses, errors, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (user_id, review["document"], review["key"], review["ease"], review["interval"],
+             review["due"], review["reps"], review["lapses"], review["errors"], updated_at),
+        )
+    return updated_at
+
+def reviews_stamp(user_id: str) -> tuple:
+    """(última gravação, nº de revisões) do usuário: muda a cada save_review, de qualquer worker."""
+    r = connection().execute(
+        "SELECT MAX(updated_at), COUNT(*) FROM reviews WHERE user_id = ?", (user_id,)
+    ).fetchone()
+    return tuple(r)
+
+def documents_with_progress(user_id: str) -> set[str]:
+    rows = connection().execute(
+        "SELECT document FROM progress WHERE user_id = ? UNION SELECT document FROM progress_journal WHERE user_id = ?",
+        (user_id, user_id),
+    ).fetchall()
+    return {r["document"] for r in rows}
+
+def last_studied(user_id: str, documents: list[str]) -> dict[str, float]:
+    """Último registro de progresso (snapshot ou diário) de cada documento, numa consulta só."""
+    if not documents:
+        return {}
+    marks = ",".join("?" * len(documents))
+    rows = connection().execute(
+        f"""
+        SELECT document, MAX(ts) AS ts FROM (
+            SELECT document, updated_at AS ts FROM progress WHERE user_id = ? AND document IN ({marks})
+            UNION ALL
+            SELECT document, ts FROM progress_journal WHERE user_id = ? AND document IN ({marks})
+        ) GROUP BY document
+        """,
+        (user_id, *documents, user_id, *documents),
+    ).fetchall()
+    return {r["document"]: r["ts"] for r in rows}
+
+# ========== diário de progresso ==========
+def append_journal(records: list[tuple[str, str, str, dict, float]]) -> None:
+    """Grava (user_id, document, kind, data, ts) de uma vez, numa única transação."""
+    with transaction() as conn:
+        conn.executemany(
+            "INSERT INTO progress_journal (user_id, document, kind, data, ts) VALUES (?, ?, ?, ?, ?)",
+            [(u, d, k, json.dumps(data, ensure_ascii=False), ts) for u, d, k, data, ts in records],
+        )
+
+def journal_tail(user_id: str, document: str, after_seq: int, conn: sqlite3.Connection | None = None) -> list[tuple[int, str, dict]]:
+    """Registros (seq, kind, data) posteriores a `after_seq`, em ordem."""
+    rows = (conn or connection()).execute(
+        "SELECT seq, kind, data FROM progress_journal WHERE user_id = ? AND document = ? AND seq > ? ORDER BY seq",
+        (user_id, document, after_seq),
+    ).fetchall()
+    return [(r["seq"], r["kind"], json.loads(r["data"])) for r in rows]
+
+def journal_length(user_id: str, document: str) -> int:
+    return connection().execute(
+        "SELECT COUNT(*) FROM progress_journal WHERE user_id = ? AND document = ?", (user_id, document)
+    ).fetchone()[0]
+
+def write_snapshot(conn: sqlite3.Connection, user_id: str, document: str, state: dict, journal_seq: int) -> None:
+    """Grava o estado compactado e apaga o diário até `journal_seq` (use dentro de transaction())."""
+    conn.execute(
+        """
+        INSERT INTO progress (user_id, document, mission_progress, current_mission_index, draft, journal_seq, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (user_id, document) DO UPDATE SET
+            mission_progress = excluded.mission_progress,
+            current_mission_index = excluded.current_mission_index,
+            draft = excluded.draft,
+            journal_seq = excluded.journal_seq,
+            updated_at = excluded.updated_at
+        """,
+        (
+            user_id, document, json.dumps(sorted(state["mission_progress"])), state["current_mission_index"],
+            json.dumps(state["draft"], ensure_ascii=False) if state.get("draft") else None,
+            journal_seq, time.time(),
+        ),
+    )
+    conn.execute(
+        "DELETE FROM progress_journal WHERE user_id = ? AND document = ? AND seq <= ?",
+        (user_id, document, journal_seq),
+    )
+
+# ========== migração dos JSON antigos ==========
+def _migrate_legacy_json(conn: sqlite3.Connection, save_dir: str) -> None:
+    """
+    Importa uma única vez index.json e study_status_*.json (progresso vai para DEFAULT_USER).
+    Os arquivos antigos ficam no lugar; a flag em `meta` evita reimportar.
+    """
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_json_imported'").fetchone():
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if not conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_json_imported'").fetchone():
+            now = time.time()
+            index = _read_json(os.path.join(save_dir, "index.json")) or {}
+            for name, meta in index.items():
+                if not isinstance(meta, dict):
+                    continue
+                conn.execute(
+                    "INSERT OR IGNORE INTO documents (name, pdf_path, title, missions_count, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (name, meta.get("pdf_path") or "", meta.get("document_title") or name,
+                     int(meta.get("missions_count") or 0), now),
+                )
+            for path in glob.glob(os.path.join(save_dir, "study_status_*.json")):
+                status = _read_json(path) or {}
+                name = status.get("document_title")
+                if not name:
+                    continue
+                conn.execute(
+                    "INSERT OR IGNORE INTO progress (user_id, document, mission_progress, current_mission_index, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (DEFAULT_USER, name, json.dumps(sorted(status.get("mission_progress") or [])),
+                     status.get("current_mission_index"), status.get("timestamp") or now),
+                )
+            conn.execute("INSERT INTO meta (key, value) VALUES ('legacy_json_imported', ?)", (str(now),))
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+def _read_json(path: str) -> dict | None:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
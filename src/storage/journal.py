@@ -0,0 +1,226 @@
+import atexit, queue, threading, time
+
+from . import db
+
+# Diário de progresso: cada resposta, abertura e conclusão de missão vira um registro
+# pequeno (kind + data) enfileirado em memória; uma thread grava em lotes no SQLite.
+# De tempos em tempos o diário de (usuário, documento) é compactado no snapshot da
+# tabela `progress`; carregar = snapshot + replay da cauda do diário.
+FLUSH_INTERVAL = 0.5    # s entre gravações de lote
+BATCH_SIZE = 256
+COMPACT_EVERY = 200     # registros no diário antes de compactar
+
+
+# ========== estado e replay ==========
+def empty_state() -> dict:
+    return {"mission_progress": set(), "current_mission_index": None, "draft": None}
+
+def _new_draft(data: dict) -> dict:
+    # `variant` (versão do gerador + semente) diz com que lacunas o rascunho foi preenchido
+    return {"mission": data["mission"], "selected": {}, "correct": [], "variant": data.get("variant")}
+
+def apply_record(state: dict, kind: str, data: dict) -> dict:
+    """Aplica um registro do diário ao estado (puro; usado no replay e na compactação)."""
+    if kind == "open":
+        state["current_mission_index"] = data["mission"]
+        state["draft"] = _new_draft(data)
+    elif kind == "answer":
+        draft = state.get("draft")
+        if not draft or draft["mission"] != data["mission"]:
+            draft = state["draft"] = _new_draft(data)
+        blank = str(data["blank"])
+        draft["selected"][blank] = data["word"]
+        correct = set(draft["correct"])
+        (correct.add if data.get("correct") else correct.discard)(data["blank"])
+        draft["correct"] = sorted(correct)
+    elif kind == "clear":
+        draft = state.get("draft")
+        if draft and draft["mission"] == data["mission"]:
+            if data.get("blank") is None:
+                draft["selected"], draft["correct"] = {}, []
+            else:
+                draft["selected"].pop(str(data["blank"]), None)
+                draft["correct"] = [i for i in draft["correct"] if i != data["blank"]]
+    elif kind == "complete":
+        state["mission_progress"].add(data["mission"])
+        state["draft"] = None
+    elif kind == "save":
+        # "Salvar status": o estado da sessão substitui tudo o que veio antes
+        state["mission_progress"] = set(data["mission_progress"])
+        state["current_mission_index"] = data["current_mission_index"]
+        state["draft"] = data.get("draft")
+    return state
+
+def _state_from_db(conn, user_id: str, document: str) -> tuple[dict | None, int]:
+    snap = db.load_progress(user_id, document, conn=conn)
+    tail = db.journal_tail(user_id, document, snap["journal_seq"] if snap else 0, conn=conn)
+    if snap is None and not tail:
+        return None, 0
+    state = empty_state()
+    seq = 0
+    if snap is not None:
+        state["mission_progress"] = set(snap["mission_progress"])
+        state["current_mission_index"] = snap["current_mission_index"]
+        state["draft"] = snap["draft"]
+        seq = snap["journal_seq"]
+    for seq, kind, data in tail:
+        apply_record(state, kind, data)
+    return state, seq
+
+
+def remap_state(state: dict, mapping: dict[int, int]) -> dict:
+    """Estado com os índices de missão traduzidos por `mapping`; missões sem destino saem."""
+    draft = state.get("draft")
+    if draft and draft.get("mission") in mapping:
+        draft = {**draft, "mission": mapping[draft["mission"]]}
+    else:
+        draft = None
+    return {
+        "mission_progress": {mapping[i] for i in state["mission_progress"] if i in mapping},
+        "current_mission_index": mapping.get(state.get("current_mission_index")),
+        "draft": draft,
+    }
+
+
+# ========== gravação em segundo plano ==========
+class ProgressJournal:
+    """Fila de registros + thread gravadora (lotes a cada FLUSH_INTERVAL ou BATCH_SIZE)."""
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL, batch_size: int = BATCH_SIZE,
+                 compact_every: int = COMPACT_EVERY):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.compact_every = compact_every
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._io_lock = threading.RLock()
+        self._has_data = threading.Event()
+        self._closed = threading.Event()
+        self._retry: list = []
+        self.written = 0
+        self.compactions = 0
+
+    def append(self, user_id: str, document: str, kind: str, **data) -> None:
+        self._queue.put((user_id, document, kind, data, time.time()))
+        self._has_data.set()
+        self._ensure_writer()
+
+    def _ensure_writer(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="progress-journal", daemon=True)
+                self._thread.start()
+
+    def _drain(self) -> list:
+        # registros de um lote que falhou vêm antes dos que chegaram depois
+        batch, self._retry = self._retry, []
+        try:
+            while True:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _write_pending(self) -> None:
+        # drenar e gravar sob o mesmo lock mantém a ordem dos registros no diário
+        with self._io_lock:
+            self._has_data.clear()
+            batch = self._drain()
+            for i in range(0, len(batch), self.batch_size):
+                chunk = batch[i:i + self.batch_size]
+                try:
+                    db.append_journal(chunk)
+                except Exception:
+                    # não perde os registros: ficam para a próxima tentativa, na ordem
+                    self._retry = batch[i:]
+                    self._has_data.set()
+                    raise
+                self.written += len(chunk)
+            for key in {(u, d) for u, d, *_ in batch}:
+                if db.journal_length(*key) >= self.compact_every:
+                    self.compact(*key)
+
+    def _run(self) -> None:
+        while not self._closed.is_set():
+            self._has_data.wait()
+            if self._closed.is_set():
+                break
+            time.sleep(self.flush_interval)  # junta o que chegar nesse intervalo num lote só
+            try:
+                self._write_pending()
+            except Exception:
+                time.sleep(self.flush_interval)
+
+    def flush(self) -> None:
+        """Grava agora tudo o que está na fila (na thread de quem chama)."""
+        self._write_pending()
+
+    def close(self) -> None:
+        """Para a thread gravadora e grava o que restou (na thread de quem chama)."""
+        self._closed.set()
+        self._has_data.set()  # acorda a thread para ela sair
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    # ----- snapshot -----
+    def compact(self, user_id: str, document: str) -> None:
+        """Dobra o diário no snapshot (numa transação: ninguém grava entre ler e apagar)."""
+        with db.transaction() as conn:
+            state, seq = _state_from_db(conn, user_id, document)
+            if state is not None:
+                db.write_snapshot(conn, user_id, document, state, seq)
+        self.compactions += 1
+
+    def replay(self, user_id: str, document: str) -> dict | None:
+        """Snapshot + cauda do diário -> {mission_progress, current_mission_index, draft}; None se nada salvo."""
+        self.flush()
+        state, _ = _state_from_db(db.connection(), user_id, document)
+        return state
+
+    def stats(self) -> dict:
+        return {"pending": self._queue.qsize() + len(self._retry), "written": self.written, "compactions": self.compactions}
+
+
+_JOURNAL: ProgressJournal | None = None
+_JOURNAL_LOCK = threading.Lock()
+
+
+def get_journal() -> ProgressJournal:
+    """ProgressJournal único do processo."""
+    global _JOURNAL
+    with _JOURNAL_LOCK:
+        if _JOURNAL is None:
+            _JOURNAL = ProgressJournal()
+            atexit.register(_JOURNAL.flush)
+        return _JOURNAL
+
+
+def carry_over_progress(document: str, old_sha: str, new_sha: str) -> int:
+    """
+    O conteúdo de `document` mudou (resolução alterada e reenviada): traduz o progresso
+    salvo de todos os usuários dos índices das missões antigas para os das novas, pela
+    chave estável de cada missão (as antigas na versão com que o bundle velho foi
+    registrado). Artigos alterados ou removidos perdem o progresso; os demais o mantêm.
+    Sem chaves dos dois lados não há como alinhar os índices: o progresso é zerado.
+    Devolve quantos usuários tiveram o progresso reescrito.
+    """
+    old_keys = db.mission_keys(old_sha)
+    new_keys = db.mission_keys(new_sha)
+    if old_keys and new_keys and None not in old_keys:
+        new_index = {k: i for i, k in enumerate(new_keys)}
+        mapping = {i: new_index[k] for i, k in enumerate(old_keys) if k in new_index}
+    else:
+        mapping = None
+    get_journal().flush()
+    moved = 0
+    with db.transaction() as conn:
+        for user_id in db.progress_users(document, conn):
+            state, seq = _state_from_db(conn, user_id, document)
+            if state is not None:
+                state = empty_state() if mapping is None else remap_state(state, mapping)
+                db.write_snapshot(conn, user_id, document, state, seq)
+                moved += 1
+    return moved
@@ -0,0 +1,159 @@
+import os, threading, unicodedata
+from dataclasses import dataclass
+
+from . import db
+from .uploads import adopt_loose_files, list_uploads, objects_dir, upload_dir
+
+# Índice da biblioteca (página de upload) em memória do processo. Só é refeito quando
+# muda o mtime de data/uploads (ou de objects/) ou a versão da biblioteca no banco;
+# fora isso busca, filtro e paginação rodam sobre a lista pronta.
+PAGE_SIZE = 20
+FILTERS = ("todos", "com missões", "sem missões", "com progresso")
+
+
+def fold(text: str) -> str:
+    """Minúsculas sem acentos (busca "resolucao" encontra "Resolução")."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+@dataclass(frozen=True)
+class LibraryEntry:
+    name: str
+    path: str
+    sha256: str
+    size: int
+    aliases: tuple[str, ...]
+    missions: int | None
+    pages: int | None
+    articles: int | None
+    search_key: str
+
+
+@dataclass
+class LibraryPage:
+    entries: list[LibraryEntry]
+    total: int          # itens que passam na busca/filtro
+    page: int
+    pages: int
+    last_studied: dict[str, float]
+
+
+class LibraryIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._token: tuple | None = None
+        self._entries: list[LibraryEntry] = []
+        self.rebuilds = 0
+
+    @staticmethod
+    def _current_token() -> tuple:
+        return (
+            os.stat(upload_dir()).st_mtime_ns,
+            os.stat(objects_dir()).st_mtime_ns,
+            db.library_version(),
+        )
+
+    def entries(self) -> list[LibraryEntry]:
+        token = self._current_token()
+        with self._lock:
+            if token != self._token:
+                adopt_loose_files()  # arquivo solto novo muda o mtime de data/uploads
+                self._entries = self._build()
+                self._token = self._current_token()  # adopt pode ter incrementado a versão
+                self.rebuilds += 1
+            return self._entries
+
+    @staticmethod
+    def _build() -> list[LibraryEntry]:
+        from src.extractor.pdf_extractor import GENERATOR_VERSION
+        stats = db.bundle_stats(GENERATOR_VERSION)
+        documents = db.list_documents()
+        entries = []
+        for c in list_uploads():
+            s = stats.get(c["sha256"], {})
+            missions = s.get("missions")
+            if missions is None and c["name"] in documents:
+                missions = documents[c["name"]]["missions_count"]
+            entries.append(LibraryEntry(
+                name=c["name"],
+                path=c["path"],
+                sha256=c["sha256"],
+                size=c["size"],
+                aliases=tuple(c["aliases"]),
+                missions=missions,
+                pages=s.get("pages"),
+                articles=s.get("articles"),
+                search_key=fold(" ".join([c["name"], *c["aliases"]])),
+            ))
+        return entries
+
+    def query(self, user_id: str, search: str = "", filter: str = "todos",
+              page: int = 0, page_size: int = PAGE_SIZE) -> LibraryPage:
+        """Busca (sem acento, por todos os termos), filtro e uma página de resultados."""
+        entries = self.entries()
+        terms = fold(search).split()
+        if terms:
+            entries = [e for e in entries if all(t in e.search_key for t in terms)]
+        if filter == "com missões":
+            entries = [e for e in entries if e.missions]
+        elif filter == "sem missões":
+            entries = [e for e in entries if not e.missions]
+        elif filter == "com progresso":
+            studied = db.documents_with_progress(user_id)
+            entries = [e for e in entries if e.name in studied]
+        total = len(entries)
+        pages = max(1, -(-total // page_size))
+        page = min(max(page, 0), pages - 1)
+        visible = entries[page * page_size:(page + 1) * page_size]
+        return LibraryPage(
+            entries=visible,
+            total=total,
+            page=page,
+            pages=pages,
+            last_studied=db.last_studied(user_id, [e.name for e in visible]),
+        )
+
+
+_LIBRARY: LibraryIndex | None = None
+_LIBRARY_LOCK = threading.Lock()
+
+
+def get_library() -> LibraryIndex:
+    """LibraryIndex único do processo."""
+    global _LIBRARY
+    with _LIBRARY_LOCK:
+        if _LIBRARY is None:
+            _LIBRARY = LibraryIndex()
+        return _LIBRARY
+
+
+_WARMUP_STARTED = False
+
+
+def start_warmup() -> None:
+    """
+    Uma vez por processo, em segundo plano: carrega no cache de documentos os bundles já
+    compilados da biblioteca (ex.: pelo `python -m src.extractor compile` no deploy),
+    para a primeira abertura de cada documento não ler o bundle do disco, indexa para a
+    busca os que ainda não estão no índice e apaga bundles de versões antigas do gerador.
+    """
+    global _WARMUP_STARTED
+    with _LIBRARY_LOCK:
+        if _WARMUP_STARTED:
+            return
+        _WARMUP_STARTED = True
+
+    def run():
+        from src.extractor.bundle import remove_stale_bundles
+        from src.extractor.doc_cache import document_id, preload_documents
+        from .search import backfill
+        try:
+            remove_stale_bundles()
+            entries = get_library().entries()
+            preload_documents([document_id(e.sha256, e.name) for e in entries if e.missions])
+            backfill(entries)  # bundles compilados antes da busca nos artigos
+        except Exception:
+            pass  # aquecimento é só otimização; o documento ainda abre pelo caminho normal
+
+    threading.Thread(target=run, name="library-warmup", daemon=True).start()
@@ -0,0 +1,180 @@
+import math, re, heapq, threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Iterable
+
+from src.telemetry.trace import traced
+
+from . import db
+from .library import fold
+
+# Índice invertido dos artigos de todos os documentos: termo (minúsculo e sem acento) ->
+# (conteúdo, missão, posições). Gravado no SQLite quando o bundle é salvo e apagado com o
+# PDF, então a busca não abre nenhum documento. Ranking BM25 com bônus quando os termos
+# aparecem em sequência (entre aspas, a sequência é obrigatória). O último termo também
+# casa como prefixo ("quor" acha "quórum") enquanto o aluno digita.
+MIN_PREFIX = 3          # prefixo mais curto expandido no último termo
+BM25_K1 = 1.2
+BM25_B = 0.75
+PHRASE_BONUS = 2.0      # multiplica o escore quando os termos aparecem em sequência
+RERANK_FACTOR = 5       # candidatos (× limite) conferidos quanto à sequência
+
+_WORD = re.compile(r"\w+")
+# palavras que não valem uma entrada no índice (as posições continuam contando com elas)
+STOPWORDS = frozenset(
+    "a ao aos as da das de do dos e em na nas no nos o os ou para pela pelas pelo pelos por "
+    "que se sem sob um uma uns umas com como art".split()
+)
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    document: str       # nome canônico do PDF
+    path: str
+    sha256: str
+    mission: int        # índice da missão no mapa
+    key: str | None
+    title: str
+    score: float
+    phrase: bool        # os termos aparecem em sequência
+
+
+def tokenize(text: str) -> list[str]:
+    """Termos do texto já dobrados, na ordem (a posição de cada um é o índice na lista)."""
+    return _WORD.findall(fold(text))
+
+
+# ========== indexação ==========
+@traced()
+def index_missions(sha256: str, missions: Iterable) -> int:
+    """
+    Indexa (substituindo) os artigos do conteúdo `sha256`, pela posição de cada missão no
+    mapa (não pelo `id` da missão, que começa em 1); devolve quantos termos gravou.
+    """
+    articles, postings = [], []
+    for index, m in enumerate(missions):
+        positions: dict[str, list[str]] = defaultdict(list)
+        terms = tokenize(m.text)
+        for pos, term in enumerate(terms):
+            if term not in STOPWORDS:
+                positions[term].append(str(pos))
+        articles.append((index, m.key, m.title, len(terms)))
+        postings.extend((term, index, len(p), " ".join(p)) for term, p in positions.items())
+    db.save_search_index(sha256, articles, postings)
+    return len(postings)
+
+
+def backfill(entries: Iterable) -> int:
+    """
+    Indexa os documentos da biblioteca compilados antes do índice existir (roda no
+    aquecimento); devolve quantos indexou.
+    """
+    from src.extractor.doc_cache import document_id, load_document
+    indexed = db.indexed_contents()
+    done = 0
+    for e in entries:
+        if not e.missions or e.sha256 in indexed:
+            continue
+        missions = load_document(document_id(e.sha256, e.name))
+        if missions:
+            index_missions(e.sha256, missions)
+            indexed.add(e.sha256)
+            done += 1
+    return done
+
+
+# ========== consulta ==========
+class _Corpus:
+    """
+    Conteúdos pesquisáveis e o tamanho de cada artigo (lista na ordem do mapa), refeito
+    quando a biblioteca muda.
+    """
+
+    def __init__(self, corpus: dict[int, tuple[str, list[int]]]):
+        self.lengths = {doc: lengths for doc, (_, lengths) in corpus.items()}
+        self.articles = sum(len(lengths) for lengths in self.lengths.values())
+        total = sum(sum(lengths) for lengths in self.lengths.values())
+        self.avg_length = total / self.articles if self.articles else 0.0
+
+
+_CORPUS: tuple[int, _Corpus] | None = None  # (library_version, corpus)
+_CORPUS_LOCK = threading.Lock()
+
+
+def _corpus() -> _Corpus:
+    global _CORPUS
+    version = db.library_version()
+    with _CORPUS_LOCK:
+        if _CORPUS is not None and _CORPUS[0] == version:
+            return _CORPUS[1]
+    corpus = _Corpus(db.search_corpus())
+    with _CORPUS_LOCK:
+        _CORPUS = (version, corpus)
+    return corpus
+
+
+def _in_sequence(positions: list[list[int]], gaps: list[int]) -> bool:
+    """Há p na 1ª lista com p + gaps[i] na lista i (termos em sequência, contando as stopwords)."""
+    rest = [set(p) for p in positions[1:]]
+    return any(all(p + gap in s for gap, s in zip(gaps[1:], rest)) for p in positions[0])
+
+
+@traced()
+def search(query: str, limit: int = 20) -> list[SearchHit]:
+    """Artigos com todos os termos de `query`, do mais relevante para o menos."""
+    phrase_only = query.count('"') >= 2
+    words = tokenize(query)
+    terms = [(i, w) for i, w in enumerate(words) if w not in STOPWORDS]
+    if not terms:
+        return []
+    corpus = _corpus()
+    if not corpus.articles:
+        return []
+    last = len(terms) - 1
+    prefix_last = not query.rstrip('"').endswith(" ") and len(terms[last][1]) >= MIN_PREFIX
+
+    # BM25 só com as frequências; as posições (texto) só são convertidas para os candidatos
+    scores: dict[tuple[int, int], float] | None = None
+    positions: list[dict[tuple[int, int], str]] = []
+    avg = corpus.avg_length or 1.0
+    for n, (_, term) in enumerate(terms):
+        found = {
+            (doc, mid): (tf, pos)
+            for doc, mid, tf, pos in db.search_postings(term, prefix=prefix_last and n == last)
+            if doc in corpus.lengths and (scores is None or (doc, mid) in scores)
+        }
+        if not found:
+            return []
+        idf = math.log(1 + (corpus.articles - len(found) + 0.5) / (len(found) + 0.5))
+        step = {}
+        for (doc, mid), (tf, _) in found.items():
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * corpus.lengths[doc][mid] / avg)
+            step[(doc, mid)] = (scores[(doc, mid)] if scores else 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        scores = step
+        positions.append({k: pos for k, (_, pos) in found.items()})
+
+    ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+    if len(terms) == 1:
+        top = [(score, False, k) for k, score in ranked[:limit]]
+    else:
+        # sequência: confere as posições dos mais bem colocados (todos, se for obrigatória)
+        gaps = [i - terms[0][0] for i, _ in terms]  # distância de cada termo ao 1º na consulta
+        window = ranked if phrase_only else ranked[:limit * RERANK_FACTOR]
+        top = []
+        for k, score in window:
+            in_seq = _in_sequence([[int(p) for p in by_article[k].split()] for by_article in positions], gaps)
+            if in_seq or not phrase_only:
+                top.append((score * (PHRASE_BONUS if in_seq else 1.0), in_seq, k))
+            if phrase_only and len(top) >= limit:
+                break
+        top = heapq.nlargest(limit, top, key=lambda t: t[0])
+
+    info = db.search_articles([k for _, _, k in top])
+    from .uploads import _absolute
+    return [
+        SearchHit(
+            document=info[k]["document"], path=_absolute(info[k]["path"]), sha256=info[k]["sha256"],
+            mission=k[1], key=info[k]["key"], title=info[k]["title"], score=round(score, 3), phrase=in_seq,
+        )
+        for score, in_seq, k in top if k in info
+    ]
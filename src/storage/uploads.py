@@ -0,0 +1,115 @@
+import os, hashlib
+from dataclasses import dataclass
+from typing import BinaryIO
+
+from . import db
+
+# Uploads guardados por conteúdo: data/uploads/objects/<sha256>.pdf, gravado uma única vez.
+# O nome enviado vira só um apelido (tabela `uploads`) para o conteúdo; o mesmo PDF com
+# outro nome não é gravado nem compilado de novo.
+UPLOAD_CHUNK = 1 << 20
+DEFAULT_MAX_UPLOAD_MB = 200  # mesmo padrão do server.maxUploadSize do Streamlit
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+@dataclass
+class StoredUpload:
+    name: str           # nome enviado
+    canonical: str      # nome do conteúdo (1º envio): é com ele que o documento é aberto
+    sha256: str
+    path: str
+    size: int
+    created: bool       # False quando o conteúdo já existia
+
+
+def upload_dir() -> str:
+    d = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "uploads")  # .../src/data/uploads
+    os.makedirs(d, exist_ok=True)
+    return d
+
+def objects_dir() -> str:
+    d = os.path.join(upload_dir(), "objects")
+    os.makedirs(d, exist_ok=True)
+    return d
+
+def max_upload_bytes() -> int:
+    env = os.environ.get("UPLOAD_MAX_MB", "")
+    mb = int(env) if env.strip().isdigit() and int(env) > 0 else DEFAULT_MAX_UPLOAD_MB
+    return mb * 1024 * 1024
+
+def store_upload(fileobj: BinaryIO, name: str, max_bytes: int | None = None) -> StoredUpload:
+    """
+    Copia `fileobj` em blocos para um temporário calculando o SHA-256; se o conteúdo já
+    existe o temporário é descartado, senão vira objects/<sha>.pdf (os.replace, atômico).
+    Passou de `max_bytes` => UploadTooLarge (nada fica gravado).
+    """
+    limit = max_upload_bytes() if max_bytes is None else max_bytes
+    h = hashlib.sha256()
+    size = 0
+    tmp = os.path.join(objects_dir(), f".upload-{os.getpid()}-{id(fileobj)}.tmp")
+    try:
+        if hasattr(fileobj, "seek"):
+            fileobj.seek(0)
+        with open(tmp, "wb") as out:
+            for chunk in iter(lambda: fileobj.read(UPLOAD_CHUNK), b""):
+                size += len(chunk)
+                if size > limit:
+                    raise UploadTooLarge(f"{name}: maior que o limite de {limit // (1024 * 1024)} MB")
+                h.update(chunk)
+                out.write(chunk)
+        sha = h.hexdigest()
+        path = os.path.join(objects_dir(), f"{sha}.pdf")
+        created = not os.path.exists(path)
+        if created:
+            os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    canonical, orphans = db.register_upload(name, sha, _relative(path), size)
+    _remove_files(orphans)
+    return StoredUpload(name, canonical, sha, path, size, created)
+
+def adopt_loose_files() -> None:
+    """
+    Registra PDFs soltos em data/uploads (de versões antigas) sem movê-los: o caminho
+    do conteúdo passa a ser o próprio arquivo.
+    """
+    from src.extractor.bundle import file_sha256
+    known = db.upload_names()
+    d = upload_dir()
+    for fname in os.listdir(d):
+        path = os.path.join(d, fname)
+        if fname in known or not fname.lower().endswith(".pdf") or not os.path.isfile(path):
+            continue
+        db.register_upload(fname, file_sha256(path), fname, os.path.getsize(path))
+
+def list_uploads() -> list[dict]:
+    """db.list_contents() com `path` absoluto."""
+    contents = db.list_contents()
+    for c in contents:
+        c["path"] = _absolute(c["path"])
+    return contents
+
+def delete_upload(name: str) -> tuple[str, str] | None:
+    """Remove o conteúdo (e todos os nomes dele); devolve (sha, caminho) do que foi apagado."""
+    removed = db.delete_content(name)
+    if removed is None:
+        return None
+    _remove_files([removed])
+    return removed[0], _absolute(removed[1])
+
+# no banco o caminho é relativo a data/uploads, para o volume poder mudar de lugar
+def _relative(path: str) -> str:
+    return os.path.relpath(path, upload_dir())
+
+def _absolute(path: str) -> str:
+    return os.path.join(upload_dir(), path)
+
+def _remove_files(entries: list[tuple[str, str]]) -> None:
+    for _, rel in entries:
+        path = _absolute(rel)
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,223 @@
+import os, glob, json, time, logging, threading
+from collections import deque
+from contextvars import ContextVar
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+from typing import Any, Callable
+
+# Instrumentação leve: spans aninháveis e contadores. Desligada por padrão; GAME_TRACE=1
+# liga. Desligada, span() devolve um objeto nulo compartilhado e @traced devolve a própria
+# função (decidido na importação), então o custo é uma chamada vazia ou nenhum.
+ENABLED = os.environ.get("GAME_TRACE", "").strip().lower() not in ("", "0", "false", "no")
+MAX_BYTES = int(float(os.environ.get("GAME_TRACE_MAX_MB", "5")) * 1024 * 1024)
+BACKUPS = int(os.environ.get("GAME_TRACE_BACKUPS", "3"))
+RECENT_MAX = 20000  # registros mantidos em memória para a página de admin
+MAX_AGE = 7 * 24 * 3600  # s: arquivos de processos que não gravam há mais que isso são apagados
+
+# span atual (para aninhar) e atributos de contexto (documento, página) da execução
+_current: ContextVar["Span | None"] = ContextVar("trace_span", default=None)
+_context: ContextVar[dict] = ContextVar("trace_context", default={})
+
+_recent: deque = deque(maxlen=RECENT_MAX)
+_logger: logging.Logger | None = None
+_logger_pid: int | None = None  # processo dono do handler (filho criado por fork abre o seu)
+_logger_lock = threading.Lock()
+
+
+def trace_dir() -> str:
+    d = os.environ.get("GAME_TRACE_DIR", "").strip() or os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), "data", "telemetry"  # .../src/data/telemetry
+    )
+    os.makedirs(d, exist_ok=True)
+    return d
+
+# Um arquivo por processo (trace-<pid>.jsonl): a rotação do RotatingFileHandler não é
+# segura com vários processos no mesmo arquivo. A leitura junta todos.
+def trace_path() -> str:
+    """JSONL deste processo."""
+    return os.path.join(trace_dir(), f"trace-{os.getpid()}.jsonl")
+
+def trace_files() -> list[str]:
+    """JSONL de todos os processos, com os rotacionados (e o trace.jsonl antigo, se houver)."""
+    d = trace_dir()
+    return glob.glob(os.path.join(d, "trace-*.jsonl*")) + glob.glob(os.path.join(d, "trace.jsonl*"))
+
+def _remove_old_files(now: float) -> None:
+    for p in trace_files():
+        try:
+            if now - os.path.getmtime(p) > MAX_AGE:
+                os.remove(p)
+        except OSError:
+            pass  # outro processo apagou antes
+
+def _get_logger() -> logging.Logger:
+    global _logger, _logger_pid
+    with _logger_lock:
+        if _logger is None or _logger_pid != os.getpid():
+            logger = logging.getLogger("src.telemetry.trace")
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            for old in list(logger.handlers):  # herdado do processo pai
+                logger.removeHandler(old)
+            _remove_old_files(time.time())
+            handler = RotatingFileHandler(trace_path(), maxBytes=MAX_BYTES, backupCount=BACKUPS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            _logger, _logger_pid = logger, os.getpid()
+        return _logger
+
+def _emit(record: dict) -> None:
+    _recent.append(record)
+    try:
+        _get_logger().info(json.dumps(record, ensure_ascii=False, default=str))
+    except Exception:
+        pass  # telemetria nunca derruba o app
+
+
+# ========== contexto ==========
+def set_context(**attrs: Any) -> None:
+    """Atributos anexados a todo registro desta execução (ex.: doc, page)."""
+    if ENABLED:
+        _context.set({**_context.get(), **attrs})
+
+
+# ========== spans ==========
+class Span:
+    __slots__ = ("name", "attrs", "parent", "start", "_token")
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+        self.parent: Span | None = None
+        self.start = 0.0
+        self._token = None
+
+    def __enter__(self) -> "Span":
+        self.parent = _current.get()
+        self._token = _current.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        ms = (time.perf_counter() - self.start) * 1000
+        _current.reset(self._token)
+        record = {
+            "ts": time.time(),
+            "type": "span",
+            "name": self.name,
+            "parent": self.parent.name if self.parent else None,
+            "ms": round(ms, 3),
+            "pid": os.getpid(),
+            **_context.get(),
+            **self.attrs,
+        }
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        _emit(record)
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, **attrs: Any) -> Span | _NullSpan:
+    """with span("render.map", doc=...): cronometra o bloco (aninhado no span atual)."""
+    if not ENABLED:
+        return _NULL_SPAN
+    return Span(name, attrs)
+
+
+def traced(name: str | None = None) -> Callable[[Callable], Callable]:
+    """Decorador: cada chamada vira um span. Desligado, devolve a função sem embrulho."""
+    def decorate(fn: Callable) -> Callable:
+        if not ENABLED:
+            return fn
+        span_name = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with Span(span_name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# ========== contadores ==========
+def count(name: str, n: int = 1, **attrs: Any) -> None:
+    if not ENABLED:
+        return
+    _emit({"ts": time.time(), "type": "count", "name": name, "n": n, "pid": os.getpid(), **_context.get(), **attrs})
+
+
+# ========== leitura (página de admin) ==========
+def recent_records() -> list[dict]:
+    """Registros deste processo ainda em memória."""
+    return list(_recent)
+
+def load_records(limit: int = RECENT_MAX) -> list[dict]:
+    """Últimos `limit` registros dos JSONL de todos os processos (com os rotacionados), por horário."""
+    records = []
+    for p in trace_files():
+        lines: deque = deque(maxlen=limit)
+        try:
+            with open(p, "r", encoding="utf-8") as f:
+                lines.extend(f)
+        except OSError:
+            continue  # rotacionado ou apagado enquanto lia
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    records.sort(key=lambda r: r.get("ts", 0))
+    return records[-limit:]
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+def summarize(records: list[dict], by: tuple[str, ...] = ("name",)) -> list[dict]:
+    """Spans agrupados por `by` (ex.: ("name",) ou ("doc", "name")) com n, p50, p95 e máximo em ms."""
+    groups: dict[tuple, list[float]] = {}
+    for r in records:
+        if r.get("type") != "span":
+            continue
+        groups.setdefault(tuple(r.get(k) for k in by), []).append(r["ms"])
+    rows = []
+    for key, values in groups.items():
+        values.sort()
+        rows.append({
+            **dict(zip(by, key)),
+            "n": len(values),
+            "p50_ms": round(_percentile(values, 0.50), 2),
+            "p95_ms": round(_percentile(values, 0.95), 2),
+            "max_ms": round(values[-1], 2),
+        })
+    rows.sort(key=lambda r: r["p95_ms"], reverse=True)
+    return rows
+
+def count_totals(records: list[dict]) -> dict[str, int]:
+    totals: dict[str, int] = {}
+    for r in records:
+        if r.get("type") == "count":
+            totals[r["name"]] = totals.get(r["name"], 0) + r.get("n", 1)
+    return dict(sorted(totals.items()))
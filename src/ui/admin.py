@@ -0,0 +1,42 @@
+import streamlit as st
+
+from .event_handlers import queue_event, rerun_stats
+
+def render_admin_page():
+    """Telemetria (GAME_TRACE=1): p50/p95 por fase e por documento, contadores e caches."""
+    from src.telemetry.trace import count_totals, load_records, recent_records, summarize, trace_dir
+
+    st.title("📈 Telemetria")
+    st.button("Voltar para Upload", key="btn_back_upload_admin",
+              on_click=queue_event, args=("navigate",), kwargs={"page": "upload"})
+
+    source = st.radio("Fonte", ["Este processo", "Arquivo JSONL (todos os workers)"], horizontal=True,
+                      key="admin_source")
+    records = recent_records() if source == "Este processo" else load_records()
+    st.caption(f"{len(records)} registros · {trace_dir()}")
+    if not records:
+        st.info("Nenhum registro ainda.")
+        return
+
+    st.subheader("Por fase")
+    st.dataframe(summarize(records, by=("name",)), use_container_width=True, hide_index=True)
+
+    st.subheader("Por documento")
+    docs = [r for r in records if r.get("doc")]
+    if docs:
+        st.dataframe(summarize(docs, by=("doc", "name")), use_container_width=True, hide_index=True)
+    else:
+        st.caption("Nenhum registro com documento.")
+
+    st.subheader("Contadores")
+    st.dataframe([{"contador": k, "total": v} for k, v in count_totals(records).items()],
+                 use_container_width=True, hide_index=True)
+
+    from src.extractor.doc_cache import get_document_cache
+    from src.storage.journal import get_journal
+    st.subheader("Estado do processo")
+    st.json({
+        "sessão (reruns)": rerun_stats(),
+        "cache de documentos": get_document_cache().stats(),
+        "diário de progresso": get_journal().stats(),
+    })
@@ -1,8 +1,8 @@
-import os, json, time, re
 import streamlit as st
 st.set_page_config(page_title="Controlador de estudos - Jogo", page_icon="🎯", layout="wide")
-from .init_state import ensure_state_initialized
-from .components import render_fill_blanks, render_pdf_uploader, render_mission_map
+from .init_state import ensure_state_initialized, current_level, current_engine
+from .components import render_fill_blanks, render_pdf_uploader, render_mission_map, _journal, _user_id
+from .event_handlers import queue_event, rerun
 
 # Modelo simples de nível (quando vier de uma missão)
 class SimpleLevel:
@@ -11,27 +11,54 @@ class SimpleLevel:
         self.keywords = keywords
         self.options = options
 
-def _current_level_from_mission() -> SimpleLevel:
-    missions = st.session_state.get("missions") or []
-    idx = st.session_state.get("current_mission_index")
-    if not missions or idx is None or idx < 0 or idx >= len(missions):
+def _current_level_from_mission():
+    level = current_level()
+    if level is None:
         # fallback simples
         return SimpleLevel(["Texto de exemplo com "], ["lacunas"], ["lacunas", "exemplo"])
-    m = missions[idx]
-    data = m.get("data", {})
-    text_segments = data.get("text_segments") or []
-    keywords = data.get("keywords") or []
-    options = data.get("options") or keywords[:]  # fallback
-    return SimpleLevel(text_segments, keywords, options)
+    return level
 
-def _finish_mission_and_back_to_map():
+def _complete_current_mission():
     if "mission_progress" not in st.session_state:
         st.session_state.mission_progress = set()
     idx = st.session_state.get("current_mission_index")
     if idx is not None:
         st.session_state.mission_progress.add(idx)
+        _journal("complete", mission=idx)
+        _schedule_review(idx)
+    st.session_state.map_window_row = None  # o mapa volta a seguir a próxima jogável
     st.session_state.page = "map"
-    st.rerun()
+
+def _schedule_review(idx: int) -> None:
+    """Dá a nota da tentativa e agenda a próxima revisão da missão (src.game.scheduler)."""
+    engine, level = current_engine(), current_level()
+    document = st.session_state.get("document_title")
+    if engine is None or level is None or not document:
+        return
+    from src.game.scheduler import get_scheduler
+    get_scheduler().review(_user_id(), document, engine.key_of(idx),
+                           blanks=len(level.keywords), correct=st.session_state.correct_positions)
+
+def _leave_current_mission():
+    """
+    "Voltar (salvar)": com todas as lacunas preenchidas conclui a missão (e agenda a
+    revisão); pela metade, só salva o rascunho e volta ao mapa, sem nota nem conclusão.
+    """
+    level = current_level()
+    blanks = len(level.keywords) if level is not None else 0
+    selected = st.session_state.get("selected_words", {})
+    if blanks and all(i in selected for i in range(blanks)):
+        _complete_current_mission()
+        return
+    from .components import _quick_save_status
+    _quick_save_status()
+    st.session_state.map_window_row = None
+    st.session_state.page = "map"
+
+def _finish_mission_and_back_to_map():
+    # chamado no meio do desenho da página de jogo: precisa de um rerun para ir ao mapa
+    _complete_current_mission()
+    rerun()
 
 def render_upload_page():
     ensure_state_initialized()
@@ -42,9 +69,8 @@ def render_map_page():
     ensure_state_initialized()
     st.title("Mapa de Missões")
     # Um único botão de voltar (key única)
-    if st.button("Voltar para Upload", key="btn_back_upload_top"):
-        st.session_state.page = "upload"
-        st.rerun()
+    st.button("Voltar para Upload", key="btn_back_upload_top",
+              on_click=queue_event, args=("navigate",), kwargs={"page": "upload"})
     # Esconde o botão interno do componente
     render_mission_map(show_back_button=False)
 
@@ -53,22 +79,19 @@ def render_main_page():
     level = _current_level_from_mission()
 
     # Ações superiores
-    a1, a2, a3 = st.columns(3)
+    a1, a2, a3, a4 = st.columns(4)
     with a1:
-        if st.button("Voltar (salvar)", key="btn_back_save"):
-            _finish_mission_and_back_to_map()
+        st.button("Voltar (salvar)", key="btn_back_save",
+                  on_click=queue_event, args=("leave_mission",))
     with a2:
-        if st.button("Reiniciar Missão", key="btn_reset_mission"):
-            st.session_state.selected_words.clear()
-            st.session_state.correct_positions.clear()
-            st.session_state.active_blank_index = 0
-            st.session_state.correct_answers = 0
-            st.session_state.total_questions = 0
-            st.rerun()
+        st.button("Reiniciar Missão", key="btn_reset_mission",
+                  on_click=queue_event, args=("reset_mission",))
     with a3:
-        if st.button("Upload", key="btn_go_upload_from_play"):
-            st.session_state.page = "upload"
-            st.rerun()
+        st.button("⏭️ Próxima", key="btn_next_mission_play",
+                  on_click=queue_event, args=("next_mission",), kwargs={"skip_current": True})
+    with a4:
+        st.button("Upload", key="btn_go_upload_from_play",
+                  on_click=queue_event, args=("navigate",), kwargs={"page": "upload"})
 
     # Layout 2 colunas
     left, right = st.columns([2, 1])
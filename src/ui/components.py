@@ -1,92 +1,199 @@
-import os, json, hashlib
+import os, time
 from typing import Any, Optional
 import streamlit as st
 import math
 
-from .init_state import ensure_state_initialized, first_unfilled_blank
+from .init_state import ensure_state_initialized, first_unfilled_blank, current_missions, current_engine
+from .event_handlers import queue_event, refresh
 
 # ========== util e persistência ==========
 def _base_dir() -> str:
     return os.path.dirname(os.path.dirname(__file__))  # .../src
 
-def _upload_dir() -> str:
-    d = os.path.join(_base_dir(), "data", "uploads")
-    os.makedirs(d, exist_ok=True)
-    return d
+# índice de documentos e progresso ficam no SQLite compartilhado (src.storage.db)
+def _user_id() -> str:
+    from src.storage.db import DEFAULT_USER
+    return st.session_state.get("user_id") or DEFAULT_USER
 
-def _save_dir() -> str:
-    d = os.path.join(_base_dir(), "data", "saves")
-    os.makedirs(d, exist_ok=True)
-    return d
+def _journal(kind: str, **data) -> None:
+    """Registra o evento no diário de progresso do usuário (gravado em segundo plano)."""
+    document = st.session_state.get("document_title")
+    if not document:
+        return
+    from src.storage.journal import get_journal
+    get_journal().append(_user_id(), document, kind, **data)
 
-def _index_path() -> str:
-    return os.path.join(_save_dir(), "index.json")
+def _mission_variant(idx: int | None) -> str | None:
+    """Versão do gerador + semente da missão: identifica as lacunas que o rascunho preencheu."""
+    missions = current_missions()
+    if idx is None or not 0 <= idx < len(missions):
+        return None
+    from src.extractor.pdf_extractor import GENERATOR_VERSION
+    return f"{GENERATOR_VERSION}:{getattr(missions[idx], 'seed', None)}"
 
-def _load_index() -> dict:
-    p = _index_path()
-    if os.path.exists(p):
-        try:
-            with open(p, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return {}
-    return {}
+def _seed_for(pdf_name: str, article_key: int | str) -> int:
+    from src.extractor.bundle import seed_for
+    return seed_for(pdf_name, article_key)
 
-def _save_index(idx: dict) -> None:
-    with open(_index_path(), "w", encoding="utf-8") as f:
-        json.dump(idx, f, ensure_ascii=False, indent=2)
+def _generate_missions_for_pdf(pdf_path: str, pdf_name: str) -> list[dict]:
+    """Missões do PDF via bundle em data/bundles (recompila só se o conteúdo/versão mudar)."""
+    from src.extractor.bundle import load_or_build_missions
+    return load_or_build_missions(pdf_path, pdf_name)
+
+def _record_in_index(fname: str, pdf_path: str, missions_count: int) -> bool:
+    """Registra o documento; True se era uma nova versão e o progresso salvo foi migrado."""
+    from src.extractor.bundle import file_sha256
+    from src.storage.db import upsert_document
+    sha = file_sha256(pdf_path) if os.path.exists(pdf_path) else None
+    previous = upsert_document(fname, pdf_path, missions_count, sha256=sha)
+    if sha and previous and previous != sha:
+        # nova versão do PDF: o progresso salvo acompanha os artigos que não mudaram
+        from src.extractor.bundle import collect_content
+        from src.storage.journal import carry_over_progress
+        moved = carry_over_progress(fname, previous, sha) > 0
+        collect_content(previous)  # versão antiga: já serviu às páginas reaproveitadas e à migração
+        return moved
+    return False
+
+def _open_document(pdf_path: str, fname: str, first_wait: float = 1.0) -> None:
+    """
+    Coloca as missões do PDF na sessão.
+    A sessão guarda só o doc_id; as missões vêm do DocumentCache (ou do bundle em disco).
+    Se ainda não houver bundle, entra na fila de compilação compartilhada
+    (src.extractor.jobs) e a sessão lê a lista do job enquanto ela é preenchida
+    (aguarda até `first_wait`s pela 1ª missão).
+    """
+    from src.extractor.bundle import file_sha256
+    from src.extractor.doc_cache import document_id, load_document
+    from src.extractor.jobs import get_job_manager
+    from .init_state import set_missions_in_state
+
+    doc_id = document_id(file_sha256(pdf_path), fname)
+    set_missions_in_state(doc_id, title=fname, pdf_path=pdf_path)
+    if load_document(doc_id) is not None:
+        st.session_state.generation = None
+        return
 
-def _slugify(name: str) -> str:
-    return "".join(ch.lower() if ch.isalnum() else "-" for ch in (name or "")).strip("-")
+    job = get_job_manager().submit(pdf_path, fname)
+    st.session_state.generation = job
 
-def _seed_for(pdf_name: str, article_id: int) -> int:
-    h = hashlib.sha256(f"{pdf_name}:{article_id}".encode("utf-8")).hexdigest()
-    return int(h[:16], 16)
+    deadline = time.monotonic() + first_wait
+    while not job.missions and not job.done and time.monotonic() < deadline:
+        time.sleep(0.05)
 
-def _generate_missions_for_pdf(pdf_path: str, pdf_name: str) -> list[dict]:
-    from src.extractor.pdf_extractor import (
-        extract_pdf_text, split_into_articles, generate_fill_blanks_from_article
+def _open_document_action(pdf_path: str, fname: str, record: bool = False, load_status: bool = False) -> None:
+    """Ação dos botões da listagem: abre o documento (e o status salvo do usuário) e vai para o mapa."""
+    from src.storage.journal import get_journal
+    payload = None
+    if load_status:
+        try:
+            payload = get_journal().replay(_user_id(), fname)
+        except Exception as e:
+            st.error(f"Falha ao carregar status: {e}")
+            return
+    with st.spinner("Gerando missões..."):
+        _open_document(pdf_path, fname)
+        if record and not st.session_state.generation:
+            if _record_in_index(fname, pdf_path, len(current_missions())) and payload is None:
+                payload = get_journal().replay(_user_id(), fname)
+    st.session_state.page = "map"
+    _apply_saved_progress(payload)
+
+def _apply_saved_progress(payload: dict | None) -> None:
+    if payload is not None:
+        st.session_state.mission_progress = set(payload.get("mission_progress", []))
+        st.session_state.current_mission_index = payload.get("current_mission_index")
+        _restore_draft(payload.get("draft"))
+
+def _restore_draft(draft: dict | None) -> None:
+    """Volta para a missão que estava pela metade, com as lacunas já preenchidas."""
+    idx = st.session_state.current_mission_index
+    if not draft or not draft.get("selected") or draft.get("mission") != idx:
+        return
+    missions = current_missions()
+    if idx is None or idx >= len(missions):
+        return
+    if draft.get("variant") != _mission_variant(idx):
+        return  # lacunas sorteadas de outro jeito (gerador ou semente mudou): o rascunho não vale
+    st.session_state.selected_words = {int(i): w for i, w in draft["selected"].items()}
+    st.session_state.correct_positions = set(draft.get("correct", []))
+    st.session_state.correct_answers = len(st.session_state.correct_positions)
+    st.session_state.total_questions = 0
+    nxt = first_unfilled_blank(len(missions[idx].get("data", {}).get("keywords", [])))
+    st.session_state.active_blank_index = max(nxt, 0)
+    st.session_state.page = "play"
+
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment")
+
+@_fragment(run_every=1.0)
+def _render_generation_progress() -> None:
+    """Acompanha o job da sessão; reroda o app quando chegam novas missões."""
+    job = st.session_state.get("generation")
+    if not job:
+        return
+    missions = job.missions
+    if job.done:
+        st.session_state.generation = None
+        if job.error:
+            st.error(f"Falha ao gerar missões: {job.error}")
+            return
+        if _record_in_index(job.pdf_name, job.pdf_path, len(missions)) \
+                and st.session_state.get("document_title") == job.pdf_name:
+            from src.storage.journal import get_journal
+            _apply_saved_progress(get_journal().replay(_user_id(), job.pdf_name))
+        refresh()
+    p = job.progress()
+    st.caption(
+        f"⏳ Gerando missões... {p['missions']} prontas "
+        f"({p['pages']} páginas lidas, {p['articles']} artigos)"
     )
-    text = extract_pdf_text(pdf_path)
-    articles = split_into_articles(text)
-    missions: list[dict] = []
-    order = 1
-    for art in articles:
-        seed = _seed_for(pdf_name, art["id"])
-        data = generate_fill_blanks_from_article(art["text"], seed=seed)
-        if not data["keywords"]:
-            continue
-        missions.append({
-            "id": order,
-            "title": art["title"],
-            "data": data,
-            "completed": False,
-        })
-        order += 1
-    return missions
+    if st.session_state.get("generation_shown") != len(missions):
+        st.session_state.generation_shown = len(missions)
+        refresh()
+
+@_fragment(run_every=2.0)
+def _render_active_jobs() -> None:
+    """Compilações em andamento no servidor (de qualquer sessão)."""
+    from src.extractor.jobs import get_job_manager
+    jobs = get_job_manager().active()
+    if not jobs:
+        return
+    st.caption("⚙️ Compilando agora:")
+    for job in jobs:
+        p = job.progress()
+        st.caption(
+            f"• {p['name']}: {p['pages']} páginas, {p['articles']} artigos, "
+            f"{p['missions']} missões ({p['waiters']} sessão(ões) aguardando)"
+        )
 
 def _delete_pdf(fname: str) -> None:
-    """Remove o PDF, o índice e o status salvo correspondente."""
+    """Remove o PDF (conteúdo e todos os nomes dele), o índice e o status salvo correspondente."""
     try:
-        pdf_path = os.path.join(_upload_dir(), fname)
-        if os.path.exists(pdf_path):
-            os.remove(pdf_path)
-
-        # remover do índice
-        idx = _load_index()
-        if fname in idx:
-            idx.pop(fname, None)
-            _save_index(idx)
-
-        # remover status salvo (se houver)
-        slug = _slugify(fname)
-        status_path = os.path.join(_save_dir(), f"study_status_{slug}.json")
-        if os.path.exists(status_path):
-            os.remove(status_path)
+        from src.storage.uploads import delete_upload
+        pdf_path = None
+        removed = delete_upload(fname)
+        if removed is not None:
+            from src.extractor.doc_cache import document_id, get_document_cache
+            from src.game.engine import discard_engine
+            sha, pdf_path = removed
+            get_document_cache().discard(document_id(sha, fname))
+            discard_engine(document_id(sha, fname))
+
+        # remover do índice e o progresso salvo (de todos os usuários)
+        from src.storage.db import delete_document, list_documents
+        from src.game.scheduler import get_scheduler
+        sha = removed[0] if removed is not None else list_documents().get(fname, {}).get("sha256")
+        delete_document(fname)
+        get_scheduler().forget(fname)
+        if sha:
+            # bundles (todas as versões), texto das páginas e índice de busca, se ninguém mais usa
+            from src.extractor.bundle import collect_content
+            collect_content(sha)
 
         # se o PDF deletado estava ativo na sessão, limpar missões
-        if st.session_state.get("pdf_path") == pdf_path:
-            st.session_state.missions = []
+        if pdf_path and st.session_state.get("pdf_path") == pdf_path:
+            st.session_state.doc_id = None
+            st.session_state.generation = None
             st.session_state.document_title = None
             st.session_state.current_mission_index = None
             st.session_state.mission_progress = set()
@@ -117,175 +224,244 @@ def render_pdf_uploader():
     # Uploader com rótulo solicitado
     uploaded = st.file_uploader("📥 Import (PDF)", type=["pdf"])
     if uploaded:
-        save_path = os.path.join(_upload_dir(), uploaded.name)
-        with open(save_path, "wb") as f:
-            f.write(uploaded.getbuffer())
-        if st.button("🚀 Gerar missões a partir deste PDF", key="gen_from_uploader"):
-            with st.spinner("Gerando missões..."):
-                missions = _generate_missions_for_pdf(save_path, uploaded.name)
-                from .init_state import set_missions_in_state
-                set_missions_in_state(missions, title=uploaded.name, pdf_path=save_path)
-                idx = _load_index()
-                idx[uploaded.name] = {
-                    "pdf_path": save_path,
-                    "document_title": uploaded.name,
-                    "missions_count": len(missions),
-                }
-                _save_index(idx)
-            st.success(f"{len(missions)} missões criadas. 🗺️")
-            st.session_state.page = "map"
-            st.rerun()
+        stored = _store_uploaded(uploaded)
+        if stored is not None:
+            if stored.canonical != uploaded.name:
+                st.info(f"Este PDF já foi enviado como “{stored.canonical}”: as missões de lá serão reaproveitadas.")
+            st.button("🚀 Gerar missões a partir deste PDF", key="gen_from_uploader",
+                      on_click=queue_event, args=("open_document",),
+                      kwargs={"pdf_path": stored.path, "fname": stored.canonical, "record": True})
+
+    from src.telemetry.trace import ENABLED as TRACE_ENABLED
+    if TRACE_ENABLED:
+        st.button("📈 Telemetria", key="btn_admin",
+                  on_click=queue_event, args=("navigate",), kwargs={"page": "admin"})
+
+    _render_article_search()
 
     st.subheader("📚 PDFs carregados")
-    files = sorted([f for f in os.listdir(_upload_dir()) if f.lower().endswith(".pdf")])
-    idx = _load_index()
+    from src.extractor.jobs import get_job_manager
+    if get_job_manager().active():
+        _render_active_jobs()
+    _render_library()
+
+# resultados mostrados da busca nos artigos
+SEARCH_LIMIT = 10
+
+def _render_article_search() -> None:
+    """Busca nos artigos de todos os PDFs (src.storage.search); cada resultado abre a missão."""
+    query = st.text_input("🔎 Buscar nos artigos", key="article_search",
+                          placeholder='ex.: quórum, "prazo recursal"')
+    if not query.strip():
+        return
+    from src.storage.search import search
+    t0 = time.perf_counter()
+    hits = search(query, limit=SEARCH_LIMIT)
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    if not hits:
+        st.caption(f"Nenhum artigo encontrado ({elapsed_ms:.0f} ms).")
+        return
+    st.caption(f"{len(hits)} artigo(s) mais relevantes ({elapsed_ms:.0f} ms)")
+    for i, hit in enumerate(hits):
+        label = f"{hit.title} — {hit.document} (missão {hit.mission + 1})"
+        st.button(label, key=f"search_hit_{i}", use_container_width=True,
+                  on_click=queue_event, args=("open_search_hit",),
+                  kwargs={"pdf_path": hit.path, "fname": hit.document, "mission": hit.mission, "key": hit.key})
+
+def _format_when(ts: float | None) -> str:
+    return time.strftime("%d/%m/%Y %H:%M", time.localtime(ts)) if ts else "nunca"
 
-    if not files:
-        st.info("Nenhum PDF enviado ainda. Use o campo acima para importar um arquivo. 🙂")
+def _render_library() -> None:
+    """Biblioteca paginada: busca/filtro no índice em memória e widgets só das linhas visíveis."""
+    from src.storage.library import FILTERS, PAGE_SIZE, get_library
+
+    c1, c2 = st.columns([3, 1])
+    with c1:
+        search = st.text_input("🔎 Buscar", key="library_search", placeholder="nome do PDF",
+                               on_change=queue_event, args=("library_page",), kwargs={"page": 0})
+    with c2:
+        filter_ = st.selectbox("Filtro", FILTERS, key="library_filter",
+                               on_change=queue_event, args=("library_page",), kwargs={"page": 0})
+    page = get_library().query(_user_id(), search, filter_, st.session_state.get("library_page", 0))
+
+    if not page.total:
+        if search or filter_ != FILTERS[0]:
+            st.info("Nenhum PDF encontrado com esse filtro.")
+        else:
+            st.info("Nenhum PDF enviado ainda. Use o campo acima para importar um arquivo. 🙂")
         return
 
     # Diálogo simples de confirmação de exclusão (controlado por session_state)
     to_confirm = st.session_state.get("confirm_delete_name")
 
-    for i, fname in enumerate(files):
-        pdf_path = os.path.join(_upload_dir(), fname)
-        meta = idx.get(fname)
+    for i, entry in enumerate(page.entries, start=page.page * PAGE_SIZE):
+        fname, pdf_path = entry.name, entry.path
+        studied = page.last_studied.get(fname)
 
         cols = st.columns([4, 2, 2, 2, 1])  # + coluna para Excluir
         with cols[0]:
             st.write(f"• {fname}")
-            if meta:
-                st.caption(f"Missões: {meta.get('missions_count', 0)}")
+            if entry.aliases:
+                st.caption("Também enviado como: " + ", ".join(entry.aliases))
+            details = []
+            if entry.missions is not None:
+                details.append(f"Missões: {entry.missions}")
+            if entry.pages is not None:
+                details.append(f"Páginas: {entry.pages}")
+            if entry.articles is not None:
+                details.append(f"Artigos: {entry.articles}")
+            details.append(f"Último estudo: {_format_when(studied)}")
+            st.caption(" · ".join(details))
 
         with cols[1]:
-            if st.button("♻️ Gerar/Atualizar", key=f"gen_{i}"):
-                with st.spinner("Gerando missões..."):
-                    missions = _generate_missions_for_pdf(pdf_path, fname)
-                    from .init_state import set_missions_in_state
-                    set_missions_in_state(missions, title=fname, pdf_path=pdf_path)
-                    idx[fname] = {
-                        "pdf_path": pdf_path,
-                        "document_title": fname,
-                        "missions_count": len(missions),
-                    }
-                    _save_index(idx)
-                st.session_state.page = "map"
-                st.rerun()
+            st.button("♻️ Gerar/Atualizar", key=f"gen_{i}",
+                      on_click=queue_event, args=("open_document",),
+                      kwargs={"pdf_path": pdf_path, "fname": fname, "record": True})
 
         with cols[2]:
-            if st.button("🗺️ Abrir mapa", key=f"open_{i}"):
-                missions = _generate_missions_for_pdf(pdf_path, fname)
-                from .init_state import set_missions_in_state
-                set_missions_in_state(missions, title=fname, pdf_path=pdf_path)
-                st.session_state.page = "map"
-                st.rerun()
+            st.button("🗺️ Abrir mapa", key=f"open_{i}",
+                      on_click=queue_event, args=("open_document",),
+                      kwargs={"pdf_path": pdf_path, "fname": fname})
 
         with cols[3]:
-            slug = _slugify(fname)
-            status_path = os.path.join(_save_dir(), f"study_status_{slug}.json")
-            if os.path.exists(status_path):
-                if st.button("📂 Carregar status", key=f"load_{i}"):
-                    try:
-                        with open(status_path, "r", encoding="utf-8") as f:
-                            payload = json.load(f)
-                        missions = _generate_missions_for_pdf(pdf_path, fname)
-                        from .init_state import set_missions_in_state
-                        set_missions_in_state(missions, title=fname, pdf_path=pdf_path)
-                        st.session_state.mission_progress = set(payload.get("mission_progress", []))
-                        st.session_state.current_mission_index = payload.get("current_mission_index")
-                        st.session_state.page = "map"
-                        st.rerun()
-                    except Exception as e:
-                        st.error(f"Falha ao carregar status: {e}")
+            if studied is not None:
+                st.button("📂 Carregar status", key=f"load_{i}",
+                          on_click=queue_event, args=("open_document",),
+                          kwargs={"pdf_path": pdf_path, "fname": fname, "load_status": True})
             else:
                 st.write("")
 
         with cols[4]:
-            if st.button("🗑️ Excluir", key=f"del_{i}"):
-                st.session_state.confirm_delete_name = fname
-                st.session_state.confirm_delete_row = i
-                st.rerun()
+            st.button("🗑️ Excluir", key=f"del_{i}",
+                      on_click=queue_event, args=("confirm_delete",), kwargs={"fname": fname, "row": i})
 
         # Bloco de confirmação inline
         if to_confirm == fname:
             c1, c2 = st.columns([1, 1])
             with c1:
-                if st.button("✅ Confirmar exclusão", key=f"confirm_del_{i}"):
-                    _delete_pdf(fname)
-                    st.session_state.pop("confirm_delete_name", None)
-                    st.session_state.pop("confirm_delete_row", None)
-                    st.rerun()
+                st.button("✅ Confirmar exclusão", key=f"confirm_del_{i}",
+                          on_click=queue_event, args=("delete_pdf",), kwargs={"fname": fname})
             with c2:
-                if st.button("❌ Cancelar", key=f"cancel_del_{i}"):
-                    st.session_state.pop("confirm_delete_name", None)
-                    st.session_state.pop("confirm_delete_row", None)
-                    st.experimental_rerun()
+                st.button("❌ Cancelar", key=f"cancel_del_{i}",
+                          on_click=queue_event, args=("cancel_delete",))
+
+    if page.pages > 1:
+        prev_col, info_col, next_col = st.columns([1, 2, 1])
+        with prev_col:
+            st.button("◀ Anterior", key="library_prev", disabled=page.page == 0,
+                      on_click=queue_event, args=("library_page",), kwargs={"page": page.page - 1})
+        with info_col:
+            st.caption(f"Página {page.page + 1} de {page.pages} · {page.total} PDFs")
+        with next_col:
+            st.button("Próxima ▶", key="library_next", disabled=page.page >= page.pages - 1,
+                      on_click=queue_event, args=("library_page",), kwargs={"page": page.page + 1})
+
+def _store_uploaded(uploaded) -> Any:
+    """
+    Grava o arquivo do st.file_uploader uma única vez por envio (file_id): nos reruns
+    seguintes reaproveita o resultado em vez de regravar o PDF inteiro.
+    """
+    from src.storage.uploads import UploadTooLarge, store_upload
+    stored_uploads = st.session_state.setdefault("stored_uploads", {})
+    key = getattr(uploaded, "file_id", None) or (uploaded.name, uploaded.size)
+    stored = stored_uploads.get(key)
+    if stored is None or not os.path.exists(stored.path):
+        try:
+            stored = store_upload(uploaded, uploaded.name)
+        except UploadTooLarge as e:
+            st.error(f"Arquivo grande demais: {e}")
+            return None
+        stored_uploads[key] = stored
+    return stored
 
 def _quick_save_status() -> str:
-    """Salva progresso atual em JSON (por documento)."""
-    slug = _slugify(st.session_state.get("document_title") or "doc")
-    path = os.path.join(_save_dir(), f"study_status_{slug}.json")
-    payload = {
-        "mission_progress": sorted(list(st.session_state.get("mission_progress", set()))),
-        "current_mission_index": st.session_state.get("current_mission_index"),
-    }
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
-    return path
+    """
+    Salva o estado da sessão como está (substitui o progresso salvo do documento) e compacta
+    o diário num snapshot. As respostas já são salvas sozinhas; isto só fixa um ponto.
+    """
+    from src.storage.journal import get_journal
+    document = st.session_state.get("document_title") or "doc"
+    idx = st.session_state.get("current_mission_index")
+    selected = st.session_state.get("selected_words", {})
+    draft = None
+    if idx is not None and selected:
+        draft = {
+            "mission": idx,
+            "selected": {str(i): w for i, w in selected.items()},
+            "correct": sorted(st.session_state.get("correct_positions", set())),
+            "variant": _mission_variant(idx),
+        }
+    journal = get_journal()
+    journal.append(
+        _user_id(), document, "save",
+        mission_progress=sorted(st.session_state.get("mission_progress", set())),
+        current_mission_index=idx,
+        draft=draft,
+    )
+    journal.flush()
+    journal.compact(_user_id(), document)
+    return document
 
 # ========== Mapa de Missões ==========
 def render_mission_map(show_back_button: bool = False, cols: int = 5):
     """Mapa de missões com layout em zigue-zague e sequência."""
     ensure_state_initialized()
-    missions = st.session_state.get("missions", [])
+    missions = current_missions()
 
     top = st.columns([1, 1, 6])
     with top[0]:
         if show_back_button:
-            if st.button("Voltar para Upload", key="btn_back_upload_map"):
-                st.session_state.page = "upload"
-                st.rerun()
+            st.button("Voltar para Upload", key="btn_back_upload_map",
+                      on_click=queue_event, args=("navigate",), kwargs={"page": "upload"})
     with top[1]:
-        if st.button("Salvar Status", key="btn_save_status_map"):
-            path = _quick_save_status()
-            st.toast(f"Status salvo: {os.path.basename(path)}", icon="📌")
+        st.button("Salvar Status", key="btn_save_status_map",
+                  on_click=queue_event, args=("save_status",))
+    with top[2]:
+        if missions:
+            st.button("▶️ Próxima missão", key="btn_next_mission_map", type="primary",
+                      on_click=queue_event, args=("next_mission",))
+
+    if st.session_state.get("generation"):
+        _render_generation_progress()
 
     if not missions:
-        st.info("Nenhuma missão. Vá para Upload e gere a partir de um PDF.")
+        if not st.session_state.get("generation"):
+            st.info("Nenhuma missão. Vá para Upload e gere a partir de um PDF.")
         return
 
-    # Deduplicação leve (evita artigos repetidos no mapa)
-    dedup, seen = [], set()
-    for m in missions:
-        key = (m.get("title"), tuple(m.get("data", {}).get("keywords", [])[:3]))
-        if key not in seen:
-            seen.add(key)
-            dedup.append(m)
-    missions = dedup
-
+    # (artigos repetidos já foram descartados na geração: src.extractor.bundle.iter_missions)
     st.header(st.session_state.get("document_title") or "Mapa de Missões")
 
     # Legenda simples
     st.markdown(
         '<div class="mission-legend">'
-        '<span>🎯 Jogável</span><span>🏆 Concluída</span><span>🔒 Bloqueada</span>'
+        '<span>🎯 Jogável</span><span>🏆 Concluída</span><span>🔁 Revisar</span><span>🔒 Bloqueada</span>'
         '</div>',
         unsafe_allow_html=True,
     )
 
     completed = st.session_state.get("mission_progress", set())
     # Próxima missão desbloqueada é a primeira não concluída
-    next_playable = 0
-    while next_playable in completed and next_playable < len(missions):
-        next_playable += 1
+    engine = current_engine()
+    next_playable = engine.next_level(None, completed) if engine is not None else None
+    if next_playable is None:
+        next_playable = len(missions)
+    # concluídas com revisão vencida (src.game.scheduler)
+    due = _due_missions(engine) if engine is not None else set()
 
     emojis_cycle = ["🎯", "🧠", "⚡", "🔥", "🛡️", "💎", "🚀"]
 
     total = len(missions)
     rows = math.ceil(total / cols)
 
+    # Só uma janela de linhas vira widget (padrão: em volta da próxima jogável), para o
+    # custo do mapa não crescer com o tamanho do documento
+    first_row, last_row = _map_window(rows, next_playable // cols)
+    if rows > MAP_WINDOW_ROWS:
+        _render_map_controls(total, rows, cols, first_row, next_playable)
+
     # Render em zigue-zague
-    for r in range(rows):
+    for r in range(first_row, last_row):
         start = r * cols
         end = min(start + cols, total)
         chunk = list(range(start, end))
@@ -304,10 +480,11 @@ def render_mission_map(show_back_button: bool = False, cols: int = 5):
 
             done = idx in completed
             locked = idx > max(next_playable, 0)  # bloqueia tudo após a próxima jogável
-            current = (idx == next_playable and not done)
 
             label = f"{emoji} {idx+1}. {short}"
-            if done:
+            if done and idx in due:
+                label += " 🔁"
+            elif done:
                 label += " 🏆"
             elif locked:
                 label += " 🔒"
@@ -316,18 +493,53 @@ def render_mission_map(show_back_button: bool = False, cols: int = 5):
 
             with cols_row[i]:
                 st.markdown('<div class="mission-slot">', unsafe_allow_html=True)
-                if st.button(label, key=f"mission_{idx}", disabled=locked, use_container_width=True):
-                    st.session_state.current_mission_index = idx
-                    st.session_state.selected_words.clear()
-                    st.session_state.correct_positions.clear()
-                    st.session_state.active_blank_index = 0
-                    st.session_state.correct_answers = 0
-                    st.session_state.total_questions = 0
-                    st.session_state.page = "play"
-                    st.rerun()
+                st.button(label, key=f"mission_{idx}", disabled=locked, use_container_width=True,
+                          on_click=queue_event, args=("open_mission",), kwargs={"index": idx})
                 st.markdown('</div>', unsafe_allow_html=True)
 
-    st.caption(f"Concluídas: {len(completed)}/{len(missions)}")
+    st.caption(f"Concluídas: {len(completed)}/{len(missions)}" + (f" · {len(due)} para revisar" if due else ""))
+
+def _due_missions(engine) -> set[int]:
+    """Índices das missões do documento ativo com revisão vencida."""
+    document = st.session_state.get("document_title")
+    if not document:
+        return set()
+    from src.game.scheduler import get_scheduler
+    keys = get_scheduler().due_keys(_user_id(), document)
+    return {i for i in map(engine.index_of, keys) if i is not None}
+
+# linhas do mapa desenhadas de cada vez
+MAP_WINDOW_ROWS = 8
+
+def _map_window(rows: int, focus_row: int) -> tuple[int, int]:
+    """[primeira, última) linha da janela: a escolhida pelo usuário ou centrada em `focus_row`."""
+    first = st.session_state.get("map_window_row")
+    if first is None:
+        first = focus_row - MAP_WINDOW_ROWS // 2
+    first = min(max(first, 0), max(rows - MAP_WINDOW_ROWS, 0))
+    return first, min(first + MAP_WINDOW_ROWS, rows)
+
+def _render_map_controls(total: int, rows: int, cols: int, first_row: int, next_playable: int) -> None:
+    """Navegação da janela: anteriores/próximas, ir para a próxima jogável e saltar para um trecho."""
+    c1, c2, c3, c4 = st.columns([1, 1, 1, 2], vertical_alignment="bottom")
+    with c1:
+        st.button("⬆️ Anteriores", key="map_prev", disabled=first_row == 0,
+                  on_click=queue_event, args=("map_window",), kwargs={"row": first_row - MAP_WINDOW_ROWS})
+    with c2:
+        st.button("⬇️ Próximas", key="map_next", disabled=first_row + MAP_WINDOW_ROWS >= rows,
+                  on_click=queue_event, args=("map_window",), kwargs={"row": first_row + MAP_WINDOW_ROWS})
+    with c3:
+        st.button("🎯 Próxima jogável", key="map_focus",
+                  on_click=queue_event, args=("map_window",), kwargs={"row": None})
+    with c4:
+        # trechos alinhados a MAP_WINDOW_ROWS; o valor vem da janela atual (escrito antes do widget)
+        starts = list(range(0, rows, MAP_WINDOW_ROWS))
+        st.session_state.map_jump = max(r for r in starts if r <= first_row)
+        st.selectbox(
+            "Ir para o trecho", starts, key="map_jump",
+            format_func=lambda r: f"Missões {r * cols + 1}–{min((r + MAP_WINDOW_ROWS) * cols, total)}",
+            on_change=queue_event, args=("map_jump",),
+        )
 
 # ========== Jogo: preencher lacunas ==========
 def _place_selected_word(word: str, answers: list[str]) -> None:
@@ -335,9 +547,17 @@ def _place_selected_word(word: str, answers: list[str]) -> None:
     if i < 0 or i >= len(answers):
         return
     st.session_state.selected_words[i] = word
-    if word.lower() == answers[i].lower():
+    correct = word.lower() == answers[i].lower()
+    if correct:
         st.session_state.correct_positions.add(i)
         st.session_state.correct_answers += 1
+    idx = st.session_state.get("current_mission_index")
+    _journal("answer", mission=idx, blank=i, word=word, correct=correct, variant=_mission_variant(idx))
+    engine = current_engine()
+    if engine is not None and idx is not None and st.session_state.get("document_title"):
+        from src.game.scheduler import get_scheduler
+        get_scheduler().record_answer(_user_id(), st.session_state.document_title, engine.key_of(idx),
+                                      correct, blank=i)
     nxt = first_unfilled_blank(len(answers))
     if nxt >= 0:
         st.session_state.active_blank_index = nxt
@@ -346,11 +566,13 @@ def _clear_current_blank():
     i = st.session_state.active_blank_index
     st.session_state.selected_words.pop(i, None)
     st.session_state.correct_positions.discard(i)
+    _journal("clear", mission=st.session_state.get("current_mission_index"), blank=i)
 
 def _clear_all():
     st.session_state.selected_words.clear()
     st.session_state.correct_positions.clear()
     st.session_state.active_blank_index = 0
+    _journal("clear", mission=st.session_state.get("current_mission_index"), blank=None)
 
 def render_fill_blanks(
     level: Optional[Any] = None,
@@ -386,28 +608,22 @@ def render_fill_blanks(
         with lac_cols[i % len(lac_cols)]:
             active = st.session_state.active_blank_index == i
             label = f"Lacuna {i+1}" + (" ✓" if i in st.session_state.correct_positions else "")
-            if st.button(label, key=f"blank_{i}", type=("primary" if active else "secondary")):
-                st.session_state.active_blank_index = i
-                st.rerun()
+            st.button(label, key=f"blank_{i}", type=("primary" if active else "secondary"),
+                      on_click=queue_event, args=("select_blank",), kwargs={"index": i})
 
     st.subheader("Opções")
     used = set(st.session_state.selected_words.values())
     cols = st.columns(4)
     for idx, opt in enumerate(options):
         with cols[idx % 4]:
-            if st.button(opt, key=f"opt_{idx}", disabled=opt in used):
-                _place_selected_word(opt, keywords)
-                st.rerun()
+            st.button(opt, key=f"opt_{idx}", disabled=opt in used,
+                      on_click=queue_event, args=("place_word",), kwargs={"word": opt, "answers": keywords})
 
     c1, c2 = st.columns(2)
     with c1:
-        if st.button("Limpar lacuna atual"):
-            _clear_current_blank()
-            st.rerun()
+        st.button("Limpar lacuna atual", on_click=queue_event, args=("clear_blank",))
     with c2:
-        if st.button("Limpar tudo"):
-            _clear_all()
-            st.rerun()
+        st.button("Limpar tudo", on_click=queue_event, args=("clear_all",))
 
     if all(i in st.session_state.selected_words for i in range(total_blanks)):
         correct_now = sum(
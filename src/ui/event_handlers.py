@@ -1,62 +1,272 @@
 import streamlit as st
 
+from src.telemetry.trace import count, span
+
+# ========== fila de eventos ==========
+# Os botões não chamam mais st.rerun(): usam on_click=queue_event(...), que roda antes
+# do script. process_events() aplica a fila inteira numa única passada no início da
+# execução, então a página já é desenhada com o estado novo e um clique custa uma execução.
+
+def queue_event(kind: str, **payload) -> None:
+    """Enfileira um evento para o próximo dispatch (use como on_click dos botões)."""
+    st.session_state.setdefault("event_queue", []).append((kind, payload))
+
+def rerun() -> None:
+    """
+    st.rerun() limitado a um por interação do usuário (para mudanças feitas no meio do
+    desenho da página, ex.: missão concluída). Os reruns ficam contados em rerun_stats().
+    """
+    if st.session_state.get("interaction_reruns", 0) >= 1:
+        count("rerun.suppressed")
+        return
+    count("rerun")
+    st.session_state.rerun_pending = True
+    st.rerun()
+
+def refresh() -> None:
+    """Rerun pedido pelo servidor (ex.: novas missões compiladas), não por um clique."""
+    st.session_state.refresh_pending = True
+    st.rerun()
+
+def rerun_stats() -> dict:
+    """Contadores: interações, reruns totais, atualizações do servidor e reruns da interação atual."""
+    return {
+        "interactions": st.session_state.get("interactions", 0),
+        "reruns": st.session_state.get("reruns_total", 0),
+        "refreshes": st.session_state.get("refreshes", 0),
+        "last_interaction_reruns": st.session_state.get("interaction_reruns", 0),
+    }
+
+def _count_execution() -> None:
+    if st.session_state.pop("rerun_pending", False):
+        # execução disparada pelo nosso rerun(): mesma interação
+        st.session_state.interaction_reruns = st.session_state.get("interaction_reruns", 0) + 1
+        st.session_state.reruns_total = st.session_state.get("reruns_total", 0) + 1
+    elif st.session_state.pop("refresh_pending", False):
+        st.session_state.refreshes = st.session_state.get("refreshes", 0) + 1
+    else:
+        st.session_state.interactions = st.session_state.get("interactions", 0) + 1
+        st.session_state.interaction_reruns = 0
+
 def process_events():
-    """Processa todos os eventos e interações de usuário."""
+    """Processa todos os eventos e interações de usuário (no máximo um rerun por interação)."""
+    _count_execution()
+    _refresh_reviews()
     process_url_params()
     process_session_events()
+    dispatch_events()
+
+def _refresh_reviews() -> None:
+    # revisões gravadas por outro worker: conferidas uma vez por execução, na 1ª consulta
+    from src.game.scheduler import get_scheduler
+    from src.ui.components import _user_id
+    get_scheduler().refresh(_user_id())
 
 def process_url_params():
-    """Processa parâmetros da URL."""
-    # PROBLEMA IDENTIFICADO: Verificamos os parâmetros, mas não mantemos o estado após o processamento
-    
+    """Converte os parâmetros da URL em eventos da fila."""
     if "selected_word" in st.query_params:
         selected_word = st.query_params["selected_word"]
         st.session_state.selected_word = selected_word
-        print(f"Palavra selecionada: {selected_word}")
 
     if "blank_index" in st.query_params and "selected_word" in st.session_state:
-        blank_index = int(st.query_params["blank_index"])
-        word = st.session_state.selected_word
-        
-        # IMPORTANTE: Armazenar explicitamente em session_state para persistência
-        if 'selected_words' not in st.session_state:
-            st.session_state.selected_words = {}
-        
-        # Armazenar a palavra no índice especificado
-        st.session_state.selected_words[blank_index] = word
-        print(f"Palavra '{word}' armazenada no índice {blank_index}")
-        
-        # Verificar se a palavra é correta
-        from src.game.game_state import update_game_state
-        update_game_state(blank_index, word)
-        
-        # Limpar parâmetros para evitar loop
-        st.query_params.clear()
-        st.rerun()
+        queue_event("url_blank_filled", blank_index=int(st.query_params["blank_index"]),
+                    word=st.session_state.selected_word)
+        # Limpar parâmetros para evitar loop (o evento já está na fila desta execução);
+        # ?user= fica: recarregar a página continua no mesmo usuário
+        for param in ("selected_word", "blank_index"):
+            st.query_params.pop(param, None)
 
 def process_session_events():
-    """Processa eventos guardados no session_state."""
+    """Converte as flags guardadas no session_state em eventos da fila."""
     if st.session_state.get('word_selected', False):
+        # a seleção já está em session_state; basta consumir a flag
         st.session_state.word_selected = False
-        st.rerun()
 
     if st.session_state.get('blank_filled', False):
-        blank_index = st.session_state.get('filled_blank_index')
-        selected_word = st.session_state.selected_words[blank_index]
-        
-        # Importação tardia para evitar ciclo
-        from src.game.game_state import check_answer
-        # Delegar para a função de verificação de resposta
-        check_answer(blank_index, selected_word)
-        
         st.session_state.blank_filled = False
-        st.rerun()
+        queue_event("blank_filled", blank_index=st.session_state.get('filled_blank_index'))
+
+def dispatch_events() -> None:
+    """Aplica, em ordem, todos os eventos pendentes."""
+    queue = st.session_state.get("event_queue") or []
+    st.session_state.event_queue = []
+    for kind, payload in queue:
+        handler = _HANDLERS.get(kind)
+        if handler is not None:
+            count("event", kind=kind)
+            with span(f"event.{kind}"):
+                handler(**payload)
+
+# ========== handlers ==========
+def _on_url_blank_filled(blank_index: int, word: str) -> None:
+    if 'selected_words' not in st.session_state:
+        st.session_state.selected_words = {}
+    st.session_state.selected_words[blank_index] = word
+    # Verificar se a palavra é correta
+    from src.game.game_state import update_game_state
+    update_game_state(blank_index, word)
+
+def _on_blank_filled(blank_index: int) -> None:
+    selected_word = st.session_state.selected_words[blank_index]
+    # Importação tardia para evitar ciclo
+    from src.game.game_state import check_answer
+    check_answer(blank_index, selected_word)
+
+def _on_navigate(page: str) -> None:
+    st.session_state.page = page
+
+def _reset_play_state() -> None:
+    st.session_state.selected_words.clear()
+    st.session_state.correct_positions.clear()
+    st.session_state.active_blank_index = 0
+    st.session_state.correct_answers = 0
+    st.session_state.total_questions = 0
+
+def _on_open_mission(index: int) -> None:
+    from src.ui.init_state import current_missions
+    from src.extractor.mission import prefetch_missions
+    prefetch_missions(current_missions()[index + 1:index + 2])  # próxima a desbloquear
+    if index == st.session_state.get("current_mission_index") and st.session_state.get("selected_words"):
+        st.session_state.page = "play"  # volta ao rascunho salvo pelo "Voltar (salvar)"
+        return
+    st.session_state.current_mission_index = index
+    _reset_play_state()
+    st.session_state.page = "play"
+    from src.ui.components import _journal, _mission_variant
+    _journal("open", mission=index, variant=_mission_variant(index))
+
+def _on_next_mission(skip_current: bool = False) -> None:
+    """
+    Abre a missão que o agendador escolher: revisão vencida ou a próxima ainda não feita
+    (com `skip_current`, pulando a que está aberta).
+    """
+    from src.ui.init_state import current_engine
+    from src.ui.components import _user_id
+    from src.game.scheduler import next_mission
+    engine = current_engine()
+    document = st.session_state.get("document_title")
+    if engine is None or not document:
+        return
+    completed = st.session_state.get("mission_progress", set())
+    current = st.session_state.get("current_mission_index")
+    if skip_current and current is not None:
+        completed = completed | {current}
+    index, reason = next_mission(_user_id(), document, engine, completed)
+    if index is None:
+        st.session_state.page = "map"
+        st.toast("Todas as missões concluídas e nenhuma revisão pendente.", icon="🏆")
+        return
+    if reason == "review":
+        st.toast(f"Revisão: missão {index + 1}", icon="🔁")
+    _on_open_mission(index)
+
+def _on_reset_mission() -> None:
+    _reset_play_state()
+    from src.ui.components import _journal
+    _journal("clear", mission=st.session_state.get("current_mission_index"), blank=None)
+
+def _on_select_blank(index: int) -> None:
+    st.session_state.active_blank_index = index
+
+def _on_place_word(word: str, answers: list[str]) -> None:
+    from src.ui.components import _place_selected_word
+    _place_selected_word(word, answers)
+    # última lacuna preenchida: conclui já aqui, sem desenhar o jogo e dar rerun para o mapa
+    if all(i in st.session_state.selected_words for i in range(len(answers))):
+        _on_finish_mission()
+
+def _on_clear_blank() -> None:
+    from src.ui.components import _clear_current_blank
+    _clear_current_blank()
+
+def _on_clear_all() -> None:
+    from src.ui.components import _clear_all
+    _clear_all()
+
+def _on_finish_mission() -> None:
+    from src.ui.app import _complete_current_mission
+    _complete_current_mission()
+
+def _on_leave_mission() -> None:
+    from src.ui.app import _leave_current_mission
+    _leave_current_mission()
+
+def _on_save_status() -> None:
+    from src.ui.components import _quick_save_status
+    document = _quick_save_status()
+    st.toast(f"Status salvo: {document}", icon="📌")
+
+def _on_open_document(pdf_path: str, fname: str, record: bool = False, load_status: bool = False) -> None:
+    from src.ui.components import _open_document_action
+    _open_document_action(pdf_path, fname, record=record, load_status=load_status)
+
+def _on_open_search_hit(pdf_path: str, fname: str, mission: int, key: str | None = None) -> None:
+    """
+    Resultado da busca nos artigos: abre o documento (com o status salvo) direto na missão
+    (`mission` é a posição no mapa; a chave estável tem precedência se ainda existir).
+    """
+    from src.ui.components import _open_document_action
+    from src.ui.init_state import current_engine, current_missions
+    _open_document_action(pdf_path, fname, load_status=True)
+    engine = current_engine()
+    index = engine.index_of(key) if engine is not None and key else None
+    if index is None and 0 <= mission < len(current_missions()):
+        index = mission
+    if index is not None:
+        _on_open_mission(index)
+
+def _on_confirm_delete(fname: str, row: int | None = None) -> None:
+    st.session_state.confirm_delete_name = fname
+    st.session_state.confirm_delete_row = row
+
+def _on_cancel_delete() -> None:
+    st.session_state.pop("confirm_delete_name", None)
+    st.session_state.pop("confirm_delete_row", None)
+
+def _on_map_window(row: int | None) -> None:
+    # None: volta a centralizar na próxima missão jogável
+    st.session_state.map_window_row = None if row is None else max(row, 0)
+
+def _on_map_jump() -> None:
+    st.session_state.map_window_row = st.session_state.get("map_jump")
+
+def _on_library_page(page: int) -> None:
+    st.session_state.library_page = max(page, 0)
+
+def _on_delete_pdf(fname: str) -> None:
+    from src.ui.components import _delete_pdf
+    _delete_pdf(fname)
+    _on_cancel_delete()
+
+_HANDLERS = {
+    "url_blank_filled": _on_url_blank_filled,
+    "blank_filled": _on_blank_filled,
+    "navigate": _on_navigate,
+    "open_mission": _on_open_mission,
+    "next_mission": _on_next_mission,
+    "reset_mission": _on_reset_mission,
+    "select_blank": _on_select_blank,
+    "place_word": _on_place_word,
+    "clear_blank": _on_clear_blank,
+    "clear_all": _on_clear_all,
+    "finish_mission": _on_finish_mission,
+    "leave_mission": _on_leave_mission,
+    "save_status": _on_save_status,
+    "open_document": _on_open_document,
+    "open_search_hit": _on_open_search_hit,
+    "confirm_delete": _on_confirm_delete,
+    "cancel_delete": _on_cancel_delete,
+    "delete_pdf": _on_delete_pdf,
+    "library_page": _on_library_page,
+    "map_window": _on_map_window,
+    "map_jump": _on_map_jump,
+}
 
 def handle_word_selection(word):
     """Função que gerencia quando uma palavra é clicada."""
     if 'selected_word' not in st.session_state:
         st.session_state.selected_word = None
-    
+
     st.session_state.selected_word = word
     st.session_state.word_selected = True
 
@@ -64,10 +274,10 @@ def handle_blank_click(blank_index):
     """Função que gerencia quando um espaço em branco é clicado."""
     if 'selected_word' in st.session_state and st.session_state.selected_word:
         word = st.session_state.selected_word
-        
+
         if 'selected_words' not in st.session_state:
             st.session_state.selected_words = {}
-        
+
         st.session_state.selected_words[blank_index] = word
         st.session_state.blank_filled = True
-        st.session_state.filled_blank_index = blank_index
\ No newline at end of file
+        st.session_state.filled_blank_index = blank_index
@@ -5,9 +5,68 @@ __all__ = [
     "ensure_state",
     "first_unfilled_blank",
     "set_missions_in_state",
+    "current_missions",
+    "current_engine",
+    "current_level",
 ]
 
+# Identidade: login do Streamlit (st.user) quando configurado. Sem login, ?user= na URL:
+# com GAME_USER_SECRET definido só vale o link assinado (user_token), então ninguém troca
+# de usuário editando a URL; sem o segredo o valor só é aceito como veio com
+# GAME_TRUST_URL_USER=1 (confiança no cliente, para uma turma só num servidor próprio).
+# ?user= que não vale dá um usuário só desta sessão. Lida uma vez e fixada na sessão.
+def _user_secret() -> bytes | None:
+    import os
+    secret = os.environ.get("GAME_USER_SECRET", "").strip()
+    return secret.encode("utf-8") if secret else None
+
+def _trust_url_user() -> bool:
+    import os
+    return os.environ.get("GAME_TRUST_URL_USER", "").strip().lower() in ("1", "true", "yes")
+
+def _signature(user_id: str, secret: bytes) -> str:
+    import hmac, hashlib
+    return hmac.new(secret, user_id.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+def user_token(user_id: str) -> str:
+    """Valor de ?user= para `user_id`: "<usuário>.<assinatura>" com GAME_USER_SECRET, senão o próprio nome."""
+    secret = _user_secret()
+    return f"{user_id}.{_signature(user_id, secret)}" if secret else user_id
+
+def verify_user_token(token: str) -> str | None:
+    """
+    Usuário do ?user=; None se a assinatura não confere (com GAME_USER_SECRET) ou, sem o
+    segredo, se a URL não é confiável (GAME_TRUST_URL_USER desligado).
+    """
+    secret = _user_secret()
+    if secret is None:
+        return token if _trust_url_user() else None
+    import hmac
+    user_id, _, sig = token.rpartition(".")
+    if user_id and hmac.compare_digest(sig, _signature(user_id, secret)):
+        return user_id
+    return None
+
+def _session_user() -> str:
+    """
+    Usuário dono do progresso: login do Streamlit, ?user= válido, o local (sem ?user=) ou,
+    com um ?user= que não vale, um usuário só desta sessão.
+    """
+    from src.storage.db import DEFAULT_USER
+    try:
+        if st.user.is_logged_in:
+            return st.user.email or DEFAULT_USER
+    except Exception:
+        pass
+    token = st.query_params.get("user")
+    if token:
+        import uuid
+        return verify_user_token(token) or f"sessao-{uuid.uuid4().hex[:12]}"
+    return DEFAULT_USER
+
 def ensure_state_initialized() -> None:
+    st.session_state.setdefault("user_id", _session_user())
+
     # Flags básicas
     st.session_state.setdefault("word_selected", False)
     st.session_state.setdefault("blank_filled", False)
@@ -23,17 +82,12 @@ def ensure_state_initialized() -> None:
     st.session_state.setdefault("pdf_path", None)
     st.session_state.setdefault("document_title", None)
     st.session_state.setdefault("articles", [])
-    st.session_state.setdefault("missions", [])  # cada missão tem: {title, data:{text_segments, keywords, options}}
+    # as missões ficam no DocumentCache do processo; a sessão guarda só o handle
+    # (cada missão tem: {title, data:{text_segments, keywords, options}})
+    st.session_state.setdefault("doc_id", None)
     st.session_state.setdefault("mission_progress", set())  # índices concluídos
     st.session_state.setdefault("current_mission_index", None)
-
-    # Engine opcional (lazy import)
-    if "game_engine" not in st.session_state:
-        try:
-            from src.game.engine import GameEngine
-            st.session_state.game_engine = GameEngine()
-        except Exception as e:
-            st.session_state.game_engine_error = str(e)
+    st.session_state.setdefault("generation", None)  # MissionJob em andamento (src.extractor.jobs)
 
 def ensure_state() -> None:
     ensure_state_initialized()
@@ -45,9 +99,36 @@ def first_unfilled_blank(total_blanks: int) -> int:
             return i
     return -1
 
-def set_missions_in_state(missions, title: str | None, pdf_path: str | None) -> None:
-    st.session_state.missions = missions or []
+def set_missions_in_state(doc_id: str | None, title: str | None, pdf_path: str | None) -> None:
+    """Aponta a sessão para o documento `doc_id` e zera o progresso do usuário."""
+    st.session_state.doc_id = doc_id
     st.session_state.document_title = title
     st.session_state.pdf_path = pdf_path
     st.session_state.mission_progress = set()
-    st.session_state.current_mission_index = None
\ No newline at end of file
+    st.session_state.current_mission_index = None
+    st.session_state.map_window_row = None
+
+def current_missions() -> list[dict]:
+    """Missões do documento ativo (somente leitura): do job em andamento ou do cache compartilhado."""
+    job = st.session_state.get("generation")
+    if job is not None:
+        return job.missions
+    doc_id = st.session_state.get("doc_id")
+    if not doc_id:
+        return []
+    from src.extractor.doc_cache import load_document
+    return load_document(doc_id) or []
+
+def current_engine():
+    """GameEngine do documento ativo (um por documento no processo) ou None sem missões."""
+    doc_id = st.session_state.get("doc_id")
+    missions = current_missions()
+    if not doc_id or not missions:
+        return None
+    from src.game.engine import get_engine
+    return get_engine(doc_id, missions)
+
+def current_level():
+    """Nível da missão aberta (GameLevel) ou None."""
+    engine = current_engine()
+    return engine.level(st.session_state.get("current_mission_index")) if engine else None
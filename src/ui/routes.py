@@ -1,26 +1,40 @@
 import streamlit as st
 from src.ui.init_state import ensure_state_initialized
 from src.ui.event_handlers import process_events as handle_events
+from src.telemetry.trace import ENABLED as TRACE_ENABLED, set_context, span
 
 def route_manager():
-    ensure_state_initialized()
-    handle_events()
+    from src.storage.library import start_warmup
+    start_warmup()  # só a primeira execução do processo dispara
+    with span("rerun") as rerun_span:
+        with span("ensure_state"):
+            ensure_state_initialized()
+        set_context(doc=st.session_state.get("document_title"), page=st.session_state.get("page"))
+        with span("events"):
+            handle_events()
 
-    # Página padrão
-    if "page" not in st.session_state:
-        st.session_state.page = "upload"
+        # Página padrão
+        if "page" not in st.session_state:
+            st.session_state.page = "upload"
 
-    # Import tardio para evitar ciclos e render conforme a página atual
-    page = st.session_state.page
-    if page == "upload":
-        from src.ui.app import render_upload_page
-        render_upload_page()
-    elif page == "map":
-        from src.ui.app import render_map_page
-        render_map_page()
-    elif page == "play":  # <- importante: reconhecer play
-        from src.ui.app import render_main_page
-        render_main_page()
-    else:
-        from src.ui.app import render_upload_page
-        render_upload_page()
\ No newline at end of file
+        # Import tardio para evitar ciclos e render conforme a página atual
+        page = st.session_state.page
+        # os eventos podem ter trocado de documento/página
+        set_context(doc=st.session_state.get("document_title"), page=page)
+        rerun_span.set(page=page)
+        with span(f"render.{page}"):
+            if page == "upload":
+                from src.ui.app import render_upload_page
+                render_upload_page()
+            elif page == "map":
+                from src.ui.app import render_map_page
+                render_map_page()
+            elif page == "play":  # <- importante: reconhecer play
+                from src.ui.app import render_main_page
+                render_main_page()
+            elif page == "admin" and TRACE_ENABLED:
+                from src.ui.admin import render_admin_page
+                render_admin_page()
+            else:
+                from src.ui.app import render_upload_page
+                render_upload_page()
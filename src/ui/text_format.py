@@ -1,47 +1,96 @@
+from functools import lru_cache
+
 import streamlit as st
 
-def format_text_with_blanks(text: str, keywords: list[str], selected_words: dict[int, str] | None = None) -> str:
-    if selected_words is None:
-        selected_words = {}
+from src.extractor.tokens import TokenIndex
+from src.telemetry.trace import traced
 
-    if "correct_positions" not in st.session_state:
-        st.session_state.correct_positions = set()
+def _find_keywords(text: str, keywords: tuple[str, ...], tokens: TokenIndex) -> tuple[int, ...]:
+    """Início da 1ª ocorrência isolada (mesma caixa) de cada palavra-chave; -1 se não houver."""
+    positions = []
+    for keyword in keywords:
+        positions.append(next(
+            (tokens.starts[t] for t in tokens.occurrences(keyword)
+             if text[tokens.starts[t]:tokens.ends[t]] == keyword),
+            -1,
+        ))
+    return tuple(positions)
+
+@lru_cache(maxsize=256)
+def _keyword_positions(text: str, keywords: tuple[str, ...]) -> tuple[int, ...]:
+    # chave só com o texto do artigo: um TokenIndex na chave prenderia o documento
+    # inteiro no cache mesmo depois de o DocumentCache tê-lo descartado
+    return _find_keywords(text, keywords, TokenIndex.build(text))
+
+@lru_cache(maxsize=256)
+def _render_blanks(
+    text: str,
+    keywords: tuple[str, ...],
+    positions: tuple[int, ...],
+    selected: tuple[tuple[int, str], ...],
+    correct: frozenset[int],
+) -> str:
+    selected_words = dict(selected)
 
     # próximo blank que deve pulsar
     next_blank_idx = None
     for i in range(len(keywords)):
-        if i not in st.session_state.correct_positions and i not in selected_words:
+        if i not in correct and i not in selected_words:
             next_blank_idx = i
             break
 
-    replacements: list[tuple[int, int, str]] = []
-    for idx, keyword in enumerate(keywords):
-        start = 0
-        while True:
-            pos = text.find(keyword, start)
-            if pos == -1:
-                break
-
-            # Palavra isolada
-            before_ok = pos == 0 or not text[pos - 1].isalpha()
-            after_ok = (pos + len(keyword) == len(text)) or not text[pos + len(keyword)].isalpha()
-            if before_ok and after_ok:
-                if idx in selected_words:
-                    if idx in st.session_state.correct_positions:
-                        repl = f'<span class="filled-word correct">✓ {selected_words[idx]}</span>'
-                    else:
-                        repl = f'<span class="filled-word">{selected_words[idx]}</span>'
-                else:
-                    min_w = max(len(keyword) * 8, 60)
-                    active_cls = " active" if (idx == next_blank_idx and idx not in st.session_state.correct_positions) else ""
-                    repl = f'<span class="blank-word{active_cls}" data-index="{idx}" id="blank_{idx}" style="min-width:{min_w}px;cursor:pointer;">Clique para preencher</span>'
-                replacements.append((pos, len(keyword), repl))
-                break
-            start = pos + 1
-
-    # aplicar substituições da direita para a esquerda
-    replacements.sort(reverse=True)
-    out = list(text)
-    for pos, length, repl in replacements:
-        out[pos:pos + length] = repl
-    return "".join(out)
\ No newline at end of file
+    # uma passada da esquerda para a direita, juntando os trechos no fim
+    parts: list[str] = []
+    cursor = 0
+    for pos, idx in sorted((p, i) for i, p in enumerate(positions) if p >= 0):
+        keyword = keywords[idx]
+        if idx in selected_words:
+            if idx in correct:
+                repl = f'<span class="filled-word correct">✓ {selected_words[idx]}</span>'
+            else:
+                repl = f'<span class="filled-word">{selected_words[idx]}</span>'
+        else:
+            min_w = max(len(keyword) * 8, 60)
+            active_cls = " active" if (idx == next_blank_idx and idx not in correct) else ""
+            repl = f'<span class="blank-word{active_cls}" data-index="{idx}" id="blank_{idx}" style="min-width:{min_w}px;cursor:pointer;">Clique para preencher</span>'
+        parts.append(text[cursor:pos])
+        parts.append(repl)
+        cursor = pos + len(keyword)
+    parts.append(text[cursor:])
+    return "".join(parts)
+
+@traced()
+def format_text_with_blanks(
+    text: str,
+    keywords: list[str],
+    selected_words: dict[int, str] | None = None,
+    tokens: TokenIndex | None = None,
+    blank_starts: list[int] | None = None,
+) -> str:
+    """
+    Substitui cada palavra-chave pelo span da lacuna.
+    Com `blank_starts` (posições das lacunas no texto, ex. CompactMission.blanks[::2]) usa
+    essas posições; senão localiza a 1ª ocorrência isolada via `tokens` (TokenIndex de `text`).
+    O HTML fica em cache por (texto, lacunas, palavras escolhidas, acertos); as posições
+    localizadas sem `tokens`, pelo texto e as palavras-chave.
+    """
+    if selected_words is None:
+        selected_words = {}
+
+    if "correct_positions" not in st.session_state:
+        st.session_state.correct_positions = set()
+
+    if blank_starts is not None:
+        positions = tuple(blank_starts)
+    elif tokens is not None:
+        positions = _find_keywords(text, tuple(keywords), tokens)  # índice pronto: sem cache
+    else:
+        positions = _keyword_positions(text, tuple(keywords))
+
+    return _render_blanks(
+        text,
+        tuple(keywords),
+        positions,
+        tuple(sorted(selected_words.items())),
+        frozenset(st.session_state.correct_positions),
+    )
@@ -0,0 +1,30 @@
+import os, sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def game_db(tmp_path, monkeypatch):
+    """Banco e bundles num diretório temporário; caches e diário do processo zerados."""
+    monkeypatch.setenv("GAME_DB_PATH", str(tmp_path / "game.db"))
+    monkeypatch.setenv("GAME_BUNDLE_DIR", str(tmp_path / "bundles"))
+    from src.storage import journal, search
+    monkeypatch.setattr(search, "_CORPUS", None)  # a versão da biblioteca recomeça em cada banco
+    monkeypatch.setattr(journal, "_JOURNAL", None)
+    yield tmp_path
+    # antes do monkeypatch devolver GAME_DB_PATH: nada do diário pode cair no banco real
+    if journal._JOURNAL is not None:
+        journal._JOURNAL.close()
+
+
+@pytest.fixture
+def session_state():
+    """st.session_state limpo (modo bare: sem servidor do Streamlit)."""
+    import streamlit as st
+    from src.ui.init_state import ensure_state_initialized
+    st.session_state.clear()
+    ensure_state_initialized()
+    yield st.session_state
+    st.session_state.clear()
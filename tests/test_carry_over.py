@@ -0,0 +1,59 @@
+from src.extractor.pdf_extractor import GENERATOR_VERSION
+from src.game.engine import GameEngine
+from src.storage import db
+from src.storage.journal import carry_over_progress, get_journal
+
+OLD_KEYS = ["art1", "art2", "art3", "art4"]
+NEW_KEYS = ["art1", "novo", "art2", "art3x", "art4"]  # artigo inserido e art3 alterado
+
+
+def _record(sha, keys):
+    db.record_bundle(sha, GENERATOR_VERSION, "doc.pdf", f"/tmp/{sha}.json",
+                     [(i + 1, f"Art. {i + 1}", i, key) for i, key in enumerate(keys)])
+
+
+def test_progress_follows_articles_after_insertion(game_db):
+    _record("1" * 64, OLD_KEYS)
+    _record("2" * 64, NEW_KEYS)
+    journal = get_journal()
+    for mission in (0, 1, 2):
+        journal.append("u", "doc.pdf", "complete", mission=mission)
+    journal.append("u", "doc.pdf", "open", mission=3, variant="7:42")
+    journal.append("u", "doc.pdf", "answer", mission=3, blank=0, word="quórum", correct=True, variant="7:42")
+    journal.append("v", "doc.pdf", "open", mission=2)  # artigo alterado: missão aberta se perde
+
+    assert carry_over_progress("doc.pdf", "1" * 64, "2" * 64) == 2
+    u = journal.replay("u", "doc.pdf")
+    assert u["mission_progress"] == {0, 2}          # art1 fica, art2 vai para 2, art3 mudou
+    assert u["current_mission_index"] == 4          # art4 foi empurrado pelo inserido
+    assert u["draft"] == {"mission": 4, "selected": {"0": "quórum"}, "correct": [0], "variant": "7:42"}
+    v = journal.replay("v", "doc.pdf")
+    assert v["current_mission_index"] is None and v["draft"] is None
+
+
+def test_carry_over_without_keys_clears_progress(game_db):
+    _record("1" * 64, [None, None])  # bundle antigo, de antes das chaves
+    _record("2" * 64, NEW_KEYS)
+    journal = get_journal()
+    journal.append("u", "doc.pdf", "complete", mission=1)
+    journal.append("u", "doc.pdf", "open", mission=0)
+
+    assert carry_over_progress("doc.pdf", "1" * 64, "2" * 64) == 1
+    assert journal.replay("u", "doc.pdf") == {"mission_progress": set(), "current_mission_index": None, "draft": None}
+
+
+def test_old_keys_read_at_recorded_version(game_db):
+    db.record_bundle("1" * 64, GENERATOR_VERSION - 1, "doc.pdf", "/tmp/old.json",
+                     [(i + 1, f"Art. {i + 1}", i, key) for i, key in enumerate(OLD_KEYS)])
+    _record("2" * 64, NEW_KEYS)
+    get_journal().append("u", "doc.pdf", "complete", mission=3)
+
+    assert carry_over_progress("doc.pdf", "1" * 64, "2" * 64) == 1
+    assert get_journal().replay("u", "doc.pdf")["mission_progress"] == {4}
+
+
+def test_engine_resolves_keys_after_insertion():
+    engine = GameEngine("doc", [{"key": k, "title": k} for k in NEW_KEYS])
+    assert engine.index_of("art4") == 4 and engine.index_of("art3") is None
+    assert engine.key_of(1) == "novo"
+    assert GameEngine("old", [{"title": "sem chave"}]).key_of(0) == "#0"
@@ -0,0 +1,37 @@
+import os
+
+from benchmarks.synthetic import legislation_pdf
+from src.extractor.compile import compile_directory, find_pdfs
+
+
+def _quiet(_msg: str) -> None:
+    pass
+
+
+def test_find_pdfs_recursive(tmp_path):
+    (tmp_path / "sub").mkdir()
+    for rel in ("b.pdf", "a.PDF", "notas.txt", os.path.join("sub", "c.pdf")):
+        (tmp_path / rel).write_bytes(b"")
+    assert [os.path.relpath(p, tmp_path) for p in find_pdfs(str(tmp_path))] == [
+        "a.PDF", "b.pdf", os.path.join("sub", "c.pdf"),
+    ]
+    assert len(find_pdfs(str(tmp_path), recursive=False)) == 2
+
+
+def test_compile_skips_unchanged_content(game_db):
+    root = game_db / "pdfs"
+    root.mkdir()
+    legislation_pdf(str(root / "resolucao.pdf"), 2)
+
+    (first,) = compile_directory(str(root), workers=1, register=False, log=_quiet)
+    assert first["status"] == "compiled" and first["missions"] > 0
+    assert os.listdir(game_db / "bundles") == [f"{first['sha256']}-v{_version()}.json"]
+    (again,) = compile_directory(str(root), workers=1, register=False, log=_quiet)
+    assert again["status"] == "skipped"
+    (forced,) = compile_directory(str(root), workers=1, force=True, register=False, log=_quiet)
+    assert forced["status"] == "compiled" and forced["missions"] == first["missions"]
+
+
+def _version() -> int:
+    from src.extractor.pdf_extractor import GENERATOR_VERSION
+    return GENERATOR_VERSION
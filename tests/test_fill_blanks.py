@@ -0,0 +1,11 @@
+from benchmarks.synthetic import legislation
+from src.extractor.pdf_extractor import (
+    generate_fill_blanks_for_articles, generate_fill_blanks_from_article, split_into_articles,
+)
+
+
+def test_batch_matches_article_by_article():
+    arts = split_into_articles(legislation(40))
+    seeds = [a["id"] for a in arts]
+    one_by_one = [generate_fill_blanks_from_article(a["text"], seed=s) for a, s in zip(arts, seeds)]
+    assert generate_fill_blanks_for_articles(arts, seeds) == one_by_one
@@ -0,0 +1,50 @@
+from src.storage import db
+from src.storage.journal import ProgressJournal, apply_record, empty_state
+
+RECORDS = [
+    ("open", {"mission": 0}),
+    ("answer", {"mission": 0, "blank": 0, "word": "prazo", "correct": True}),
+    ("answer", {"mission": 0, "blank": 1, "word": "dias", "correct": False}),
+    ("complete", {"mission": 0}),
+    ("open", {"mission": 1}),
+    ("answer", {"mission": 1, "blank": 0, "word": "quórum", "correct": True}),
+    ("answer", {"mission": 1, "blank": 1, "word": "terços", "correct": False}),
+    ("clear", {"mission": 1, "blank": 1}),
+    ("answer", {"mission": 1, "blank": 2, "word": "membros", "correct": True}),
+]
+
+
+def _expected(records):
+    state = empty_state()
+    for kind, data in records:
+        apply_record(state, kind, data)
+    return state
+
+
+def test_replay_after_compaction_matches_full_history(game_db):
+    journal = ProgressJournal(compact_every=3)
+    for kind, data in RECORDS[:4]:
+        journal.append("u", "doc.pdf", kind, **data)
+    journal.flush()
+    assert journal.compactions == 1
+    assert db.journal_length("u", "doc.pdf") == 0  # tudo dobrado no snapshot
+    for kind, data in RECORDS[4:6]:
+        journal.append("u", "doc.pdf", kind, **data)
+    journal.flush()
+    assert db.journal_length("u", "doc.pdf") == 2  # cauda abaixo do limite: fica no diário
+    for kind, data in RECORDS[6:]:
+        journal.append("u", "doc.pdf", kind, **data)
+
+    state = journal.replay("u", "doc.pdf")
+    assert state == _expected(RECORDS)
+    assert state["mission_progress"] == {0}
+    assert state["draft"] == {"mission": 1, "selected": {"0": "quórum", "2": "membros"}, "correct": [0, 2], "variant": None}
+
+
+def test_save_record_replaces_history(game_db):
+    journal = ProgressJournal(compact_every=2)
+    for kind, data in RECORDS[:4]:
+        journal.append("u", "doc.pdf", kind, **data)
+    journal.append("u", "doc.pdf", "save", mission_progress=[3], current_mission_index=3, draft=None)
+    assert journal.replay("u", "doc.pdf") == {"mission_progress": {3}, "current_mission_index": 3, "draft": None}
+    assert journal.replay("u", "other.pdf") is None
@@ -0,0 +1,79 @@
+from src.game.scheduler import FIRST_INTERVAL, RETRY_INTERVAL, ReviewScheduler, quality
+
+NOW = 1_000_000.0
+
+
+def test_quality_counts_each_blank_once():
+    assert quality(0, 4, 4) == 5
+    assert quality(1, 4, 4) == 4     # errou uma lacuna e depois acertou
+    assert quality(1, 4, 3) == 4     # errou e deixou errada: a mesma lacuna, uma falha só
+    assert quality(4, 4, 0) == 1
+    assert quality(1, 1, 0) == 1     # a única lacuna, errada
+    assert quality(1, 1, 1) == 2     # a única lacuna, errada antes de acertar
+
+
+def test_wrong_answer_left_wrong_is_one_miss(game_db):
+    sched = ReviewScheduler()
+    sched.record_answer("u", "doc.pdf", "k1", correct=False, blank=2)
+    sched.record_answer("u", "doc.pdf", "k1", correct=False, blank=2)
+    item = sched.review("u", "doc.pdf", "k1", blanks=4, correct={0, 1, 3}, now=NOW)
+    assert item.errors == 2
+    assert item.interval == FIRST_INTERVAL  # nota 4: uma lacuna perdida
+
+
+def test_reviews_from_another_worker_are_seen(game_db):
+    a, b = ReviewScheduler(), ReviewScheduler()  # dois processos no mesmo banco
+    assert b.next_due("u", "doc.pdf", now=NOW) is None
+    a.review("u", "doc.pdf", "k1", blanks=3, correct=set(), now=NOW)  # errou tudo: volta logo
+    assert b.next_due("u", "doc.pdf", now=NOW + RETRY_INTERVAL) is None  # só confere na próxima execução
+    b.refresh("u")
+    item = b.next_due("u", "doc.pdf", now=NOW + RETRY_INTERVAL)
+    assert item is not None and item.key == "k1"
+    assert b.due_keys("u", "doc.pdf", now=NOW + RETRY_INTERVAL) == {"k1"}
+
+
+def test_next_due_in_due_order(game_db):
+    sched = ReviewScheduler()
+    # "c" erra tudo (volta em 10 min); "a" e "b" vão para 1 dia, em momentos diferentes
+    sched.review("u", "doc.pdf", "a", blanks=2, correct={0, 1}, now=NOW)
+    sched.review("u", "doc.pdf", "b", blanks=2, correct={0, 1}, now=NOW - 100)
+    sched.review("u", "doc.pdf", "c", blanks=2, correct=set(), now=NOW)
+    sched.review("u", "outro.pdf", "d", blanks=2, correct=set(), now=NOW - 60)
+
+    assert sched.next_due("u", "doc.pdf", now=NOW) is None  # nada venceu ainda
+    later = NOW + FIRST_INTERVAL
+    order = []
+    while (item := sched.next_due("u", "doc.pdf", now=later)) is not None:
+        order.append(item.key)
+        sched.review("u", "doc.pdf", item.key, blanks=2, correct={0, 1}, now=later)
+    assert order == ["c", "b", "a"]
+
+    assert sched.next_due("u", now=later).key == "d"  # todos os documentos
+    assert sched.next_due("u", "outro.pdf", now=later, valid={"x"}) is None  # chave fora da versão atual
+    assert sched.next_due("u", "outro.pdf", now=later).key == "d"            # ... mas continua na fila
+    assert sched.due_keys("u", "doc.pdf", now=later) == set()
+
+
+def test_next_mission_prefers_due_review(game_db, monkeypatch):
+    from src.game import scheduler
+    from src.game.engine import GameEngine
+
+    sched = ReviewScheduler()
+    monkeypatch.setattr(scheduler, "_SCHEDULER", sched)
+    engine = GameEngine("doc", [{"key": k, "title": k} for k in ("a", "b", "c")])
+    assert scheduler.next_mission("u", "doc.pdf", engine, set(), now=NOW) == (0, "new")
+    sched.review("u", "doc.pdf", "b", blanks=1, correct=set(), now=NOW)
+    assert scheduler.next_mission("u", "doc.pdf", engine, {0, 1}, now=NOW) == (2, "new")
+    assert scheduler.next_mission("u", "doc.pdf", engine, {0, 1}, now=NOW + RETRY_INTERVAL) == (1, "review")
+    assert scheduler.next_mission("u", "doc.pdf", engine, {0, 1, 2}, now=NOW) == (None, None)
+
+
+def test_own_writes_do_not_reload(game_db, monkeypatch):
+    from src.storage import db
+    sched = ReviewScheduler()
+    sched.review("u", "doc.pdf", "a", blanks=2, correct=set(), now=NOW)
+    sched.refresh("u")
+    loads = []
+    monkeypatch.setattr(db, "load_reviews", lambda user_id: loads.append(user_id) or [])
+    assert sched.due_keys("u", "doc.pdf", now=NOW + RETRY_INTERVAL) == {"a"}
+    assert loads == []
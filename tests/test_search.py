@@ -0,0 +1,71 @@
+from src.extractor.mission import compact_mission
+from src.storage import db
+from src.storage.search import index_missions, search
+
+ARTICLES = [
+    ("Art. 1", "Esta resolução dispõe sobre o regimento interno do conselho universitário."),
+    ("Art. 2", "O conselho delibera com quórum qualificado de dois terços dos membros presentes."),
+    ("Art. 3", "O prazo recursal é de dez dias úteis contados da publicação da decisão."),
+    ("Art. 4", "Os casos omissos serão resolvidos pelo conselho em sessão extraordinária."),
+]
+
+
+def _missions():
+    # ids começam em 1, como em iter_missions
+    return [compact_mission(i + 1, title, text, seed=i) for i, (title, text) in enumerate(ARTICLES)]
+
+
+def _index(missions, sha="a" * 64, name="resolucao.pdf"):
+    db.register_upload(name, sha, f"/tmp/{name}", 1)
+    index_missions(sha, missions)
+    return sha, name
+
+
+def test_hit_points_to_map_position(game_db):
+    missions = _missions()
+    _index(missions)
+    for _, text in ARTICLES:
+        hits = search(f'"{" ".join(text.split()[1:4])}"')
+        assert hits
+        assert all(missions[h.mission].title == h.title for h in hits)
+    last = search('"casos omissos"')
+    assert [h.title for h in last] == ["Art. 4"]
+    assert last[0].mission == len(missions) - 1
+
+
+def test_lengths_without_padding(game_db):
+    from src.storage.search import _corpus
+    missions = _missions()
+    _index(missions)
+    (lengths,) = _corpus().lengths.values()
+    assert len(lengths) == len(missions)
+    assert all(n > 0 for n in lengths)
+
+
+def test_ranking_prefers_phrase(game_db):
+    _index(_missions())
+    hits = search("prazo recursal")
+    assert hits[0].title == "Art. 3" and hits[0].phrase
+    assert [h.title for h in search("quor")] == ["Art. 2"]  # prefixo no último termo
+
+
+def test_open_hit_opens_matching_mission(game_db, session_state, monkeypatch):
+    from src.extractor.doc_cache import document_id, get_document_cache
+    from src.ui import components, event_handlers
+    from src.ui.init_state import current_level, set_missions_in_state
+
+    missions = _missions()
+    sha, name = _index(missions)
+    doc_id = document_id(sha, name)
+    get_document_cache().put(doc_id, missions)
+
+    def open_document(pdf_path, fname, record=False, load_status=False):
+        set_missions_in_state(doc_id, fname, pdf_path)
+        session_state.page = "map"
+
+    monkeypatch.setattr(components, "_open_document_action", open_document)
+    for query in ("quórum", "prazo recursal", "casos omissos", "regimento"):
+        (hit,) = search(query)[:1]
+        event_handlers._on_open_search_hit(hit.path, hit.document, hit.mission, hit.key)
+        assert session_state.page == "play"
+        assert current_level().title == hit.title
@@ -0,0 +1,55 @@
+import os
+
+from src.storage import db
+
+
+def _contents():
+    return {c["name"]: c for c in db.list_contents()}
+
+
+def test_reupload_moves_canonical_name_to_alias(game_db):
+    db.register_upload("a.pdf", "1" * 64, "old.pdf", 10)
+    db.register_upload("b.pdf", "1" * 64, "old.pdf", 10)  # mesmo conteúdo: apelido
+    canonical, orphans = db.register_upload("a.pdf", "2" * 64, "new.pdf", 20)
+    assert canonical == "a.pdf" and orphans == []
+    contents = _contents()
+    assert contents["a.pdf"]["sha256"] == "2" * 64
+    assert contents["b.pdf"]["sha256"] == "1" * 64 and contents["b.pdf"]["aliases"] == []
+
+
+def test_delete_resolves_through_uploads(game_db):
+    db.register_upload("a.pdf", "1" * 64, "old.pdf", 10)
+    db.register_upload("b.pdf", "1" * 64, "old.pdf", 10)
+    db.register_upload("a.pdf", "2" * 64, "new.pdf", 20)
+    assert db.delete_content("a.pdf") == ("2" * 64, "new.pdf")
+    assert set(_contents()) == {"b.pdf"}
+    assert db.delete_content("b.pdf") == ("1" * 64, "old.pdf")
+    assert db.list_contents() == [] and db.delete_content("a.pdf") is None
+
+
+def test_reupload_without_aliases_drops_old_content(game_db):
+    db.register_upload("a.pdf", "1" * 64, "old.pdf", 10)
+    _, orphans = db.register_upload("a.pdf", "2" * 64, "new.pdf", 20)
+    assert orphans == [("1" * 64, "old.pdf")]
+    assert [c["sha256"] for c in db.list_contents()] == ["2" * 64]
+
+
+def test_collect_only_unreferenced_content(game_db):
+    from src.extractor.bundle import bundle_dir, collect_content
+    old, new = "1" * 64, "2" * 64
+    for sha in (old, new):
+        path = os.path.join(bundle_dir(), f"{sha}-v1.json")
+        os.makedirs(bundle_dir(), exist_ok=True)
+        open(path, "w").close()
+        db.record_bundle(sha, 1, "a.pdf", path, [(1, "Art. 1", 0, "k")])
+        db.save_page_texts(sha, "pypdf2", {1: "texto"})
+    db.register_upload("a.pdf", old, "old.pdf", 10)
+    db.upsert_document("a.pdf", "a.pdf", 1, sha256=old)
+    assert not collect_content(old)  # ainda é o conteúdo de a.pdf
+
+    db.register_upload("a.pdf", new, "new.pdf", 20)  # reenvio
+    db.upsert_document("a.pdf", "a.pdf", 1, sha256=new)
+    assert collect_content(old)
+    assert db.mission_keys(old) == [] and db.load_page_texts(old, "pypdf2") == {}
+    assert not os.path.exists(os.path.join(bundle_dir(), f"{old}-v1.json"))
+    assert db.mission_keys(new) == ["k"] and not collect_content(new)